@@ -14,3 +14,7 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 
 application = get_asgi_application()
+
+# Build the in-memory typeahead index before the first request
+from zaukho_api import suggest  # noqa: E402
+suggest.warm_up()
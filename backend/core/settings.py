@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 
 from pathlib import Path
 import os
+import sys
 from datetime import timedelta
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -51,7 +52,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'zaukho_api.instrumentation.RequestInstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'whitenoise.middleware.WhiteNoiseMiddleware',  # static files, before anything that touches the session
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',  # CORS middleware
     'django.middleware.common.CommonMiddleware',
@@ -61,6 +64,50 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# RequestInstrumentationMiddleware measures every request; this share of
+# them (0-1) is logged to zaukho_api.requests, along with every 5xx and every
+# request taking at least REQUEST_LOG_SLOW_MS milliseconds
+REQUEST_LOG_SAMPLE_RATE = float(os.environ.get('REQUEST_LOG_SAMPLE_RATE', '0.05'))
+REQUEST_LOG_SLOW_MS = 1000
+
+# Log records are JSON lines on stderr. The handlers of LOG_QUEUE_LOGGERS
+# run on a QueueListener thread (see zaukho_api.instrumentation), so a
+# request only pays for putting the record on a queue. `manage.py test`
+# only logs errors; tests that check a record capture it with assertLogs().
+TESTING = sys.argv[1:2] == ['test']
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'json': {
+            '()': 'zaukho_api.instrumentation.JSONFormatter',
+        },
+    },
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'json',
+        },
+    },
+    'loggers': {
+        'zaukho_api': {
+            'handlers': ['console'],
+            'level': os.environ.get('ZAUKHO_LOG_LEVEL', 'ERROR' if TESTING else 'INFO'),
+            'propagate': False,
+        },
+    },
+}
+LOG_QUEUE_LOGGERS = ['zaukho_api']
+
+# /metrics (zaukho_api.prometheus). With several worker processes, point
+# METRICS_MULTIPROC_DIR (or PROMETHEUS_MULTIPROC_DIR) at a directory they
+# share and empty it on deploy; each worker writes its totals there every
+# METRICS_FLUSH_INTERVAL seconds. When METRICS_TOKEN is set, scrapes must
+# send it as a bearer token.
+METRICS_MULTIPROC_DIR = os.environ.get('METRICS_MULTIPROC_DIR')
+METRICS_FLUSH_INTERVAL = 5
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
 # CORS settings
 CORS_ALLOW_ALL_ORIGINS = True  # Only for development, restrict in production
 CORS_ALLOW_CREDENTIALS = True
@@ -97,6 +144,36 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# Use a shared backend (Redis/Memcached) in production so that invalidation
+# reaches every worker.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'zaukho',
+    }
+}
+
+# Seconds a cached catalog response may live; entries are also invalidated
+# by signals whenever the catalog changes
+RESPONSE_CACHE_TIMEOUT = 300
+
+# Seconds the precomputed public rails of /api/home/ may live
+HOME_RAILS_TIMEOUT = 300
+
+# Upper bound on the life of a cached /api/library/ snapshot; snapshots are
+# also invalidated by signals and expire with the first rental in them
+LIBRARY_CACHE_TIMEOUT = 3600
+
+# /api/search/ gives up on a query after this many milliseconds
+SEARCH_LATENCY_BUDGET_MS = 200
+
+# Upper bound on the entries of the in-memory /api/search/suggest/ index
+SUGGEST_MAX_ENTRIES = 500_000
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -134,10 +211,55 @@ USE_TZ = True
 STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 
+# collectstatic writes content-hashed copies of every static file plus gzip
+# and (with the Brotli package) .br versions; WhiteNoiseMiddleware serves
+# them with `Cache-Control: public, max-age=315360000, immutable`. Names
+# missing from the manifest fall back to the unhashed file.
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage',
+    },
+}
+WHITENOISE_MANIFEST_STRICT = False
+
 # Media files
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Serve public uploads (posters and their variants) from Django, for
+# deployments without a front proxy for MEDIA_ROOT. Posters are stored
+# under content hashes and served as immutable; other names may be cached
+# for MEDIA_MAX_AGE seconds.
+MEDIA_SERVE = DEBUG or os.environ.get('MEDIA_SERVE') == '1'
+MEDIA_MAX_AGE = 3600
+
+# Video streaming (zaukho_api.streaming): how long a playback URL works (a
+# rental's end also ends it), and the read size when Django sends the file.
+# Set STREAM_ACCEL_REDIRECT_LOCATION to an nginx `internal` location that
+# aliases MEDIA_ROOT to let nginx send the bytes instead.
+STREAM_TOKEN_MAX_AGE = 4 * 3600
+STREAM_BLOCK_SIZE = 256 * 1024
+STREAM_ACCEL_REDIRECT_LOCATION = os.environ.get('STREAM_ACCEL_REDIRECT_LOCATION')
+
+# HLS ingest (zaukho_api.ingest): uploaded videos are segmented on a pool of
+# HLS_MAX_WORKERS spawned processes per web worker, so the total is that
+# times the number of gunicorn workers. Turn HLS_INGEST_ON_UPLOAD off to
+# segment only with `manage.py segment_videos`.
+HLS_INGEST_ON_UPLOAD = True
+HLS_MAX_WORKERS = 2
+HLS_SEGMENT_SECONDS = 6
+
+# Poster variants (zaukho_api.posters): widths rendered in WebP and JPEG
+# when a poster is saved, on a pool of POSTER_MAX_WORKERS spawned processes
+# per web worker. Backfill with `manage.py build_poster_variants`.
+POSTER_VARIANTS_ON_SAVE = True
+POSTER_WIDTHS = (160, 320, 480, 720)
+POSTER_QUALITY = 80
+POSTER_MAX_WORKERS = 2
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
@@ -146,7 +268,10 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # Builds request.user from the token claims instead of a query per
+        # request; 'rest_framework_simplejwt.authentication.JWTAuthentication'
+        # is the drop-in replacement if every view needs the full row
+        'zaukho_api.authentication.StatelessJWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
@@ -154,8 +279,28 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
+    # Reverse proxies in front of the app. Client addresses (the per-IP
+    # throttles) are read from X-Forwarded-For only this many hops deep;
+    # with 0 it is ignored, since clients can send anything in it
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES', '0')),
+    # Token buckets for the auth endpoints (zaukho_api.throttling): burst/refill period
+    'DEFAULT_THROTTLE_RATES': {
+        'login-ip': '20/min',
+        'login-account': '5/min',
+        'register-ip': '5/hour',
+    },
 }
 
+# Where throttle buckets live: LocalBucketStore limits per worker process,
+# CacheBucketStore shares buckets through CACHES['default'] (use with a
+# shared cache such as Redis or Memcached)
+THROTTLE_BUCKET_STORE = 'zaukho_api.throttling.LocalBucketStore'
+
+# Password hashes (login, register) allowed at once per process; further
+# requests wait up to PASSWORD_HASH_SLOT_TIMEOUT seconds, then get a 429
+MAX_CONCURRENT_PASSWORD_HASHES = 4
+PASSWORD_HASH_SLOT_TIMEOUT = 0.5
+
 # JWT settings
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(days=1),
@@ -185,8 +330,32 @@ SIMPLE_JWT = {
     'SLIDING_TOKEN_REFRESH_LIFETIME': timedelta(days=7),
 }
 
+# StatelessJWTAuthentication: seconds a user row is reused from the
+# per-process cache, its maximum size, and how often (seconds) each process
+# picks up newly blacklisted tokens
+JWT_USER_CACHE_TTL = 60
+JWT_USER_CACHE_SIZE = 10_000
+JWT_BLACKLIST_REFRESH_INTERVAL = 5
+
 # Custom authentication backends
+# A single backend: it covers username and email logins, so a failed login
+# costs one lookup and one password hash
 AUTHENTICATION_BACKENDS = [
     'zaukho_api.auth_backends.EmailOrUsernameModelBackend',  # Custom backend for email login
-    'django.contrib.auth.backends.ModelBackend',  # Default backend
 ]
+
+# The first hasher makes new hashes. ConfigurablePBKDF2PasswordHasher takes
+# the place of Django's PBKDF2PasswordHasher (same algorithm name); hashes
+# with a different iteration count are upgraded on the next login.
+PASSWORD_HASHERS = [
+    'zaukho_api.hashers.ConfigurablePBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
+# PBKDF2 work factor; Django's default (870,000 in 5.1) when unset. Each
+# login costs one hash, so this trades login latency and CPU for resistance
+# to offline cracking. Measure with `manage.py benchmark_login`.
+# PASSWORD_PBKDF2_ITERATIONS = 870_000
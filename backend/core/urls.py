@@ -15,16 +15,26 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.conf import settings
 from django.conf.urls.static import static
 
+from zaukho_api import media
+from zaukho_api.prometheus import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('api/async/', include('zaukho_api.async_urls')),
     path('api/', include('zaukho_api.urls')),
+    path('metrics', metrics_view, name='metrics'),
 ]
 
-# Add media and static URL configurations for development
+# Public uploads; videos are only reachable through playback URLs
+if settings.MEDIA_SERVE:
+    urlpatterns += [
+        re_path(r'^%s(?P<path>.*)$' % settings.MEDIA_URL.lstrip('/'), media.serve, name='media'),
+    ]
+
+# Static files are served by WhiteNoiseMiddleware; this covers DEBUG without it
 if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
     urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
@@ -2,8 +2,7 @@ import os
 import sys
 import django
 import random
-import uuid
-from datetime import date, timedelta, datetime
+from datetime import date, timedelta
 
 # Set up Django environment
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -11,48 +10,27 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 django.setup()
 
 # Import models
-from django.contrib.auth.models import User
-from zaukho_api.models import Category, Movie, TVSeries, Season, Episode, Purchase, Rental
-from django.utils import timezone
+from django.db import transaction
+from zaukho_api import populate, synthetic
+from zaukho_api.models import Category, Movie, TVSeries, Season, Episode
+
+BATCH_SIZE = 1000
 
 # Clear existing data
 def clear_data():
     print("Clearing existing data...")
-    Purchase.objects.all().delete()
-    Rental.objects.all().delete()
-    Episode.objects.all().delete()
-    Season.objects.all().delete()
-    TVSeries.objects.all().delete()
-    Movie.objects.all().delete()
-    Category.objects.all().delete()
+    populate.truncate()
     print("Data cleared successfully!")
 
 # Create categories
 def create_categories():
     print("Creating categories...")
     categories = [
-        {"name": "Action", "description": "Action-packed movies and shows"},
-        {"name": "Comedy", "description": "Funny and humorous content"},
-        {"name": "Drama", "description": "Emotional and serious storylines"},
-        {"name": "Sci-Fi", "description": "Science fiction content"},
-        {"name": "Horror", "description": "Scary and thrilling content"},
-        {"name": "Romance", "description": "Love stories and relationships"},
-        {"name": "Documentary", "description": "Real-life stories and events"},
-        {"name": "Animation", "description": "Animated movies and shows"},
-        {"name": "Thriller", "description": "Suspenseful and exciting content"},
-        {"name": "Fantasy", "description": "Magical and mythical stories"}
+        (pk, name, description) for pk, (name, description) in enumerate(synthetic.CATEGORIES, start=1)
     ]
-    
-    created_categories = []
-    for category_data in categories:
-        category = Category.objects.create(
-            name=category_data["name"],
-            description=category_data["description"]
-        )
-        created_categories.append(category)
-    
-    print(f"Created {len(created_categories)} categories")
-    return created_categories
+    populate.insert_categories(categories, BATCH_SIZE)
+    print(f"Created {len(categories)} categories")
+    return [pk for pk, _, _ in categories]
 
 # Create movies
 def create_movies(categories):
@@ -240,28 +218,27 @@ def create_movies(categories):
         }
     ]
     
-    created_movies = []
-    for movie_data in movies:
-        movie = Movie.objects.create(
-            title=movie_data["title"],
-            description=movie_data["description"],
-            release_date=movie_data["release_date"],
-            duration=movie_data["duration"],
-            price_buy=movie_data["price_buy"],
-            price_rent=movie_data["price_rent"],
-            is_featured=movie_data["is_featured"]
-        )
+    rows = []
+    links = []
+    for pk, movie_data in enumerate(movies, start=1):
+        rows.append((
+            pk,
+            movie_data["title"],
+            movie_data["description"],
+            movie_data["release_date"],
+            movie_data["duration"],
+            movie_data["price_buy"],
+            movie_data["price_rent"],
+            movie_data["is_featured"]
+        ))
         
         # Assign 2-3 random categories to each movie
         num_categories = random.randint(2, 3)
-        selected_categories = random.sample(categories, num_categories)
-        for category in selected_categories:
-            movie.categories.add(category)
-        
-        created_movies.append(movie)
+        links.extend((pk, category) for category in random.sample(categories, num_categories))
     
-    print(f"Created {len(created_movies)} movies")
-    return created_movies
+    populate.insert_movies(rows, links, BATCH_SIZE)
+    print(f"Created {len(rows)} movies")
+    return [row[0] for row in rows]
 
 # Create TV series
 def create_tv_series(categories):
@@ -389,47 +366,46 @@ def create_tv_series(categories):
         }
     ]
     
-    created_tv_series = []
-    for tv_data in tv_series_list:
-        tv_series = TVSeries.objects.create(
-            title=tv_data["title"],
-            description=tv_data["description"],
-            release_date=tv_data["release_date"],
-            is_featured=tv_data["is_featured"]
-        )
+    rows = []
+    links = []
+    for pk, tv_data in enumerate(tv_series_list, start=1):
+        rows.append((
+            pk,
+            tv_data["title"],
+            tv_data["description"],
+            tv_data["release_date"],
+            tv_data["is_featured"]
+        ))
         
         # Assign 2-3 random categories to each TV series
         num_categories = random.randint(2, 3)
-        selected_categories = random.sample(categories, num_categories)
-        for category in selected_categories:
-            tv_series.categories.add(category)
-        
-        created_tv_series.append(tv_series)
+        links.extend((pk, category) for category in random.sample(categories, num_categories))
     
-    print(f"Created {len(created_tv_series)} TV series")
-    return created_tv_series
+    print(f"Created {len(rows)} TV series")
+    return rows, links
 
 # Create seasons and episodes
 def create_seasons_and_episodes(tv_series_list):
     print("Creating seasons and episodes...")
-    created_seasons = []
+    seasons = []
+    episodes = []
     
-    for tv_series in tv_series_list:
+    for tv_series_id, title, _, release_date, _ in tv_series_list:
         # Create 1-4 seasons for each TV series
         num_seasons = random.randint(1, 4)
         
         for season_num in range(1, num_seasons + 1):
             # Calculate release date (each season 1 year apart)
-            season_release = tv_series.release_date + timedelta(days=365 * (season_num - 1))
-            
-            season = Season.objects.create(
-                tv_series=tv_series,
-                season_number=season_num,
-                title=f"Season {season_num}",
-                release_date=season_release,
-                price_buy=random.choice([19.99, 24.99, 29.99])
-            )
-            created_seasons.append(season)
+            season_release = release_date + timedelta(days=365 * (season_num - 1))
+            season_id = len(seasons) + 1
+            seasons.append((
+                season_id,
+                tv_series_id,
+                season_num,
+                f"Season {season_num}",
+                season_release,
+                random.choice([19.99, 24.99, 29.99])
+            ))
             
             # Create 8-12 episodes for each season
             num_episodes = random.randint(8, 12)
@@ -443,28 +419,34 @@ def create_seasons_and_episodes(tv_series_list):
                 elif episode_num == num_episodes:
                     episode_title = "Season Finale"
                 
-                Episode.objects.create(
-                    season=season,
-                    episode_number=episode_num,
-                    title=episode_title,
-                    description=f"Description for {tv_series.title} S{season_num}E{episode_num}",
-                    duration=random.randint(40, 60),
-                    price_rent=random.choice([1.99, 2.49, 2.99])
-                )
+                episodes.append((
+                    len(episodes) + 1,
+                    season_id,
+                    episode_num,
+                    episode_title,
+                    f"Description for {title} S{season_num}E{episode_num}",
+                    random.randint(40, 60),
+                    random.choice([1.99, 2.49, 2.99])
+                ))
     
-    total_episodes = Episode.objects.count()
-    print(f"Created {len(created_seasons)} seasons and {total_episodes} episodes")
-    return created_seasons
+    print(f"Created {len(seasons)} seasons and {len(episodes)} episodes")
+    return seasons, episodes
 
 # Main function to populate the database
 def populate_db():
-    clear_data()
-    categories = create_categories()
-    movies = create_movies(categories)
-    tv_series = create_tv_series(categories)
-    seasons = create_seasons_and_episodes(tv_series)
+    # One transaction, and bulk inserts that skip signals: the search index,
+    # entitlements and trending scores are rebuilt once at the end
+    with transaction.atomic():
+        clear_data()
+        categories = create_categories()
+        create_movies(categories)
+        tv_series, links = create_tv_series(categories)
+        seasons, episodes = create_seasons_and_episodes(tv_series)
+        populate.insert_tv_series(tv_series, links, seasons, episodes, BATCH_SIZE)
+        populate.reset_sequences(Category, Movie, TVSeries, Season, Episode)
+        populate.rebuild_derived(BATCH_SIZE)
     
     print("Database populated successfully!")
 
 if __name__ == "__main__":
-    populate_db() 
\ No newline at end of file
+    populate_db()
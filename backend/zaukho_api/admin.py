@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Category, Movie, TVSeries, Season, Episode, Purchase, Rental
+from .models import Category, Movie, TVSeries, Season, Episode, Purchase, Rental, RentalArchive, Entitlement, TrendingScore, ItemNeighbor, VideoManifest, VideoSegment
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
@@ -50,3 +50,38 @@ class RentalAdmin(admin.ModelAdmin):
     list_filter = ('content_type', 'rental_date')
     search_fields = ('user__username', 'transaction_id')
     date_hierarchy = 'rental_date'
+
+@admin.register(Entitlement)
+class EntitlementAdmin(admin.ModelAdmin):
+    list_display = ('user', 'content_type', 'object_id', 'expires_at')
+    list_filter = ('content_type',)
+    search_fields = ('user__username',)
+
+@admin.register(TrendingScore)
+class TrendingScoreAdmin(admin.ModelAdmin):
+    list_display = ('content_type', 'object_id', 'score', 'updated_at')
+    list_filter = ('content_type',)
+
+@admin.register(ItemNeighbor)
+class ItemNeighborAdmin(admin.ModelAdmin):
+    list_display = ('content_type', 'object_id', 'rank', 'neighbor_type', 'neighbor_id', 'score')
+    list_filter = ('content_type', 'neighbor_type')
+    search_fields = ('object_id',)
+
+@admin.register(RentalArchive)
+class RentalArchiveAdmin(admin.ModelAdmin):
+    list_display = ('user', 'content_type', 'rental_date', 'expiry_date', 'amount', 'archived_at')
+    list_filter = ('content_type',)
+    search_fields = ('user__username', 'transaction_id')
+
+class VideoSegmentInline(admin.TabularInline):
+    model = VideoSegment
+    extra = 0
+    readonly_fields = ('sequence', 'name', 'duration', 'size')
+
+@admin.register(VideoManifest)
+class VideoManifestAdmin(admin.ModelAdmin):
+    list_display = ('content_type', 'movie', 'episode', 'status', 'segment_count', 'duration', 'updated_at')
+    list_filter = ('content_type', 'status')
+    readonly_fields = ('directory', 'segment_count', 'duration', 'error')
+    inlines = [VideoSegmentInline]
@@ -1,6 +1,16 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class ZaukhoApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'zaukho_api'
+
+    def ready(self):
+        # Connect signal receivers
+        from . import signals  # noqa: F401
+
+        # Count queries per request and write log records from a background thread
+        from . import instrumentation
+        instrumentation.install_query_wrapper()
+        instrumentation.start_log_queue(getattr(settings, 'LOG_QUEUE_LOGGERS', ['zaukho_api']))
@@ -0,0 +1,15 @@
+from django.urls import path
+
+from . import async_views
+
+# Mounted at /api/async/ by core/urls.py; same paths as zaukho_api/urls.py
+urlpatterns = [
+    path('movies/', async_views.movie_list, name='async-movie-list'),
+    path('movies/<int:pk>/', async_views.movie_detail, name='async-movie-detail'),
+    path('tv-series/', async_views.tv_series_list, name='async-tvseries-list'),
+    path('tv-series/<int:pk>/', async_views.tv_series_detail, name='async-tvseries-detail'),
+    path('seasons/<int:pk>/', async_views.season_detail, name='async-season-detail'),
+    path('episodes/<int:pk>/', async_views.episode_detail, name='async-episode-detail'),
+    path('library/', async_views.my_library, name='async-my-library'),
+    path('auth/user/', async_views.user_view, name='async-user'),
+]
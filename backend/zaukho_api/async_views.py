@@ -0,0 +1,181 @@
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.db.models import Count, Max
+from django.http import JsonResponse
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_GET
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from . import library, response_cache
+from .authentication import StatelessJWTAuthentication
+from .mixins import not_modified_response
+from .serializers import UserSerializer
+from .views import EpisodeViewSet, MovieViewSet, SeasonViewSet, TVSeriesViewSet
+
+# Async counterparts of the hot read endpoints, mounted under /api/async/.
+# They reuse the sync viewsets' querysets, serializers, paginators and
+# cache scopes, but do their I/O through the async ORM and cache, so under
+# ASGI the event loop keeps serving other requests while they wait.
+
+_jwt = StatelessJWTAuthentication()
+
+
+async def authenticate(request):
+    """
+    The active user behind the request's bearer token or session, or None.
+    Raises InvalidToken for a bad or blacklisted bearer token.
+    """
+    header = _jwt.get_header(request)
+    raw_token = _jwt.get_raw_token(header) if header is not None else None
+    if raw_token is None:
+        user = await request.auser()
+        return user if user.is_authenticated else None
+    token = await sync_to_async(_jwt.get_validated_token)(raw_token)
+    lookup = {jwt_settings.USER_ID_FIELD: token.get(jwt_settings.USER_ID_CLAIM), 'is_active': True}
+    return await User.objects.filter(**lookup).afirst()
+
+
+def login_required(view):
+    """Authenticate the request and pass the user to the view, or answer 401 like DRF does"""
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        try:
+            user = await authenticate(request)
+        except InvalidToken as exc:
+            return _unauthorized(exc.detail)
+        if user is None:
+            return _unauthorized({'detail': 'Authentication credentials were not provided.'})
+        return await view(request, user, *args, **kwargs)
+    return wrapper
+
+
+def _unauthorized(data):
+    return JsonResponse(data, status=401, headers={'WWW-Authenticate': 'Bearer realm="api"'})
+
+
+@require_GET
+@login_required
+async def my_library(request, user):
+    """Async /api/library/"""
+    data = library.page(request, await library.asnapshot(user.pk, request))
+    if data is None:
+        return JsonResponse({'detail': f"type must be one of {', '.join(library.SECTIONS)}."}, status=400)
+    return JsonResponse(data)
+
+
+@require_GET
+@login_required
+async def user_view(request, user):
+    """Async /api/auth/user/"""
+    return JsonResponse(UserSerializer(user).data)
+
+
+def _viewset(viewset_class, request, action, **kwargs):
+    """An instance of a sync viewset set up as if DRF had dispatched `request` to it"""
+    drf_request = Request(request)
+    drf_request.accepted_renderer = JSONRenderer()
+    drf_request.accepted_media_type = JSONRenderer.media_type
+    return viewset_class(
+        request=drf_request, action=action, args=(), kwargs=kwargs, format_kwarg=None
+    )
+
+
+def _cached_response(request, cached):
+    validators = cached['validators']
+    response = not_modified_response(
+        request, validators.get('ETag'), parse_http_date_safe(validators.get('Last-Modified'))
+    ) or JsonResponse(cached['data'], headers=validators)
+    response['X-Cache'] = 'HIT'
+    return response
+
+
+async def _store_response(key, data, validators):
+    await response_cache.astore(key, {'data': data, 'validators': validators})
+    response = JsonResponse(data, headers=validators)
+    response['X-Cache'] = 'MISS'
+    return response
+
+
+async def catalog_list(request, viewset_class):
+    """Async list action of a cursor paginated catalog viewset"""
+    view = _viewset(viewset_class, request, 'list')
+    key = await response_cache.acache_key(request, [f'{view.cache_resource}:list'])
+    cached = await response_cache.aload(key)
+    if cached is not None:
+        return _cached_response(request, cached)
+
+    queryset = view.filter_queryset(view.get_queryset())
+    state = await queryset.order_by().aaggregate(
+        last_modified=Max(view.last_modified_field), count=Count('pk')
+    )
+    etag = view.make_etag(view.request, state['last_modified'], state['count'])
+    response = not_modified_response(request, etag, None)
+    if response is not None:
+        return response
+
+    page = await view.paginator.apaginate_queryset(queryset, view.request, view=view)
+    data = view.paginator.get_paginated_response(view.get_serializer(page, many=True).data).data
+    return await _store_response(key, data, {'ETag': etag})
+
+
+async def catalog_retrieve(request, viewset_class, pk):
+    """Async retrieve action of a catalog viewset"""
+    view = _viewset(viewset_class, request, 'retrieve', pk=pk)
+    key = await response_cache.acache_key(request, [f'{view.cache_resource}:{pk}'])
+    cached = await response_cache.aload(key)
+    if cached is not None:
+        return _cached_response(request, cached)
+
+    queryset = view.filter_queryset(view.get_queryset()).filter(pk=pk)
+    last_modified = await queryset.values_list(view.last_modified_field, flat=True).afirst()
+    if last_modified is None:
+        model = view.get_queryset().model
+        return JsonResponse({'detail': f'No {model._meta.object_name} matches the given query.'}, status=404)
+
+    etag = view.make_etag(view.request, last_modified)
+    timestamp = int(last_modified.timestamp())
+    response = not_modified_response(request, etag, timestamp)
+    if response is not None:
+        return response
+
+    instance = await queryset.afirst()
+    data = view.get_serializer(instance).data
+    return await _store_response(key, data, {'ETag': etag, 'Last-Modified': http_date(timestamp)})
+
+
+@require_GET
+async def movie_list(request):
+    return await catalog_list(request, MovieViewSet)
+
+
+@require_GET
+async def movie_detail(request, pk):
+    return await catalog_retrieve(request, MovieViewSet, pk)
+
+
+@require_GET
+async def tv_series_list(request):
+    return await catalog_list(request, TVSeriesViewSet)
+
+
+@require_GET
+async def tv_series_detail(request, pk):
+    return await catalog_retrieve(request, TVSeriesViewSet, pk)
+
+
+# Seasons and episodes are page number paginated (with a COUNT query), so
+# only their detail views have async versions
+
+@require_GET
+async def season_detail(request, pk):
+    return await catalog_retrieve(request, SeasonViewSet, pk)
+
+
+@require_GET
+async def episode_detail(request, pk):
+    return await catalog_retrieve(request, EpisodeViewSet, pk)
@@ -1,27 +1,54 @@
 from django.contrib.auth.backends import ModelBackend
-from django.contrib.auth import get_user_model
-from django.db.models import Q
+from django.contrib.auth.hashers import make_password
+from django.db import IntegrityError, transaction
+
+from .models import LoginIdentifier
+
+
+def normalize(identifier):
+    return (identifier or '').strip().lower()
+
+
+def sync_identifiers(user):
+    """Point the user's normalized username and email at them, leaving identifiers other users hold"""
+    wanted = {}
+    for kind, value in (('username', user.username), ('email', user.email)):
+        identifier = normalize(value)
+        if identifier and identifier not in wanted:
+            wanted[identifier] = kind
+
+    LoginIdentifier.objects.filter(user_id=user.pk).exclude(identifier__in=wanted).delete()
+    held = set(LoginIdentifier.objects.filter(identifier__in=wanted).values_list('identifier', flat=True))
+    for identifier, kind in wanted.items():
+        if identifier in held:
+            continue
+        try:
+            with transaction.atomic():
+                LoginIdentifier.objects.create(identifier=identifier, user_id=user.pk, kind=kind)
+        except IntegrityError:
+            pass  # taken by a concurrent registration
+
 
 class EmailOrUsernameModelBackend(ModelBackend):
     """
-    Custom authentication backend that supports login with either username or email
+    Authentication backend that supports login with either username or email.
+
+    The identifier is looked up in LoginIdentifier (one indexed query that
+    also fetches the user). Unknown identifiers still pay for one password
+    hash, so response times don't reveal which accounts exist.
     """
     def authenticate(self, request, username=None, password=None, **kwargs):
-        UserModel = get_user_model()
-        
-        try:
-            # Try to fetch the user by username or email
-            user = UserModel.objects.filter(
-                Q(username__iexact=username) | Q(email__iexact=username)
-            ).first()
-            
-            # If user exists and password is correct, return user
-            if user and user.check_password(password):
-                return user
-                
-        except UserModel.DoesNotExist:
-            # No user found, return None
+        # JSON bodies can carry numbers, lists or objects here
+        if not isinstance(username, str) or not isinstance(password, str):
             return None
-            
-        # Authentication failed
-        return None 
\ No newline at end of file
+
+        login = LoginIdentifier.objects.select_related('user').filter(identifier=normalize(username)).first()
+        if login is None:
+            make_password(password)
+            return None
+
+        # check_password() rehashes the password if the hasher settings changed
+        user = login.user
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
@@ -1,14 +1,21 @@
+import logging
+
 from django.contrib.auth import authenticate
 from django.contrib.auth.models import User
 from rest_framework import status
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, throttle_classes
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from .authentication import blacklist_access_token
+from .throttling import LoginAccountThrottle, LoginIPThrottle, RegisterIPThrottle, hash_slot
 from .auth_serializers import UserSerializer, RegisterSerializer
 
+logger = logging.getLogger(__name__)
+
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes([LoginIPThrottle, LoginAccountThrottle])
 def login_view(request):
     """
     Custom login view that validates email and password,
@@ -17,10 +24,8 @@ def login_view(request):
     email = request.data.get('email')
     password = request.data.get('password')
     
-    print("Login attempt with email:", email)
-    
     if not password:
-        print("Password missing")
+        logger.info("Login rejected: password missing")
         return Response(
             {'detail': 'Password is required.'},
             status=status.HTTP_400_BAD_REQUEST
@@ -28,7 +33,7 @@ def login_view(request):
     
     # Email is required
     if not email:
-        print("Email missing")
+        logger.info("Login rejected: email missing")
         return Response(
             {'detail': 'Email is required.'},
             status=status.HTTP_400_BAD_REQUEST
@@ -36,9 +41,8 @@ def login_view(request):
     
     # Authenticate user with email as username
     # Our custom backend will handle this
-    print("Attempting authentication with email:", email)
-    user = authenticate(request, username=email, password=password)
-    print("Authentication result:", user)
+    with hash_slot():
+        user = authenticate(request, username=email, password=password)
     
     if user is not None:
         # Generate tokens
@@ -53,10 +57,10 @@ def login_view(request):
             'refresh': str(refresh),
             'detail': 'Login successful'
         }
-        print("Login successful, returning tokens")
+        logger.info("Login succeeded", extra={'user_id': user.pk})
         return Response(response_data)
     else:
-        print("Authentication failed for email:", email)
+        logger.info("Login failed", extra={'identifier': email})
         return Response(
             {'detail': 'Invalid credentials. Please try again.'},
             status=status.HTTP_401_UNAUTHORIZED
@@ -64,6 +68,7 @@ def login_view(request):
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes([RegisterIPThrottle])
 def register_view(request):
     """
     Register a new user and return JWT tokens
@@ -71,7 +76,8 @@ def register_view(request):
     serializer = RegisterSerializer(data=request.data)
     
     if serializer.is_valid():
-        user = serializer.save()
+        with hash_slot():
+            user = serializer.save()
         
         # Generate tokens
         refresh = RefreshToken.for_user(user)
@@ -90,13 +96,16 @@ def register_view(request):
 @permission_classes([IsAuthenticated])
 def logout_view(request):
     """
-    Logout view that blacklists the refresh token
+    Logout view that blacklists the refresh token and the access token
+    the request was made with
     """
     try:
         refresh_token = request.data.get('refresh')
         if refresh_token:
             token = RefreshToken(refresh_token)
             token.blacklist()
+        if isinstance(request.auth, AccessToken):
+            blacklist_access_token(request.auth, request.user.pk)
         return Response({'detail': 'Logout successful'})
     except Exception as e:
         return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,156 @@
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+
+class UserCache:
+    """
+    Small per-process TTL cache of active user rows, keyed by primary key.
+    signals.py drops a user when their row changes; other processes see the
+    change once the entry's TTL runs out.
+    """
+    def __init__(self, ttl, max_size):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._users = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        """The active user with this primary key, or None"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._users.get(user_id)
+        if entry is not None and entry[0] > now:
+            return entry[1]
+
+        user = get_user_model().objects.filter(**{
+            jwt_settings.USER_ID_FIELD: user_id, 'is_active': True,
+        }).first()
+        with self._lock:
+            if user_id not in self._users and len(self._users) >= self.max_size:
+                # Evict the oldest entry (dicts keep insertion order)
+                self._users.pop(next(iter(self._users)))
+            self._users[user_id] = (now + self.ttl, user)
+        return user
+
+    def discard(self, user_id):
+        with self._lock:
+            self._users.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._users.clear()
+
+
+class BlacklistCache:
+    """
+    Per-process set of blacklisted JTIs that are not yet expired.
+
+    The first check loads every live entry of the token_blacklist app; after
+    that, at most every `refresh_interval` seconds, one query fetches the
+    rows added since the highest BlacklistedToken id seen. Tokens blacklisted
+    by this process are added straight away.
+    """
+    def __init__(self, refresh_interval):
+        self.refresh_interval = refresh_interval
+        self._expiries = {}  # jti -> expires_at
+        self._last_id = None
+        self._refreshed_at = None
+        self._lock = threading.Lock()
+
+    def __contains__(self, jti):
+        self.refresh_if_due()
+        return jti in self._expiries
+
+    def add(self, jti, expires_at):
+        with self._lock:
+            self._expiries[jti] = expires_at
+
+    def refresh_if_due(self):
+        if self._refreshed_at is not None and time.monotonic() - self._refreshed_at < self.refresh_interval:
+            return
+        with self._lock:
+            if self._refreshed_at is not None and time.monotonic() - self._refreshed_at < self.refresh_interval:
+                return
+            now = timezone.now()
+            rows = BlacklistedToken.objects.filter(token__expires_at__gt=now)
+            if self._last_id is not None:
+                rows = rows.filter(id__gt=self._last_id)
+            for pk, jti, expires_at in rows.values_list('id', 'token__jti', 'token__expires_at'):
+                self._expiries[jti] = expires_at
+                self._last_id = max(pk, self._last_id or 0)
+            # Expired tokens are rejected on signature validation anyway
+            for jti in [jti for jti, expires_at in self._expiries.items() if expires_at <= now]:
+                del self._expiries[jti]
+            self._refreshed_at = time.monotonic()
+
+    def clear(self):
+        with self._lock:
+            self._expiries.clear()
+            self._last_id = self._refreshed_at = None
+
+
+user_cache = UserCache(
+    ttl=getattr(settings, 'JWT_USER_CACHE_TTL', 60),
+    max_size=getattr(settings, 'JWT_USER_CACHE_SIZE', 10_000),
+)
+blacklist = BlacklistCache(refresh_interval=getattr(settings, 'JWT_BLACKLIST_REFRESH_INTERVAL', 5))
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication without the per-request user query: the user row
+    comes from `user_cache`, which only holds active users. Every request
+    checks it, so a deactivated or deleted user is locked out at once in
+    this process and within JWT_USER_CACHE_TTL in the others, not when
+    their access token expires.
+
+    Access tokens whose JTI is blacklisted (see blacklist_access_token) are
+    rejected.
+    """
+    def get_validated_token(self, raw_token):
+        token = super().get_validated_token(raw_token)
+        if token.get(jwt_settings.JTI_CLAIM) in blacklist:
+            raise InvalidToken({
+                'detail': _("Token is blacklisted"),
+                'messages': [{'token_class': type(token).__name__, 'message': _("Token is blacklisted")}],
+            })
+        return token
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[jwt_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+        user = user_cache.get(user_id)
+        if user is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        return user
+
+
+def blacklist_access_token(token, user_id):
+    """
+    Blacklist an access token through the token_blacklist app, which only
+    records refresh tokens itself.
+    """
+    jti = token[jwt_settings.JTI_CLAIM]
+    expires_at = datetime.fromtimestamp(token['exp'], tz=dt_timezone.utc)
+    issued_at = token.get('iat')
+    outstanding, created = OutstandingToken.objects.get_or_create(jti=jti, defaults={
+        'user_id': user_id,
+        'token': str(token),
+        'created_at': datetime.fromtimestamp(issued_at, tz=dt_timezone.utc) if issued_at else None,
+        'expires_at': expires_at,
+    })
+    BlacklistedToken.objects.get_or_create(token=outstanding)
+    blacklist.add(jti, expires_at)
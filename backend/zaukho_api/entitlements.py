@@ -0,0 +1,181 @@
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Entitlement, Episode, Season, Purchase, Rental
+
+MAX_IDS_PER_TYPE = 200
+
+
+def _outlives(expires_at, current):
+    """True if an entitlement expiring at `expires_at` lasts longer than one expiring at `current`"""
+    if current is None:
+        return False
+    return expires_at is None or expires_at > current
+
+
+def grant(user_id, content_type, object_ids, expires_at=None):
+    """
+    Grant `user_id` access to `object_ids` until `expires_at` (None for ownership).
+    An existing entitlement is only ever extended, never shortened.
+    """
+    object_ids = set(object_ids)
+    if not object_ids:
+        return
+    with transaction.atomic():
+        existing = {
+            entitlement.object_id: entitlement
+            for entitlement in Entitlement.objects.select_for_update().filter(
+                user_id=user_id, content_type=content_type, object_id__in=object_ids
+            )
+        }
+        to_create = []
+        to_update = []
+        for object_id in object_ids:
+            entitlement = existing.get(object_id)
+            if entitlement is None:
+                to_create.append(Entitlement(
+                    user_id=user_id, content_type=content_type,
+                    object_id=object_id, expires_at=expires_at,
+                ))
+            elif _outlives(expires_at, entitlement.expires_at):
+                entitlement.expires_at = expires_at
+                to_update.append(entitlement)
+        Entitlement.objects.bulk_create(to_create, ignore_conflicts=True)
+        Entitlement.objects.bulk_update(to_update, ['expires_at'])
+
+
+def _purchase_grants(purchase):
+    """(content_type, object_ids) pairs a purchase grants, forever"""
+    if purchase.movie_id:
+        yield 'movie', [purchase.movie_id]
+    if purchase.season_id:
+        yield 'season', [purchase.season_id]
+        yield 'episode', Episode.objects.filter(season_id=purchase.season_id).values_list('id', flat=True)
+
+
+def _rental_grants(rental):
+    """(content_type, object_ids) pairs a rental grants, until it expires"""
+    if rental.movie_id:
+        yield 'movie', [rental.movie_id]
+    if rental.episode_id:
+        yield 'episode', [rental.episode_id]
+
+
+def sync_purchase(purchase):
+    for content_type, object_ids in _purchase_grants(purchase):
+        grant(purchase.user_id, content_type, object_ids)
+
+
+def sync_rental(rental):
+    for content_type, object_ids in _rental_grants(rental):
+        grant(rental.user_id, content_type, object_ids, expires_at=rental.expiry_date)
+
+
+def grant_new_episode(episode):
+    """Give a newly added episode to everyone who owns its season"""
+    owners = Entitlement.objects.filter(
+        content_type='season', object_id=episode.season_id, expires_at__isnull=True
+    ).values_list('user_id', flat=True)
+    for user_id in owners:
+        grant(user_id, 'episode', [episode.pk])
+
+
+def rebuild_for_user(user_id):
+    """Recompute a user's entitlements from their purchases and active rentals"""
+    with transaction.atomic():
+        Entitlement.objects.filter(user_id=user_id).delete()
+        for purchase in Purchase.objects.filter(user_id=user_id):
+            sync_purchase(purchase)
+        for rental in Rental.objects.filter(user_id=user_id, expiry_date__gt=timezone.now()):
+            sync_rental(rental)
+
+
+def rebuild_all(batch_size=1000):
+    """Recompute every entitlement in bulk; returns the number of rows written"""
+    # (user_id, content_type, object_id) -> expires_at
+    grants = {}
+
+    def add(key, expires_at):
+        if key not in grants or _outlives(expires_at, grants[key]):
+            grants[key] = expires_at
+
+    episodes_by_season = {}
+    for episode_id, season_id in Episode.objects.values_list('id', 'season_id').iterator():
+        episodes_by_season.setdefault(season_id, []).append(episode_id)
+
+    purchases = Purchase.objects.values_list('user_id', 'movie_id', 'season_id')
+    for user_id, movie_id, season_id in purchases.iterator():
+        if movie_id:
+            add((user_id, 'movie', movie_id), None)
+        if season_id:
+            add((user_id, 'season', season_id), None)
+            for episode_id in episodes_by_season.get(season_id, ()):
+                add((user_id, 'episode', episode_id), None)
+
+    rentals = Rental.objects.filter(expiry_date__gt=timezone.now()).values_list(
+        'user_id', 'movie_id', 'episode_id', 'expiry_date'
+    )
+    for user_id, movie_id, episode_id, expiry_date in rentals.iterator():
+        if movie_id:
+            add((user_id, 'movie', movie_id), expiry_date)
+        if episode_id:
+            add((user_id, 'episode', episode_id), expiry_date)
+
+    with transaction.atomic():
+        Entitlement.objects.all().delete()
+        Entitlement.objects.bulk_create(
+            (
+                Entitlement(user_id=user_id, content_type=content_type, object_id=object_id, expires_at=expires_at)
+                for (user_id, content_type, object_id), expires_at in grants.items()
+            ),
+            batch_size=batch_size,
+        )
+    return len(grants)
+
+
+def playable(user, requested):
+    """
+    Answer "which of these can I play" for many items in one query.
+
+    `requested` maps a content type to an iterable of IDs; the result maps
+    each requested content type to the set of IDs the user may watch now.
+    """
+    result = {content_type: set() for content_type in requested}
+    condition = Q()
+    for content_type, object_ids in requested.items():
+        object_ids = list(object_ids)[:MAX_IDS_PER_TYPE]
+        if object_ids:
+            condition |= Q(content_type=content_type, object_id__in=object_ids)
+    if not condition:
+        return result
+
+    rows = Entitlement.objects.filter(condition, user_id=user.pk).filter(
+        Q(expires_at__isnull=True) | Q(expires_at__gt=timezone.now())
+    ).values_list('content_type', 'object_id')
+    for content_type, object_id in rows:
+        result[content_type].add(object_id)
+    return result
+
+
+def can_watch(user, content_type, object_id):
+    return object_id in playable(user, {content_type: [object_id]})[content_type]
+
+
+def current(user, content_type, object_id):
+    """The user's entitlement to the item if they may watch it now, else None"""
+    return Entitlement.objects.filter(
+        user_id=user.pk, content_type=content_type, object_id=object_id
+    ).filter(Q(expires_at__isnull=True) | Q(expires_at__gt=timezone.now())).first()
+
+
+def owned_titles(user):
+    """IDs of the movies and TV series the user currently has any access to"""
+    rows = Entitlement.objects.filter(user_id=user.pk, content_type__in=('movie', 'season')).filter(
+        Q(expires_at__isnull=True) | Q(expires_at__gt=timezone.now())
+    ).values_list('content_type', 'object_id')
+    movies, seasons = set(), set()
+    for content_type, object_id in rows:
+        (movies if content_type == 'movie' else seasons).add(object_id)
+    tv_series = set(Season.objects.filter(id__in=seasons).values_list('tv_series_id', flat=True)) if seasons else set()
+    return {'movie': movies, 'tv_series': tv_series}
@@ -0,0 +1,59 @@
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Entitlement, Rental, RentalArchive
+from .signals import rental_expired
+
+ARCHIVED_FIELDS = (
+    'id', 'user_id', 'content_type', 'movie_id', 'episode_id',
+    'rental_date', 'expiry_date', 'amount', 'transaction_id',
+)
+
+
+def expire_batch(now, batch_size=1000):
+    """
+    Move up to `batch_size` rentals that expired before `now` into
+    RentalArchive, in one transaction. Returns the number moved.
+    """
+    with transaction.atomic():
+        rows = list(
+            Rental.objects.filter(expiry_date__lte=now).order_by('expiry_date', 'id')
+            .values(*ARCHIVED_FIELDS)[:batch_size]
+        )
+        if not rows:
+            return 0
+        RentalArchive.objects.bulk_create([RentalArchive(**row) for row in rows], batch_size=batch_size)
+        # The post_delete receiver skips expired rentals, which grant nothing
+        Rental.objects.filter(id__in=[row['id'] for row in rows]).delete()
+    rental_expired.send(sender=Rental, rentals=rows)
+    return len(rows)
+
+
+def purge_expired_entitlements(now, batch_size=1000):
+    """Delete entitlements whose rental has run out; returns the number deleted"""
+    deleted = 0
+    while True:
+        ids = list(
+            Entitlement.objects.filter(expires_at__lte=now).values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return deleted
+        deleted += Entitlement.objects.filter(id__in=ids).delete()[0]
+
+
+def sweep(batch_size=1000, max_batches=None, now=None):
+    """
+    Archive every rental that has expired by `now`, one batch per
+    transaction so the Rental table is never locked for long, then drop the
+    matching entitlement rows. Returns (rentals archived, entitlements purged).
+    """
+    now = now or timezone.now()
+    archived = batches = 0
+    while max_batches is None or batches < max_batches:
+        moved = expire_batch(now, batch_size)
+        if not moved:
+            break
+        archived += moved
+        batches += 1
+    return archived, purge_expired_entitlements(now, batch_size)
+
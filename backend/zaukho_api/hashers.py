@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+
+class ConfigurablePBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    PBKDF2-SHA256 with the iteration count taken from
+    settings.PASSWORD_PBKDF2_ITERATIONS (Django's default when unset).
+
+    It keeps the `pbkdf2_sha256` algorithm name, so existing hashes verify
+    unchanged. A hash made with a different count is rewritten with the
+    configured one the next time its user logs in.
+    """
+    @property
+    def iterations(self):
+        return getattr(settings, 'PASSWORD_PBKDF2_ITERATIONS', PBKDF2PasswordHasher.iterations)
@@ -0,0 +1,96 @@
+import math
+import os
+import shutil
+import subprocess
+
+# HLS segmenting. This module only uses the standard library: it runs in
+# the spawned processes of zaukho_api.ingest, which never set up Django.
+
+PLAYLIST = 'index.m3u8'
+SEGMENT_PATTERN = 'seg%05d.ts'
+
+# Bytes per second the stand-in segmenter assumes when ffmpeg is missing
+STAND_IN_BYTE_RATE = 625_000  # 5 Mbit/s
+COPY_BLOCK_SIZE = 1024 * 1024
+
+
+def segment(source, output_dir, segment_seconds=6):
+    """
+    Cut `source` into MPEG-TS segments of about `segment_seconds` and write
+    a VOD playlist, PLAYLIST, next to them in `output_dir`. Uses ffmpeg
+    when it is on PATH, otherwise a stand-in that splits the bytes evenly.
+    Returns [(segment name, duration, size)] in playlist order.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    ffmpeg = shutil.which('ffmpeg')
+    if ffmpeg:
+        _ffmpeg(ffmpeg, source, output_dir, segment_seconds)
+    else:
+        _split(source, output_dir, segment_seconds)
+    return read_playlist(output_dir)
+
+
+def _ffmpeg(ffmpeg, source, output_dir, segment_seconds):
+    result = subprocess.run(
+        [
+            ffmpeg, '-nostdin', '-loglevel', 'error', '-y', '-i', source,
+            '-c', 'copy', '-f', 'hls', '-hls_time', str(segment_seconds), '-hls_playlist_type', 'vod',
+            '-hls_segment_filename', os.path.join(output_dir, SEGMENT_PATTERN),
+            os.path.join(output_dir, PLAYLIST),
+        ],
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+    )
+    if result.returncode:
+        raise RuntimeError(f"ffmpeg exited with {result.returncode}: {result.stderr.strip()[-2000:]}")
+
+
+def _split(source, output_dir, segment_seconds):
+    """Stand-in for ffmpeg: fixed-size byte slices, timed at STAND_IN_BYTE_RATE"""
+    segment_size = STAND_IN_BYTE_RATE * segment_seconds
+    segments = []
+    with open(source, 'rb') as src:
+        while True:
+            name = SEGMENT_PATTERN % len(segments)
+            size = 0
+            with open(os.path.join(output_dir, name), 'wb') as out:
+                while size < segment_size:
+                    block = src.read(min(COPY_BLOCK_SIZE, segment_size - size))
+                    if not block:
+                        break
+                    out.write(block)
+                    size += len(block)
+            if not size:
+                os.remove(os.path.join(output_dir, name))
+                break
+            segments.append((name, size / STAND_IN_BYTE_RATE))
+    write_playlist(output_dir, segments)
+
+
+def write_playlist(output_dir, segments):
+    """Write a VOD playlist of [(name, duration)]"""
+    target = max((math.ceil(duration) for _, duration in segments), default=1)
+    lines = ['#EXTM3U', '#EXT-X-VERSION:3', f'#EXT-X-TARGETDURATION:{target}',
+             '#EXT-X-MEDIA-SEQUENCE:0', '#EXT-X-PLAYLIST-TYPE:VOD']
+    for name, duration in segments:
+        lines.append(f'#EXTINF:{duration:.3f},')
+        lines.append(name)
+    lines.append('#EXT-X-ENDLIST')
+    tmp = os.path.join(output_dir, PLAYLIST + '.tmp')
+    with open(tmp, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+    os.replace(tmp, os.path.join(output_dir, PLAYLIST))
+
+
+def read_playlist(output_dir):
+    """[(segment name, duration, size)] listed in the playlist in `output_dir`"""
+    segments = []
+    duration = None
+    with open(os.path.join(output_dir, PLAYLIST)) as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith('#EXTINF:'):
+                duration = float(line[len('#EXTINF:'):].split(',', 1)[0])
+            elif line and not line.startswith('#'):
+                segments.append((line, duration or 0.0, os.path.getsize(os.path.join(output_dir, line))))
+                duration = None
+    return segments
@@ -0,0 +1,83 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from . import entitlements, instrumentation, recommendations, response_cache, trending
+from .models import Movie, TVSeries
+from .serializers import serialize_titles
+
+RAIL_SIZE = 20
+CATALOG_ORDER = ('-created_at', '-id')
+
+
+def _featured():
+    movies = Movie.objects.filter(is_featured=True).order_by(*CATALOG_ORDER)
+    series = TVSeries.objects.filter(is_featured=True).order_by(*CATALOG_ORDER)
+    return _interleave(
+        [('movie', pk) for pk in movies.values_list('id', flat=True)[:RAIL_SIZE]],
+        [('tv_series', pk) for pk in series.values_list('id', flat=True)[:RAIL_SIZE]],
+    )
+
+
+def _new_releases():
+    movies = Movie.objects.order_by('-release_date', '-id')
+    series = TVSeries.objects.order_by('-release_date', '-id')
+    return _interleave(
+        [('movie', pk) for pk in movies.values_list('id', flat=True)[:RAIL_SIZE]],
+        [('tv_series', pk) for pk in series.values_list('id', flat=True)[:RAIL_SIZE]],
+    )
+
+
+def _recommended(user):
+    """Neighbours of what the user owns; no trending fallback, that rail is already on the page"""
+    return recommendations.recommend(user, limit=RAIL_SIZE, fallback=False)
+
+
+def _interleave(*rails):
+    """Merge rails item by item, so a rail is not all movies followed by all series"""
+    merged = []
+    for position in range(max((len(rail) for rail in rails), default=0)):
+        merged.extend(rail[position] for rail in rails if position < len(rail))
+    return merged[:RAIL_SIZE]
+
+
+def public_rails(request=None):
+    """
+    The rails shown to everyone, precomputed and cached. The key includes
+    the catalog list versions so any catalog change rebuilds them, and the
+    request's origin, which the poster URLs are built from.
+    """
+    versions = '.'.join(response_cache.get_versions(['movies:list', 'tv-series:list']))
+    origin = response_cache.origin(request) if request is not None else ''
+    key = f'zaukho:home:public:{versions}:{origin}'
+    rails = instrumentation.cache_lookup(cache.get(key))
+    if rails is None:
+        rails = serialize_titles({
+            'featured': _featured(),
+            'trending': trending.top(limit=RAIL_SIZE),
+            'new_releases': _new_releases(),
+        }, request)
+        cache.set(key, rails, timeout=getattr(settings, 'HOME_RAILS_TIMEOUT', 300))
+    return rails
+
+
+def personal_rails(user, public, request=None):
+    """Rails computed per request for a signed-in user"""
+    rails = serialize_titles({'recommended': _recommended(user)}, request)
+
+    # Ownership badges for every movie on the page, in one query
+    movie_ids = {
+        item['id']
+        for items in (*public.values(), *rails.values())
+        for item in items
+        if item['type'] == 'movie'
+    }
+    playable = entitlements.playable(user, {'movie': movie_ids})
+    rails['entitlements'] = {'movie': sorted(playable['movie'])}
+    return rails
+
+
+def build_home(request):
+    rails = dict(public_rails(request))
+    if request.user.is_authenticated:
+        rails.update(personal_rails(request.user, rails, request))
+    return rails
@@ -0,0 +1,69 @@
+import hashlib
+import os
+
+from PIL import Image, ImageOps
+
+# Poster variants. Like zaukho_api.hls this runs in spawned worker
+# processes and only needs Pillow, not Django.
+
+FORMATS = {
+    # format -> (extension, Pillow save options)
+    'webp': ('webp', {'method': 4}),
+    'jpeg': ('jpg', {'optimize': True, 'progressive': True}),
+}
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def content_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _widths(original, widths):
+    """The requested widths that don't upscale, or the original width if they all would"""
+    return sorted(width for width in widths if width < original) or [original]
+
+
+def _save(image, path, image_format, quality):
+    tmp = f'{path}.tmp'
+    image.save(tmp, format=image_format.upper(), quality=quality, **FORMATS[image_format][1])
+    os.replace(tmp, path)
+
+
+def render_variants(source, media_root, directory, widths, formats=tuple(FORMATS), quality=80):
+    """
+    Resize the image at `source` to each of `widths` (never wider than the
+    original) in each of `formats`. Files are named after the source's
+    content hash under `directory` in `media_root`, so a poster used twice
+    is only rendered once. Returns {format: {width: name relative to media_root}}.
+    """
+    digest = content_hash(source)
+    prefix = os.path.join(directory, digest[:2], digest)
+    os.makedirs(os.path.join(media_root, os.path.dirname(prefix)), exist_ok=True)
+
+    variants = {image_format: {} for image_format in formats}
+    with Image.open(source) as original:
+        # JPEG sources can be decoded at a reduced scale, much faster than
+        # full size; both sides stay at least the largest width asked for
+        original.draft('RGB', (max(widths), max(widths)))
+        image = ImageOps.exif_transpose(original)
+        targets = _widths(image.width, widths)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+        for width in reversed(targets):
+            height = max(round(image.height * width / image.width), 1)
+            resized = None
+            for image_format in formats:
+                name = f'{prefix}-{width}w.{FORMATS[image_format][0]}'
+                path = os.path.join(media_root, name)
+                if not os.path.exists(path):
+                    if resized is None:
+                        resized = image.resize((width, height), Image.Resampling.LANCZOS)
+                    # JPEG has no alpha channel
+                    output = resized.convert('RGB') if image_format == 'jpeg' and resized.mode != 'RGB' else resized
+                    _save(output, path, image_format, quality)
+                variants[image_format][width] = name
+    return variants
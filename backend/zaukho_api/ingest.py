@@ -0,0 +1,158 @@
+import logging
+import multiprocessing
+import shutil
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+
+from . import hls
+from .models import VideoManifest, VideoSegment
+
+logger = logging.getLogger(__name__)
+
+# Uploaded videos are cut into HLS segments away from the request: saving a
+# Movie or Episode with a new video_file creates a pending VideoManifest and,
+# once the transaction commits, queues it on a pool of at most
+# HLS_MAX_WORKERS spawned processes. The worker only runs zaukho_api.hls;
+# the results are recorded back in this process.
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def pool(max_workers=None):
+    """A process pool for hls.segment(); workers are spawned, not forked from a process with open connections"""
+    return ProcessPoolExecutor(
+        max_workers=max_workers or getattr(settings, 'HLS_MAX_WORKERS', 2),
+        mp_context=multiprocessing.get_context('spawn'),
+    )
+
+
+def _pool():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = pool()
+        return _executor
+
+
+def _item(manifest):
+    return manifest.movie_id if manifest.content_type == 'movie' else manifest.episode_id
+
+
+def video_saved(instance, content_type, update_fields=None, queue=None):
+    """
+    Create a pending manifest for a new video_file. With `queue` (default
+    HLS_INGEST_ON_UPLOAD) it is put on the pool once the transaction commits.
+    """
+    if update_fields is not None and 'video_file' not in update_fields:
+        return None
+    if not instance.video_file:
+        return None
+    manifests = VideoManifest.objects.filter(**{content_type: instance})
+    if manifests.filter(source=instance.video_file.name).exists():
+        return None
+    manifest = VideoManifest.objects.create(
+        content_type=content_type, source=instance.video_file.name, **{content_type: instance}
+    )
+    if queue if queue is not None else getattr(settings, 'HLS_INGEST_ON_UPLOAD', True):
+        transaction.on_commit(lambda: enqueue(manifest.pk))
+    return manifest
+
+
+def start(manifest_id):
+    """Mark a manifest as processing; returns (source path, output path) or None if it is gone"""
+    manifest = VideoManifest.objects.filter(pk=manifest_id).first()
+    if manifest is None:
+        return None
+    manifest.directory = f'hls/{manifest.content_type}/{_item(manifest)}/{manifest.pk}'
+    manifest.status = 'processing'
+    manifest.error = ''
+    manifest.save(update_fields=['directory', 'status', 'error', 'updated_at'])
+    return default_storage.path(manifest.source), default_storage.path(manifest.directory)
+
+
+def enqueue(manifest_id):
+    """Segment a manifest's source on the process pool"""
+    paths = start(manifest_id)
+    if paths is None:
+        return None
+    future = submit(_pool(), paths)
+    future.add_done_callback(lambda future: _done(manifest_id, future))
+    return future
+
+
+def submit(pool, paths):
+    return pool.submit(hls.segment, *paths, getattr(settings, 'HLS_SEGMENT_SECONDS', 6))
+
+
+def finish(manifest_id, future):
+    """Record the outcome of a future returned by submit()"""
+    error = future.exception()
+    return record(manifest_id, None if error else future.result(), error)
+
+
+def _done(manifest_id, future):
+    # Runs on the pool's management thread, which has its own connection
+    try:
+        finish(manifest_id, future)
+    finally:
+        close_old_connections()
+
+
+def run(manifest_id):
+    """Segment a manifest's source in this process"""
+    paths = start(manifest_id)
+    if paths is None:
+        return None
+    try:
+        segments = hls.segment(*paths, getattr(settings, 'HLS_SEGMENT_SECONDS', 6))
+    except Exception as exc:
+        return record(manifest_id, None, exc)
+    return record(manifest_id, segments)
+
+
+def record(manifest_id, segments, error=None):
+    """Store the segments of a finished run and drop the item's older manifests"""
+    manifest = VideoManifest.objects.filter(pk=manifest_id).first()
+    if manifest is None:
+        return None
+    if error is not None:
+        logger.error("HLS segmenting failed", extra={'manifest_id': manifest_id, 'error': str(error)})
+        manifest.status = 'failed'
+        manifest.error = str(error)
+        manifest.save(update_fields=['status', 'error', 'updated_at'])
+        return manifest
+
+    with transaction.atomic():
+        VideoSegment.objects.filter(manifest=manifest).delete()
+        VideoSegment.objects.bulk_create([
+            VideoSegment(manifest=manifest, sequence=sequence, name=name, duration=duration, size=size)
+            for sequence, (name, duration, size) in enumerate(segments)
+        ])
+        manifest.status = 'ready'
+        manifest.segment_count = len(segments)
+        manifest.duration = sum(duration for _, duration, _ in segments)
+        manifest.save(update_fields=['status', 'segment_count', 'duration', 'updated_at'])
+        # Their files go with them, see manifest_deleted()
+        VideoManifest.objects.filter(
+            **{manifest.content_type: _item(manifest)}, id__lt=manifest.pk
+        ).exclude(status__in=('pending', 'processing')).delete()
+    return manifest
+
+
+def manifest_deleted(manifest):
+    """Remove a deleted manifest's playlist and segments once the deletion commits"""
+    if manifest.directory:
+        path = default_storage.path(manifest.directory)
+        transaction.on_commit(lambda: shutil.rmtree(path, ignore_errors=True))
+
+
+def ready_directory(content_type, object_id):
+    """Storage directory of the item's newest ready manifest, or None"""
+    return VideoManifest.objects.filter(
+        **{content_type: object_id}, status='ready'
+    ).order_by('-id').values_list('directory', flat=True).first()
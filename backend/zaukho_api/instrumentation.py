@@ -0,0 +1,232 @@
+import atexit
+import contextvars
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import time
+from datetime import datetime, timezone as dt_timezone
+from logging.handlers import QueueHandler, QueueListener
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import Signal
+
+logger = logging.getLogger('zaukho_api.requests')
+
+# Sent by RequestInstrumentationMiddleware after every request, sampled or
+# not, with `request`, `response` and `metrics` (a RequestMetrics).
+request_measured = Signal()
+
+_current = contextvars.ContextVar('zaukho_request_metrics', default=None)
+
+
+class RequestMetrics:
+    """What one request cost. Filled in by the query wrapper and cache_lookup()"""
+    __slots__ = ('started', 'duration', 'db_queries', 'db_time', 'cache_hits', 'cache_misses')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.duration = None
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def as_dict(self):
+        return {
+            'duration_ms': round(self.duration * 1000, 2),
+            'db_queries': self.db_queries,
+            'db_time_ms': round(self.db_time * 1000, 2),
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+        }
+
+
+def current():
+    """The RequestMetrics of the request being handled, or None"""
+    return _current.get()
+
+
+def cache_lookup(data):
+    """Count a cache read towards the current request (a hit unless `data` is None); returns `data`"""
+    metrics = _current.get()
+    if metrics is not None:
+        if data is None:
+            metrics.cache_misses += 1
+        else:
+            metrics.cache_hits += 1
+    return data
+
+
+def _record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.db_queries += 1
+        metrics.db_time += time.perf_counter() - started
+
+
+def _instrument_connection(sender, connection, **kwargs):
+    # The metrics live in a context variable, which sync_to_async copies, so
+    # queries that async views run in the ORM's executor thread are counted
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+def install_query_wrapper():
+    """Time every query on database connections opened from now on"""
+    connection_created.connect(_instrument_connection, dispatch_uid='zaukho_api.instrumentation')
+
+
+class RequestInstrumentationMiddleware:
+    """
+    Measure each request: wall time, database queries and the time spent in
+    them, and cache hits and misses. Every measurement is sent as
+    `request_measured`; a REQUEST_LOG_SAMPLE_RATE share of requests is
+    logged to `zaukho_api.requests`, plus every server error and every
+    request slower than REQUEST_LOG_SLOW_MS.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'REQUEST_LOG_SAMPLE_RATE', 1.0)
+        self.slow_seconds = getattr(settings, 'REQUEST_LOG_SLOW_MS', 1000) / 1000
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.finish(request, response, metrics)
+        return response
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.finish(request, response, metrics)
+        return response
+
+    def finish(self, request, response, metrics):
+        metrics.duration = time.perf_counter() - metrics.started
+        request_measured.send(sender=self.__class__, request=request, response=response, metrics=metrics)
+
+        slow = metrics.duration >= self.slow_seconds
+        if not (slow or response.status_code >= 500 or random.random() < self.sample_rate):
+            return
+        match = request.resolver_match
+        logger.log(
+            logging.WARNING if slow or response.status_code >= 500 else logging.INFO,
+            '%s %s %s', request.method, request.path, response.status_code,
+            extra={
+                'method': request.method,
+                'path': request.path,
+                'view': match.view_name if match else None,
+                'status': response.status_code,
+                **metrics.as_dict(),
+            },
+        )
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per record; attributes passed with `extra=` become keys"""
+    reserved = frozenset(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, tz=dt_timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        entry.update((key, value) for key, value in vars(record).items() if key not in self.reserved)
+        if record.exc_info or record.exc_text:
+            # exc_text is the traceback StructuredQueueHandler rendered before queueing
+            entry['exc_info'] = record.exc_text or self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class StructuredQueueHandler(QueueHandler):
+    """
+    QueueHandler that keeps the exception apart from the message. The stock
+    prepare() renders the traceback into `msg` and clears `exc_info`, so
+    JSONFormatter on the listener side could not give it its own key.
+    """
+    _formatter = logging.Formatter()
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.message = record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = record.exc_text or self._formatter.formatException(record.exc_info)
+            # The traceback holds every frame alive and can't be pickled
+            record.exc_info = record.exc_info[:2] + (None,)
+        return record
+
+
+_queue_handler = None
+_listener = None
+
+
+def start_log_queue(logger_names):
+    """
+    Move the handlers configured for each of `logger_names` behind a single
+    QueueHandler, so logging a record is a queue put and the formatting and
+    writing happen on a QueueListener thread.
+    """
+    global _queue_handler, _listener
+    if _listener is not None:
+        return
+    loggers = [logging.getLogger(name) for name in logger_names]
+    handlers = []
+    for configured in loggers:
+        for handler in configured.handlers:
+            if handler not in handlers:
+                handlers.append(handler)
+    if not handlers:
+        return
+
+    _queue_handler = StructuredQueueHandler(queue.SimpleQueue())
+    for configured in loggers:
+        if configured.handlers:
+            for handler in list(configured.handlers):
+                configured.removeHandler(handler)
+            configured.addHandler(_queue_handler)
+    _listener = QueueListener(_queue_handler.queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_log_queue)
+    if hasattr(os, 'register_at_fork'):
+        # Workers forked after ready() (gunicorn --preload) need their own thread
+        os.register_at_fork(after_in_child=_restart_listener)
+
+
+def _restart_listener():
+    _queue_handler.queue = _listener.queue = queue.SimpleQueue()
+    _listener._thread = None
+    _listener.start()
+
+
+def stop_log_queue():
+    """Write out whatever is still queued and stop the listener thread"""
+    if _listener is not None and _listener._thread is not None:
+        _listener.stop()
@@ -0,0 +1,160 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from . import instrumentation, response_cache
+from .models import Purchase, Rental
+from .serializers import serialize_titles
+
+SECTIONS = ('movie', 'season', 'episode')
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+_datetime = serializers.DateTimeField()
+
+# A user's library is kept as one denormalized snapshot: every purchase and
+# active rental, newest first, split by content type, with the compact
+# representation of the title inlined. Snapshots are versioned with the
+# response cache scope `library:<user_id>`, which signals.py bumps when the
+# user's purchases or rentals change, and expire when the first rental in
+# them does.
+
+
+def _scope(user_id):
+    return f'library:{user_id}'
+
+
+def invalidate(user_id):
+    response_cache.bump(_scope(user_id))
+
+
+def _purchases(user_id):
+    return Purchase.objects.filter(user_id=user_id).values_list(
+        'id', 'content_type', 'movie_id', 'season_id', 'purchase_date', 'amount', 'transaction_id'
+    ).order_by('-purchase_date', '-id')
+
+
+def _rentals(user_id, now):
+    return Rental.objects.filter(user_id=user_id, expiry_date__gt=now).values_list(
+        'id', 'content_type', 'movie_id', 'episode_id', 'rental_date', 'amount', 'transaction_id', 'expiry_date'
+    ).order_by('-rental_date', '-id')
+
+
+def _assemble(purchases, rentals, request=None):
+    """Build a snapshot from purchase and rental rows, serializing every title in one query per type"""
+    entries = []
+    for pk, content_type, movie_id, season_id, acquired_at, amount, transaction_id in purchases:
+        key = ('movie', movie_id) if content_type == 'movie' else ('season', season_id)
+        entries.append((key, 'purchase', pk, acquired_at, None, amount, transaction_id))
+    for pk, content_type, movie_id, episode_id, acquired_at, amount, transaction_id, expires_at in rentals:
+        key = ('movie', movie_id) if content_type == 'movie' else ('episode', episode_id)
+        entries.append((key, 'rental', pk, acquired_at, expires_at, amount, transaction_id))
+    entries.sort(key=lambda entry: entry[3], reverse=True)
+
+    titles = {
+        (item['type'], item['id']): item
+        for item in serialize_titles({'titles': [entry[0] for entry in entries if entry[0][1]]}, request)['titles']
+    }
+    sections = {section: [] for section in SECTIONS}
+    for key, access, pk, acquired_at, expires_at, amount, transaction_id in entries:
+        if key not in titles:
+            continue  # the title was deleted
+        sections[key[0]].append({
+            'id': pk,
+            'access': access,
+            'acquired_at': _datetime.to_representation(acquired_at),
+            'expires_at': _datetime.to_representation(expires_at) if expires_at else None,
+            'amount': str(amount),
+            'transaction_id': transaction_id,
+            'content': titles[key],
+        })
+    expiries = [entry[4] for entry in entries if entry[4] is not None]
+    return {'sections': sections, 'expires_at': min(expiries) if expiries else None}
+
+
+def _timeout(snapshot, now):
+    """Cache the snapshot until the first rental in it expires, at most LIBRARY_CACHE_TIMEOUT"""
+    timeout = getattr(settings, 'LIBRARY_CACHE_TIMEOUT', 3600)
+    if snapshot['expires_at'] is not None:
+        timeout = min(timeout, (snapshot['expires_at'] - now).total_seconds())
+    return max(int(timeout), 1)
+
+
+def _key(user_id, version, request):
+    # Titles carry absolute poster URLs built for the request's origin
+    origin = response_cache.origin(request) if request is not None else ''
+    return f'zaukho:library:{user_id}:{version}:{origin}'
+
+
+def snapshot(user_id, request=None):
+    """The user's library snapshot, built on a cache miss"""
+    key = _key(user_id, response_cache.get_versions([_scope(user_id)])[0], request)
+    data = instrumentation.cache_lookup(cache.get(key))
+    if data is None:
+        now = timezone.now()
+        data = _assemble(_purchases(user_id), _rentals(user_id, now), request)
+        cache.set(key, data, timeout=_timeout(data, now))
+    return data
+
+
+async def asnapshot(user_id, request=None):
+    """snapshot() for async views; purchases and rentals are fetched concurrently"""
+    key = _key(user_id, (await response_cache.aget_versions([_scope(user_id)]))[0], request)
+    data = instrumentation.cache_lookup(await cache.aget(key))
+    if data is None:
+        now = timezone.now()
+        purchases, rentals = await asyncio.gather(
+            _fetch(_purchases(user_id)), _fetch(_rentals(user_id, now))
+        )
+        data = await sync_to_async(_assemble)(purchases, rentals, request)
+        await cache.aset(key, data, timeout=_timeout(data, now))
+    return data
+
+
+async def _fetch(queryset):
+    return [row async for row in queryset]
+
+
+def _int_param(request, name, default, maximum=None):
+    try:
+        value = max(int(request.GET.get(name, default)), 0)
+    except ValueError:
+        value = default
+    return min(value, maximum) if maximum is not None else value
+
+
+def _page(request, items, section, limit, offset):
+    url = replace_query_param(request.build_absolute_uri(), 'type', section)
+    url = replace_query_param(url, 'limit', limit)
+    next_url = previous_url = None
+    if offset + limit < len(items):
+        next_url = replace_query_param(url, 'offset', offset + limit)
+    if offset > 0:
+        previous_url = remove_query_param(url, 'offset') if offset <= limit \
+            else replace_query_param(url, 'offset', offset - limit)
+    return {
+        'count': len(items),
+        'next': next_url,
+        'previous': previous_url,
+        'results': items[offset:offset + limit],
+    }
+
+
+def page(request, data):
+    """
+    The response for a snapshot: with ?type= one page of that section
+    (?limit=, ?offset=), otherwise the first page of every section.
+    Returns None for an unknown type.
+    """
+    section = request.GET.get('type')
+    limit = _int_param(request, 'limit', DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE) or DEFAULT_PAGE_SIZE
+    if section is None:
+        return {name: _page(request, data['sections'][name], name, limit, 0) for name in SECTIONS}
+    if section not in SECTIONS:
+        return None
+    return _page(request, data['sections'][section], section, limit, _int_param(request, 'offset', 0))
@@ -0,0 +1,163 @@
+import asyncio
+import io
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from rest_framework_simplejwt.tokens import RefreshToken
+
+# endpoint -> (WSGI path, ASGI path, needs a signed-in user)
+ENDPOINTS = {
+    'library': ('/api/library/', '/api/async/library/', True),
+    'user': ('/api/auth/user/', '/api/async/auth/user/', True),
+    'movies': ('/api/movies/', '/api/async/movies/', False),
+    'tv-series': ('/api/tv-series/', '/api/async/tv-series/', False),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare throughput of the sync views under core.wsgi with the async views under "
+        "core.asgi, calling both applications in-process with N requests in flight"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('endpoint', choices=sorted(ENDPOINTS))
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--concurrency', type=int, default=32)
+        parser.add_argument('--user', help="Username to sign in as (default: the user with the most purchases)")
+        parser.add_argument('--host', default='localhost', help="Host header to send (must be in ALLOWED_HOSTS)")
+        parser.add_argument(
+            '--warm', action='store_true',
+            help="Repeat one URL so catalog requests are response cache hits (default: every request misses)",
+        )
+
+    def handle(self, *args, **options):
+        wsgi_path, asgi_path, needs_user = ENDPOINTS[options['endpoint']]
+        headers = {'host': options['host']}
+        if needs_user:
+            user = self.get_user(options['user'])
+            headers['authorization'] = f'Bearer {RefreshToken.for_user(user).access_token}'
+
+        def queries(count):
+            # A distinct query string per request defeats the response cache
+            return ['' if options['warm'] else f'bench={i}' for i in range(count)]
+
+        from core.asgi import application as asgi_app
+        from core.wsgi import application as wsgi_app
+
+        count, concurrency = options['requests'], options['concurrency']
+        results = {
+            'wsgi (threads)': run_wsgi(wsgi_app, wsgi_path, queries(count), headers, concurrency),
+            'asgi (async views)': asyncio.run(
+                run_asgi(asgi_app, asgi_path, queries(count), headers, concurrency)
+            ),
+        }
+
+        self.stdout.write(f"{count} requests, {concurrency} in flight")
+        for name, (elapsed, latencies, failures) in results.items():
+            latencies.sort()
+            self.stdout.write(
+                f"{name:20} {count / elapsed:8.1f} req/s  "
+                f"p50 {statistics.median(latencies) * 1000:7.1f} ms  "
+                f"p99 {latencies[int(len(latencies) * 0.99) - 1] * 1000:7.1f} ms  "
+                f"failures {failures}"
+            )
+
+    def get_user(self, username):
+        if username:
+            user = User.objects.filter(username=username).first()
+            if user is None:
+                raise CommandError(f"No user named {username!r}")
+            return user
+        user = User.objects.annotate(n=Count('purchases')).order_by('-n', 'pk').first()
+        if user is None:
+            raise CommandError("No users to sign in as; run populate_db first")
+        return user
+
+
+def run_wsgi(app, path, queries, headers, concurrency):
+    def call(query):
+        environ = {
+            'REQUEST_METHOD': 'GET',
+            'PATH_INFO': path,
+            'QUERY_STRING': query,
+            'SERVER_NAME': 'localhost',
+            'SERVER_PORT': '80',
+            'wsgi.url_scheme': 'http',
+            'wsgi.input': io.BytesIO(),
+            'wsgi.errors': io.StringIO(),
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+            **{'HTTP_' + name.upper().replace('-', '_'): value for name, value in headers.items()},
+        }
+        status = []
+        started = time.perf_counter()
+        body = app(environ, lambda code, response_headers, exc_info=None: status.append(code))
+        try:
+            b''.join(body)
+        finally:
+            if hasattr(body, 'close'):
+                body.close()
+        return time.perf_counter() - started, status[0].startswith('200')
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        outcomes = list(executor.map(call, queries))
+    return _summarize(time.perf_counter() - started, outcomes)
+
+
+async def run_asgi(app, path, queries, headers, concurrency):
+    limit = asyncio.Semaphore(concurrency)
+
+    async def call(query):
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': path,
+            'raw_path': path.encode(),
+            'query_string': query.encode(),
+            'root_path': '',
+            'headers': [(name.encode(), value.encode()) for name, value in headers.items()],
+            'client': ('127.0.0.1', 0),
+            'server': ('localhost', 80),
+        }
+        done = asyncio.Event()
+        sent_request = False
+        status = []
+
+        async def receive():
+            nonlocal sent_request
+            if not sent_request:
+                sent_request = True
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+            await done.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                status.append(message['status'])
+            elif not message.get('more_body'):
+                done.set()
+
+        async with limit:
+            started = time.perf_counter()
+            await app(scope, receive, send)
+            return time.perf_counter() - started, status[0] == 200
+
+    started = time.perf_counter()
+    outcomes = await asyncio.gather(*(call(query) for query in queries))
+    return _summarize(time.perf_counter() - started, outcomes)
+
+
+def _summarize(elapsed, outcomes):
+    latencies = [latency for latency, _ in outcomes]
+    failures = sum(1 for _, ok in outcomes if not ok)
+    return elapsed, latencies, failures
@@ -0,0 +1,56 @@
+import statistics
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import authenticate
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+# case -> (identifier, password) given the benchmark user's username, email and password
+CASES = {
+    'username': lambda user, password: (user.username, password),
+    'email': lambda user, password: (user.email.upper(), password),
+    'wrong-password': lambda user, password: (user.email, password + '!'),
+    'unknown-user': lambda user, password: (f'nobody-{uuid.uuid4().hex}@example.com', password),
+}
+
+
+class Command(BaseCommand):
+    help = "Measure p50/p99 latency of authenticate() for good and bad logins with N logins in flight"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help="Logins per case")
+        parser.add_argument('--concurrency', type=int, default=8)
+
+    def handle(self, *args, **options):
+        password = uuid.uuid4().hex
+        suffix = uuid.uuid4().hex[:8]
+        user = User.objects.create_user(f'bench-{suffix}', email=f'bench-{suffix}@example.com', password=password)
+        try:
+            self.stdout.write(f"{options['requests']} logins per case, {options['concurrency']} in flight")
+            for case, credentials in CASES.items():
+                self.report(case, [credentials(user, password) for _ in range(options['requests'])],
+                            options['concurrency'])
+        finally:
+            user.delete()
+
+    def report(self, case, attempts, concurrency):
+        def attempt(credentials):
+            identifier, password = credentials
+            started = time.perf_counter()
+            authenticate(None, username=identifier, password=password)
+            elapsed = time.perf_counter() - started
+            close_old_connections()
+            return elapsed
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            latencies = sorted(executor.map(attempt, attempts))
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"{case:15} {len(attempts) / elapsed:8.1f} logins/s  "
+            f"p50 {statistics.median(latencies) * 1000:7.1f} ms  "
+            f"p99 {latencies[max(int(len(latencies) * 0.99) - 1, 0)] * 1000:7.1f} ms"
+        )
@@ -0,0 +1,59 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from zaukho_api.suggest import PrefixIndex
+
+WORDS = (
+    "last adventure midnight shadows love paris galaxy quest secret garden dark river "
+    "silent storm broken crown lost city golden hour iron heart wild frontier hidden truth "
+    "final stand crimson sky frozen kingdom electric dreams northern lights summer rain"
+).split()
+
+
+class Command(BaseCommand):
+    help = "Benchmark build time, memory and lookup latency of the typeahead prefix index"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--titles', type=int, default=100_000)
+        parser.add_argument('--queries', type=int, default=10_000)
+        parser.add_argument('--max-entries', type=int, default=500_000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        items = [
+            (('movie', pk), ' '.join(rng.choices(WORDS, k=rng.randint(1, 5))).title() + f' {pk}')
+            for pk in range(options['titles'])
+        ]
+
+        index = PrefixIndex(max_entries=options['max_entries'])
+        started = time.perf_counter()
+        index.build(items)
+        build_seconds = time.perf_counter() - started
+
+        prefixes = []
+        for _ in range(options['queries']):
+            label = rng.choice(items)[1].lower()
+            prefixes.append(label[:rng.randint(1, min(len(label), 8))])
+
+        timings = []
+        for prefix in prefixes:
+            started = time.perf_counter()
+            index.lookup(prefix, limit=10)
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+
+        def percentile(value):
+            return timings[min(len(timings) - 1, int(len(timings) * value))]
+
+        self.stdout.write(f"titles:   {len(items)}")
+        self.stdout.write(f"entries:  {len(index)}")
+        self.stdout.write(f"memory:   {index.memory_bytes() / 1024 / 1024:.1f} MiB")
+        self.stdout.write(f"build:    {build_seconds * 1000:.0f} ms")
+        self.stdout.write(
+            f"lookup:   mean {statistics.mean(timings):.3f} ms, "
+            f"p50 {percentile(0.5):.3f} ms, p99 {percentile(0.99):.3f} ms"
+        )
@@ -0,0 +1,38 @@
+from concurrent.futures import as_completed
+
+from django.core.management.base import BaseCommand
+
+from zaukho_api import posters
+
+
+class Command(BaseCommand):
+    help = "Render resized WebP/JPEG copies of movie and TV series posters that have none"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help="Also redo posters that already have variants")
+        parser.add_argument('--workers', type=int, default=None, help="Processes to use (default POSTER_MAX_WORKERS)")
+
+    def handle(self, *args, **options):
+        jobs = []
+        for content_type, model in posters.MODELS.items():
+            rows = model.objects.exclude(poster='').exclude(poster__isnull=True).values_list(
+                'pk', 'poster', 'poster_variants'
+            )
+            for pk, poster, variants in rows.iterator():
+                if options['all'] or (variants or {}).get('source') != poster:
+                    jobs.append((content_type, pk, poster))
+        if not jobs:
+            self.stdout.write("Every poster has variants")
+            return
+
+        done = failed = 0
+        with posters.pool(options['workers']) as pool:
+            futures = {posters.submit(pool, source): (content_type, pk, source) for content_type, pk, source in jobs}
+            for future in as_completed(futures):
+                if posters.finish(*futures[future], future) is None and future.exception() is not None:
+                    failed += 1
+                    content_type, pk, source = futures[future]
+                    self.stderr.write(f"{content_type} {pk} ({source}): {future.exception()}")
+                else:
+                    done += 1
+        self.stdout.write(self.style.SUCCESS(f"Rendered variants of {done} posters, {failed} failed"))
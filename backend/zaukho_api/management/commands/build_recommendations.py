@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from zaukho_api import recommendations
+
+
+class Command(BaseCommand):
+    help = "Compute item-item similarity from purchases, rentals and categories and store the top-K neighbours"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=recommendations.TOP_K)
+        parser.add_argument('--co-purchase-weight', type=float, default=recommendations.CO_PURCHASE_WEIGHT)
+        parser.add_argument('--category-weight', type=float, default=recommendations.CATEGORY_WEIGHT)
+        parser.add_argument(
+            '--chunk-size', type=int, default=512,
+            help="Rows of the similarity matrix scored at a time (bounds memory to chunk-size x items)",
+        )
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        try:
+            import numpy  # noqa: F401
+            import scipy  # noqa: F401
+        except ImportError:
+            raise CommandError("build_recommendations needs numpy and scipy (pip install -r requirements.txt)")
+
+        started = time.perf_counter()
+        count = recommendations.rebuild(
+            top_k=options['top_k'],
+            co_purchase_weight=options['co_purchase_weight'],
+            category_weight=options['category_weight'],
+            chunk_size=options['chunk_size'],
+            batch_size=options['batch_size'],
+        )
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f"Stored neighbours for {count} titles in {elapsed:.1f}s"))
@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from zaukho_api import expiry
+
+
+class Command(BaseCommand):
+    help = "Move expired rentals to RentalArchive in batches and drop their entitlements"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--max-batches', type=int, default=None,
+            help="Stop after this many batches; the rest is picked up by the next run",
+        )
+        parser.add_argument(
+            '--every', type=int, default=None, metavar='SECONDS',
+            help="Keep running and sweep every SECONDS instead of once (e.g. under a process supervisor)",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            archived, purged = expiry.sweep(
+                batch_size=options['batch_size'], max_batches=options['max_batches']
+            )
+            self.stdout.write(self.style.SUCCESS(
+                f"Archived {archived} expired rentals, purged {purged} entitlements"
+            ))
+            if options['every'] is None:
+                return
+            time.sleep(options['every'])
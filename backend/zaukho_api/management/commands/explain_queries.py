@@ -0,0 +1,71 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from zaukho_api.models import Movie, TVSeries, Season, Episode, Category, Purchase, Rental, LoginIdentifier
+
+
+# Plan lines that mean a whole table is read row by row
+FULL_SCAN_PATTERNS = {
+    'sqlite': re.compile(r'\bSCAN (?!.*\bUSING\b)(?P<table>\S+)'),
+    'postgresql': re.compile(r'\bSeq Scan on (?P<table>\S+)'),
+}
+
+
+def endpoint_queries():
+    """(label, queryset) pairs mirroring the filters used by each endpoint"""
+    now = timezone.now()
+    movie_order = ('-created_at', '-id')
+    return [
+        ('movies list', Movie.objects.order_by(*movie_order)[:10]),
+        ('movies ?featured=true', Movie.objects.filter(is_featured=True).order_by(*movie_order)[:10]),
+        ('movies ?category=', Movie.objects.filter(categories__id=1).order_by(*movie_order)[:10]),
+        ('movie categories prefetch', Category.objects.filter(movies__id__in=[1, 2, 3])),
+        ('tv-series list', TVSeries.objects.order_by(*movie_order)[:10]),
+        ('tv-series ?featured=true', TVSeries.objects.filter(is_featured=True).order_by(*movie_order)[:10]),
+        ('tv-series ?category=', TVSeries.objects.filter(categories__id=1).order_by(*movie_order)[:10]),
+        ('home new releases', Movie.objects.order_by('-release_date', '-id').values_list('id', flat=True)[:20]),
+        ('seasons ?tv_series=', Season.objects.filter(tv_series__id=1)),
+        ('episodes ?season=', Episode.objects.filter(season__id=1)),
+        ('purchases list', Purchase.objects.filter(user_id=1).order_by('-purchase_date', '-id')[:10]),
+        ('rentals list', Rental.objects.filter(user_id=1).order_by('-rental_date', '-id')[:10]),
+        ('my_library purchases', Purchase.objects.filter(user_id=1)),
+        ('my_library active rentals', Rental.objects.filter(user_id=1, expiry_date__gt=now)),
+        ('login lookup', LoginIdentifier.objects.select_related('user').filter(identifier='someone@example.com')),
+    ]
+
+
+class Command(BaseCommand):
+    help = "Run EXPLAIN on each endpoint's query and fail if any of them does a full table scan"
+
+    def handle(self, *args, **options):
+        pattern = FULL_SCAN_PATTERNS.get(connection.vendor)
+        if pattern is None:
+            raise CommandError(f"Unsupported database vendor: {connection.vendor}")
+
+        failures = []
+        for label, queryset in endpoint_queries():
+            plan = self.explain(queryset)
+            scans = [match.group('table') for match in pattern.finditer(plan)]
+            if scans:
+                failures.append(label)
+                self.stdout.write(self.style.ERROR(f"FULL SCAN  {label}: {', '.join(scans)}"))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"ok         {label}"))
+            if options['verbosity'] > 1:
+                self.stdout.write(plan)
+
+        if failures:
+            raise CommandError(f"{len(failures)} endpoint queries do full table scans: {', '.join(failures)}")
+
+    def explain(self, queryset):
+        if connection.vendor == 'postgresql':
+            # Tiny development tables make a sequential scan look cheapest;
+            # disable it so the plan shows whether an index *can* be used.
+            with transaction.atomic():
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+                return queryset.explain()
+        return queryset.explain()
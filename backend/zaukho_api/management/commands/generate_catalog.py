@@ -0,0 +1,54 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from zaukho_api import populate
+
+
+class Command(BaseCommand):
+    help = (
+        "Replace the catalog with a synthetic load-test dataset, bulk inserted in one transaction. "
+        "Generating users replaces every user and needs --replace-users if there are any; "
+        "with --users 0 purchases and rentals go to the existing ones."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scale', type=float, default=0.01,
+            help="Fraction of 100k movies, 10k series, 1M users, 10M purchases and 2M rentals",
+        )
+        for name in populate.SCALE:
+            parser.add_argument(f"--{name.replace('_', '-')}", type=int, help=f"Number of {name}, overriding --scale")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--password', help="Password of every generated user (default: unusable)")
+        parser.add_argument(
+            '--replace-users', action='store_true',
+            help="Delete the existing users, admins included, before generating new ones",
+        )
+        parser.add_argument('--days', type=int, default=365, help="Purchases and rentals are spread over this many days")
+        parser.add_argument('--workers', type=int, default=None, help="Generating processes (default: CPU count)")
+        parser.add_argument('--chunk-size', type=int, default=10_000, help="Rows generated per task")
+        parser.add_argument('--batch-size', type=int, default=5000, help="Rows per INSERT")
+
+    def handle(self, *args, **options):
+        counts = populate.counts(options['scale'], **{name: options[name] for name in populate.SCALE})
+        started = time.perf_counter()
+
+        def progress(name, rows):
+            self.stdout.write(f"{time.perf_counter() - started:8.1f}s  {rows:>10} {name}")
+
+        try:
+            populate.generate(
+                counts,
+                seed=options['seed'],
+                workers=options['workers'],
+                chunk_size=options['chunk_size'],
+                batch_size=options['batch_size'],
+                password=options['password'],
+                days=options['days'],
+                replace_users=options['replace_users'],
+                progress=progress,
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(self.style.SUCCESS(f"Generated the catalog in {time.perf_counter() - started:.1f}s"))
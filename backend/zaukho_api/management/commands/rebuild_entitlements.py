@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from zaukho_api import entitlements
+
+
+class Command(BaseCommand):
+    help = "Rebuild the Entitlement table from purchases and active rentals, to repair it (migrations fill it)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        count = entitlements.rebuild_all(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} entitlements"))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from zaukho_api import search
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index from movies, TV series and episodes"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        count = search.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} documents"))
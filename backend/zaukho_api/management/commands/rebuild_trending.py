@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from zaukho_api import trending
+
+
+class Command(BaseCommand):
+    help = "Rebuild trending scores and activity buckets from purchase and rental history"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--prune-only', action='store_true',
+            help="Only delete activity buckets that have aged out of every window",
+        )
+
+    def handle(self, *args, **options):
+        if options['prune_only']:
+            deleted = trending.prune()
+            self.stdout.write(self.style.SUCCESS(f"Pruned {deleted} activity buckets"))
+            return
+        count = trending.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Scored {count} titles"))
@@ -0,0 +1,48 @@
+from concurrent.futures import as_completed
+
+from django.core.management.base import BaseCommand
+
+from zaukho_api import ingest
+from zaukho_api.models import Episode, Movie, VideoManifest
+
+
+class Command(BaseCommand):
+    help = "Segment uploaded movie and episode videos for HLS"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--missing', action='store_true',
+            help="First create manifests for every video that has none (e.g. uploaded before HLS ingest)",
+        )
+        parser.add_argument('--retry-failed', action='store_true', help="Also redo failed manifests")
+        parser.add_argument('--workers', type=int, default=None, help="Processes to use (default HLS_MAX_WORKERS)")
+
+    def handle(self, *args, **options):
+        if options['missing']:
+            for content_type, model in (('movie', Movie), ('episode', Episode)):
+                for instance in model.objects.exclude(video_file='').exclude(video_file__isnull=True).iterator():
+                    ingest.video_saved(instance, content_type, queue=False)
+
+        statuses = ['pending', 'failed'] if options['retry_failed'] else ['pending']
+        manifest_ids = list(VideoManifest.objects.filter(status__in=statuses).values_list('id', flat=True))
+        if not manifest_ids:
+            self.stdout.write("Nothing to segment")
+            return
+
+        ready = failed = 0
+        with ingest.pool(options['workers']) as pool:
+            futures = {}
+            for manifest_id in manifest_ids:
+                paths = ingest.start(manifest_id)
+                if paths is not None:
+                    futures[ingest.submit(pool, paths)] = manifest_id
+            for future in as_completed(futures):
+                manifest = ingest.finish(futures[future], future)
+                if manifest is None:
+                    continue
+                if manifest.status == 'ready':
+                    ready += 1
+                else:
+                    failed += 1
+                    self.stderr.write(f"Manifest {manifest.pk} ({manifest.source}) failed: {manifest.error}")
+        self.stdout.write(self.style.SUCCESS(f"Segmented {ready} videos, {failed} failed"))
@@ -0,0 +1,33 @@
+import posixpath
+import re
+
+from django.conf import settings
+from django.http import Http404
+from django.views import static
+
+# Uploaded files that may be served to anyone. Videos are not among them:
+# they are only streamed through signed playback URLs (zaukho_api.streaming).
+PUBLIC_PREFIXES = ('movies/posters/', 'tv/posters/', 'posters/variants/')
+
+# Content-addressed names (zaukho_api.storage, zaukho_api.images) never
+# change meaning, so browsers may keep them without revalidating
+_hashed = re.compile(r'(^|/)[0-9a-f]{32,}[^/]*$')
+
+
+def serve(request, path):
+    """
+    Serve a public upload when MEDIA_SERVE is on, for deployments without a
+    front proxy serving MEDIA_ROOT. Hashed names are marked immutable.
+    """
+    # static.serve() only resolves `..` after we have checked the prefix
+    if '..' in path.split('/') or path.startswith('/'):
+        raise Http404
+    path = posixpath.normpath(path)
+    if not path.startswith(PUBLIC_PREFIXES):
+        raise Http404
+    response = static.serve(request, path, document_root=settings.MEDIA_ROOT)
+    if _hashed.search(path):
+        response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    else:
+        response['Cache-Control'] = f"public, max-age={getattr(settings, 'MEDIA_MAX_AGE', 3600)}"
+    return response
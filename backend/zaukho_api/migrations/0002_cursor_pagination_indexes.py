@@ -0,0 +1,31 @@
+# Generated by Django 5.1.6 on 2026-10-18 08:42
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('zaukho_api', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['-created_at', '-id'], name='movie_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='purchase',
+            index=models.Index(fields=['user', '-purchase_date', '-id'], name='purchase_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rental',
+            index=models.Index(fields=['user', '-rental_date', '-id'], name='rental_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tvseries',
+            index=models.Index(fields=['-created_at', '-id'], name='tvseries_created_id_idx'),
+        ),
+    ]
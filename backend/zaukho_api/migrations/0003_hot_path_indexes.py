@@ -0,0 +1,37 @@
+# Generated by Django 5.1.6 on 2026-10-18 08:43
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('zaukho_api', '0002_cursor_pagination_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(condition=models.Q(('is_featured', True)), fields=['-created_at', '-id'], name='movie_featured_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rental',
+            index=models.Index(fields=['user', 'expiry_date'], name='rental_user_expiry_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tvseries',
+            index=models.Index(condition=models.Q(('is_featured', True)), fields=['-created_at', '-id'], name='tvseries_featured_idx'),
+        ),
+        # Case-insensitive username/email lookups in EmailOrUsernameModelBackend.
+        # auth_user belongs to django.contrib.auth, so these are created with raw SQL.
+        migrations.RunSQL(
+            'CREATE INDEX zaukho_user_username_lower_idx ON auth_user (LOWER(username));',
+            reverse_sql='DROP INDEX zaukho_user_username_lower_idx;',
+        ),
+        migrations.RunSQL(
+            'CREATE INDEX zaukho_user_email_lower_idx ON auth_user (LOWER(email));',
+            reverse_sql='DROP INDEX zaukho_user_email_lower_idx;',
+        ),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 5.1.6 on 2026-10-18 08:44
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def grant_existing(apps, schema_editor):
+    """Entitlements for existing purchases and active rentals, as entitlements.rebuild_all() computes them"""
+    Episode = apps.get_model('zaukho_api', 'Episode')
+    Purchase = apps.get_model('zaukho_api', 'Purchase')
+    Rental = apps.get_model('zaukho_api', 'Rental')
+    Entitlement = apps.get_model('zaukho_api', 'Entitlement')
+
+    # (user_id, content_type, object_id) -> expires_at, None for owned
+    grants = {}
+    episodes_by_season = {}
+    for episode_id, season_id in Episode.objects.values_list('id', 'season_id').iterator():
+        episodes_by_season.setdefault(season_id, []).append(episode_id)
+    for user_id, movie_id, season_id in Purchase.objects.values_list('user_id', 'movie_id', 'season_id').iterator():
+        if movie_id:
+            grants[(user_id, 'movie', movie_id)] = None
+        if season_id:
+            grants[(user_id, 'season', season_id)] = None
+            for episode_id in episodes_by_season.get(season_id, ()):
+                grants[(user_id, 'episode', episode_id)] = None
+    rentals = Rental.objects.filter(expiry_date__gt=timezone.now()).values_list(
+        'user_id', 'movie_id', 'episode_id', 'expiry_date'
+    )
+    for user_id, movie_id, episode_id, expiry_date in rentals.iterator():
+        for key in ((user_id, 'movie', movie_id), (user_id, 'episode', episode_id)):
+            # An ownership or a longer rental wins
+            if key[2] and (key not in grants or grants[key] is not None and expiry_date > grants[key]):
+                grants[key] = expiry_date
+
+    Entitlement.objects.bulk_create(
+        (
+            Entitlement(user_id=user_id, content_type=content_type, object_id=object_id, expires_at=expires_at)
+            for (user_id, content_type, object_id), expires_at in grants.items()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('zaukho_api', '0003_hot_path_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Entitlement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_type', models.CharField(choices=[('movie', 'Movie'), ('season', 'TV Season'), ('episode', 'TV Episode')], max_length=10)),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('expires_at', models.DateTimeField(blank=True, help_text='Empty for owned content', null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='entitlements', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'content_type', 'object_id'), name='entitlement_user_content_uniq')],
+            },
+        ),
+        migrations.RunPython(grant_existing, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.1.6 on 2026-10-18 08:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('zaukho_api', '0004_entitlement'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['updated_at'], name='movie_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tvseries',
+            index=models.Index(fields=['updated_at'], name='tvseries_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.1.6 on 2026-10-18 08:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('zaukho_api', '0005_updated_at_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['-release_date', '-id'], name='movie_release_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tvseries',
+            index=models.Index(fields=['-release_date', '-id'], name='tvseries_release_idx'),
+        ),
+    ]
@@ -0,0 +1,64 @@
+from django.db import migrations
+
+
+SQLITE_CREATE = """
+CREATE VIRTUAL TABLE zaukho_api_search_index USING fts5(
+    title, body, tokenize = 'porter unicode61 remove_diacritics 2'
+)
+"""
+
+POSTGRESQL_CREATE = [
+    """
+    CREATE TABLE zaukho_api_search_index (
+        doc_id bigint PRIMARY KEY,
+        title text NOT NULL,
+        body text NOT NULL,
+        document tsvector GENERATED ALWAYS AS (
+            setweight(to_tsvector('english', title), 'A') ||
+            setweight(to_tsvector('english', body), 'B')
+        ) STORED
+    )
+    """,
+    "CREATE INDEX zaukho_api_search_index_document ON zaukho_api_search_index USING GIN (document)",
+]
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(SQLITE_CREATE)
+    elif vendor == 'postgresql':
+        for statement in POSTGRESQL_CREATE:
+            schema_editor.execute(statement)
+    else:
+        return
+
+    # Index the existing catalog. doc_id = pk * 4 + kind code, see zaukho_api.search.
+    id_column = 'rowid' if vendor == 'sqlite' else 'doc_id'
+    for model_name, code in (('Movie', 1), ('TVSeries', 2), ('Episode', 3)):
+        model = apps.get_model('zaukho_api', model_name)
+        rows = [
+            (pk * 4 + code, title, description or '')
+            for pk, title, description in model.objects.values_list('pk', 'title', 'description')
+        ]
+        if rows:
+            with schema_editor.connection.cursor() as cursor:
+                cursor.executemany(
+                    f'INSERT INTO zaukho_api_search_index ({id_column}, title, body) VALUES (%s, %s, %s)', rows
+                )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor in ('sqlite', 'postgresql'):
+        schema_editor.execute('DROP TABLE zaukho_api_search_index')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('zaukho_api', '0006_release_date_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.1.6 on 2026-10-18 08:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('zaukho_api', '0007_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivityBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_type', models.CharField(choices=[('movie', 'Movie'), ('tv_series', 'TV Series'), ('episode', 'TV Episode')], max_length=10)),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('granularity', models.CharField(choices=[('hour', 'Hourly'), ('day', 'Daily')], max_length=4)),
+                ('bucket_start', models.DateTimeField()),
+                ('purchases', models.PositiveIntegerField(default=0)),
+                ('rentals', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['granularity', 'bucket_start'], name='activity_window_idx')],
+                'constraints': [models.UniqueConstraint(fields=('content_type', 'object_id', 'granularity', 'bucket_start'), name='activity_bucket_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='TrendingScore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_type', models.CharField(choices=[('movie', 'Movie'), ('tv_series', 'TV Series'), ('episode', 'TV Episode')], max_length=10)),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('score', models.FloatField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['content_type', '-score'], name='trending_score_idx')],
+                'constraints': [models.UniqueConstraint(fields=('content_type', 'object_id'), name='trending_score_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.6 on 2026-10-18 08:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('zaukho_api', '0008_trending'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ItemNeighbor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_type', models.CharField(choices=[('movie', 'Movie'), ('tv_series', 'TV Series')], max_length=10)),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('neighbor_type', models.CharField(choices=[('movie', 'Movie'), ('tv_series', 'TV Series')], max_length=10)),
+                ('neighbor_id', models.PositiveBigIntegerField()),
+                ('score', models.FloatField()),
+                ('rank', models.PositiveSmallIntegerField()),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('content_type', 'object_id', 'rank'), name='item_neighbor_rank_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.1.6 on 2026-10-18 09:02
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('zaukho_api', '0009_item_neighbor'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RentalArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('content_type', models.CharField(choices=[('movie', 'Movie'), ('episode', 'TV Episode')], max_length=10)),
+                ('rental_date', models.DateTimeField()),
+                ('expiry_date', models.DateTimeField()),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=8)),
+                ('transaction_id', models.CharField(max_length=100, unique=True)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='rental',
+            index=models.Index(fields=['expiry_date', 'id'], name='rental_expiry_idx'),
+        ),
+        migrations.AddField(
+            model_name='rentalarchive',
+            name='episode',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='zaukho_api.episode'),
+        ),
+        migrations.AddField(
+            model_name='rentalarchive',
+            name='movie',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='zaukho_api.movie'),
+        ),
+        migrations.AddField(
+            model_name='rentalarchive',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_rentals', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='rentalarchive',
+            index=models.Index(fields=['user', '-rental_date', '-id'], name='rental_archive_user_date_idx'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.1.6 on 2026-10-18 09:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def populate_identifiers(apps, schema_editor):
+    User = apps.get_model('auth', 'User')
+    LoginIdentifier = apps.get_model('zaukho_api', 'LoginIdentifier')
+    taken = set()
+    rows = []
+    for user_id, username, email in User.objects.order_by('pk').values_list('pk', 'username', 'email').iterator():
+        for kind, value in (('username', username), ('email', email)):
+            identifier = (value or '').strip().lower()
+            if identifier and identifier not in taken:
+                taken.add(identifier)
+                rows.append(LoginIdentifier(identifier=identifier, user_id=user_id, kind=kind))
+    LoginIdentifier.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('zaukho_api', '0010_rental_archive'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LoginIdentifier',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('identifier', models.CharField(max_length=254, unique=True)),
+                ('kind', models.CharField(choices=[('username', 'Username'), ('email', 'Email')], max_length=10)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='login_identifiers', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.RunPython(populate_identifiers, migrations.RunPython.noop),
+    ]
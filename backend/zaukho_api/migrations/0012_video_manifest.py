@@ -0,0 +1,50 @@
+# Generated by Django 5.1.6 on 2026-10-18 09:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('zaukho_api', '0011_login_identifier'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movie',
+            name='video_file',
+            field=models.FileField(blank=True, null=True, upload_to='movies/videos/'),
+        ),
+        migrations.CreateModel(
+            name='VideoManifest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_type', models.CharField(choices=[('movie', 'Movie'), ('episode', 'TV Episode')], max_length=10)),
+                ('source', models.CharField(help_text='Storage name of the video_file it was made from', max_length=255)),
+                ('directory', models.CharField(blank=True, max_length=255)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('ready', 'Ready'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('segment_count', models.PositiveIntegerField(default=0)),
+                ('duration', models.FloatField(blank=True, help_text='Duration in seconds', null=True)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('episode', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='manifests', to='zaukho_api.episode')),
+                ('movie', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='manifests', to='zaukho_api.movie')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='VideoSegment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sequence', models.PositiveIntegerField()),
+                ('name', models.CharField(max_length=100)),
+                ('duration', models.FloatField(help_text='Duration in seconds')),
+                ('size', models.PositiveBigIntegerField(help_text='Size in bytes')),
+                ('manifest', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='segments', to='zaukho_api.videomanifest')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('manifest', 'sequence'), name='video_segment_sequence_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.6 on 2026-10-18 09:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('zaukho_api', '0012_video_manifest'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movie',
+            name='poster_variants',
+            field=models.JSONField(blank=True, default=dict, help_text='Resized copies, see zaukho_api.posters'),
+        ),
+        migrations.AddField(
+            model_name='tvseries',
+            name='poster_variants',
+            field=models.JSONField(blank=True, default=dict, help_text='Resized copies, see zaukho_api.posters'),
+        ),
+    ]
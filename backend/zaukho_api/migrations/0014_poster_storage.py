@@ -0,0 +1,24 @@
+# Generated by Django 5.1.6 on 2026-10-18 09:21
+
+import zaukho_api.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('zaukho_api', '0013_poster_variants'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='movie',
+            name='poster',
+            field=models.ImageField(blank=True, null=True, storage=zaukho_api.storage.poster_storage, upload_to='movies/posters/'),
+        ),
+        migrations.AlterField(
+            model_name='tvseries',
+            name='poster',
+            field=models.ImageField(blank=True, null=True, storage=zaukho_api.storage.poster_storage, upload_to='tv/posters/'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+import math
+
+from django.db import migrations
+
+
+def to_log_space(apps, schema_editor):
+    TrendingScore = apps.get_model('zaukho_api', 'TrendingScore')
+    for score in TrendingScore.objects.filter(score__gt=0).only('id', 'score').iterator():
+        score.score = math.log2(score.score)
+        score.save(update_fields=['score'])
+    # Nothing was ever counted for these
+    TrendingScore.objects.filter(score__lte=0).delete()
+
+
+def from_log_space(apps, schema_editor):
+    TrendingScore = apps.get_model('zaukho_api', 'TrendingScore')
+    for score in TrendingScore.objects.only('id', 'score').iterator():
+        score.score = 2 ** score.score
+        score.save(update_fields=['score'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('zaukho_api', '0014_poster_storage'),
+    ]
+
+    operations = [
+        migrations.RunPython(to_log_space, from_log_space),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.1.6 on 2026-10-18 12:20
+
+from django.conf import settings
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('zaukho_api', '0015_trending_log_scores'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # Login looks up LoginIdentifier (0011), so nothing reads these
+        # expression indexes from 0003 any more; they only slow user writes.
+        migrations.RunSQL(
+            'DROP INDEX zaukho_user_username_lower_idx;',
+            reverse_sql='CREATE INDEX zaukho_user_username_lower_idx ON auth_user (LOWER(username));',
+        ),
+        migrations.RunSQL(
+            'DROP INDEX zaukho_user_email_lower_idx;',
+            reverse_sql='CREATE INDEX zaukho_user_email_lower_idx ON auth_user (LOWER(email));',
+        ),
+    ]
@@ -0,0 +1,160 @@
+import hashlib
+
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Max
+from django.http import Http404
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+from rest_framework import permissions
+from rest_framework.response import Response
+
+from . import response_cache
+from .query_planning import plan_queryset
+
+
+class SparseFieldsetMixin:
+    """
+    ViewSet mixin for the catalog endpoints.
+
+    Uses `list_serializer_class` for the list action and honours the
+    `?fields=` and `?expand=` query parameters (comma separated) on reads.
+    """
+    list_serializer_class = None
+
+    def get_serializer_class(self):
+        if self.action == 'list' and self.list_serializer_class is not None:
+            return self.list_serializer_class
+        return super().get_serializer_class()
+
+    def get_serializer(self, *args, **kwargs):
+        if self.is_read_request():
+            kwargs.setdefault('fields', self.get_query_list('fields'))
+            kwargs.setdefault('expand', self.get_query_list('expand'))
+        return super().get_serializer(*args, **kwargs)
+
+    def is_read_request(self):
+        return self.request is not None and self.request.method in permissions.SAFE_METHODS
+
+    def get_query_list(self, name):
+        """Parse a comma separated query parameter into a list, or None if absent"""
+        value = self.request.query_params.get(name)
+        if not value:
+            return None
+        return [item.strip() for item in value.split(',') if item.strip()]
+
+    def get_ordering_columns(self):
+        """Columns the paginator reads from each row to build its cursor"""
+        ordering = getattr(self.paginator, 'ordering', None) or ()
+        if isinstance(ordering, str):
+            ordering = (ordering,)
+        return [field.lstrip('-') for field in ordering]
+
+    def plan_queryset(self, queryset):
+        """Prefetch what the serializer nests and, on reads, fetch only the columns it renders"""
+        return plan_queryset(
+            queryset,
+            self.get_serializer(),
+            only=self.is_read_request(),
+            extra_columns=self.get_ordering_columns(),
+        )
+
+
+class CachedResponseMixin:
+    """
+    ViewSet mixin that caches the data of public list/retrieve responses.
+
+    The payload is the same for every caller, so it is cached for anyone.
+    Entries are keyed on the path and query parameters plus version tokens:
+    `<cache_resource>:list` for list responses and `<cache_resource>:<pk>`
+    for detail responses. signals.py bumps those tokens when the underlying
+    rows change.
+
+    Validators set by ConditionalGetMixin are cached with the data, so a
+    cached response can still be answered with a 304.
+    """
+    cache_resource = None
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, [f'{self.cache_resource}:list'], super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        pk = kwargs[self.lookup_url_kwarg or self.lookup_field]
+        return self.cached_response(request, [f'{self.cache_resource}:{pk}'], super().retrieve, *args, **kwargs)
+
+    def cached_response(self, request, scopes, handler, *args, **kwargs):
+        key = response_cache.cache_key(request, scopes)
+        cached = response_cache.load(key)
+        if cached is not None:
+            validators = cached['validators']
+            response = not_modified_response(
+                request, validators.get('ETag'), parse_http_date_safe(validators.get('Last-Modified'))
+            ) or Response(cached['data'], headers=validators)
+            response['X-Cache'] = 'HIT'
+            return response
+
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            validators = {
+                header: response[header] for header in ('ETag', 'Last-Modified') if header in response
+            }
+            response_cache.store(key, {'data': response.data, 'validators': validators})
+        response['X-Cache'] = 'MISS'
+        return response
+
+
+def not_modified_response(request, etag, last_modified):
+    """A 304 (or 412) response if the request's conditional headers match, else None"""
+    if etag is None and last_modified is None:
+        return None
+    return get_conditional_response(request, etag=etag, last_modified=last_modified)
+
+
+class ConditionalGetMixin:
+    """
+    ViewSet mixin that sends ETag (and Last-Modified on detail views) and
+    answers If-None-Match / If-Modified-Since with a 304 before serializing.
+
+    Validators come from MAX(`last_modified_field`) and the row count of the
+    filtered queryset, so they cost one aggregate query.
+    """
+    last_modified_field = 'updated_at'
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset()).order_by()
+        state = queryset.aggregate(last_modified=Max(self.last_modified_field), count=Count('pk'))
+        etag = self.make_etag(request, state['last_modified'], state['count'])
+        return self.conditional_response(request, etag, None, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            queryset = self.filter_queryset(self.get_queryset()).filter(
+                **{self.lookup_field: kwargs[lookup_url_kwarg]}
+            )
+            last_modified = queryset.values_list(self.last_modified_field, flat=True).first()
+        except (TypeError, ValueError, ValidationError):
+            # A malformed pk, as in DRF's get_object_or_404()
+            raise Http404
+        if last_modified is None:
+            return super().retrieve(request, *args, **kwargs)
+        etag = self.make_etag(request, last_modified)
+        return self.conditional_response(
+            request, etag, int(last_modified.timestamp()), super().retrieve, *args, **kwargs
+        )
+
+    def make_etag(self, request, *state):
+        # The representation also depends on the query string (?fields=, cursor) and format
+        query = sorted(request.query_params.lists())
+        fingerprint = f'{request.path}?{query}|{request.accepted_renderer.format}|{state}'
+        return '"%s"' % hashlib.md5(fingerprint.encode(), usedforsecurity=False).hexdigest()
+
+    def conditional_response(self, request, etag, last_modified, handler, *args, **kwargs):
+        response = not_modified_response(request, etag, last_modified)
+        if response is not None:
+            return response
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+        return response
@@ -1,6 +1,8 @@
 from django.db import models
 from django.contrib.auth.models import User
 
+from .storage import poster_storage
+
 class Category(models.Model):
     """Category model for organizing movies and TV shows"""
     name = models.CharField(max_length=100)
@@ -18,8 +20,10 @@ class Movie(models.Model):
     description = models.TextField()
     release_date = models.DateField()
     duration = models.IntegerField(help_text="Duration in minutes")
-    poster = models.ImageField(upload_to="movies/posters/", blank=True, null=True)
+    poster = models.ImageField(upload_to="movies/posters/", storage=poster_storage, blank=True, null=True)
+    poster_variants = models.JSONField(default=dict, blank=True, help_text="Resized copies, see zaukho_api.posters")
     trailer_url = models.URLField(blank=True, null=True)
+    video_file = models.FileField(upload_to="movies/videos/", blank=True, null=True)
     categories = models.ManyToManyField(Category, related_name="movies")
     price_buy = models.DecimalField(max_digits=6, decimal_places=2, help_text="Purchase price")
     price_rent = models.DecimalField(max_digits=6, decimal_places=2, help_text="Rental price")
@@ -29,13 +33,27 @@ class Movie(models.Model):
     
     def __str__(self):
         return self.title
+    
+    class Meta:
+        indexes = [
+            # Cursor pagination order
+            models.Index(fields=['-created_at', '-id'], name='movie_created_id_idx'),
+            # ?featured=true listings, in cursor order
+            models.Index(fields=['-created_at', '-id'], condition=models.Q(is_featured=True),
+                         name='movie_featured_idx'),
+            # MAX(updated_at) for conditional GET validators
+            models.Index(fields=['updated_at'], name='movie_updated_idx'),
+            # New releases rail on /api/home/
+            models.Index(fields=['-release_date', '-id'], name='movie_release_idx'),
+        ]
 
 class TVSeries(models.Model):
     """TV Series model for storing TV show information"""
     title = models.CharField(max_length=200)
     description = models.TextField()
     release_date = models.DateField()
-    poster = models.ImageField(upload_to="tv/posters/", blank=True, null=True)
+    poster = models.ImageField(upload_to="tv/posters/", storage=poster_storage, blank=True, null=True)
+    poster_variants = models.JSONField(default=dict, blank=True, help_text="Resized copies, see zaukho_api.posters")
     trailer_url = models.URLField(blank=True, null=True)
     categories = models.ManyToManyField(Category, related_name="tv_series")
     is_featured = models.BooleanField(default=False)
@@ -47,6 +65,17 @@ class TVSeries(models.Model):
     
     class Meta:
         verbose_name_plural = "TV Series"
+        indexes = [
+            # Cursor pagination order
+            models.Index(fields=['-created_at', '-id'], name='tvseries_created_id_idx'),
+            # ?featured=true listings, in cursor order
+            models.Index(fields=['-created_at', '-id'], condition=models.Q(is_featured=True),
+                         name='tvseries_featured_idx'),
+            # MAX(updated_at) for conditional GET validators
+            models.Index(fields=['updated_at'], name='tvseries_updated_idx'),
+            # New releases rail on /api/home/
+            models.Index(fields=['-release_date', '-id'], name='tvseries_release_idx'),
+        ]
 
 class Season(models.Model):
     """Season model for TV series"""
@@ -78,6 +107,54 @@ class Episode(models.Model):
     class Meta:
         unique_together = ('season', 'episode_number')
 
+class VideoManifest(models.Model):
+    """
+    HLS rendition of a movie's or episode's video_file, made by
+    zaukho_api.ingest. The playlist and its segments are stored under
+    `directory` in the default storage.
+    """
+    CONTENT_TYPES = (
+        ('movie', 'Movie'),
+        ('episode', 'TV Episode'),
+    )
+    STATUSES = (
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('ready', 'Ready'),
+        ('failed', 'Failed'),
+    )
+    
+    content_type = models.CharField(max_length=10, choices=CONTENT_TYPES)
+    movie = models.ForeignKey(Movie, null=True, blank=True, related_name="manifests", on_delete=models.CASCADE)
+    episode = models.ForeignKey(Episode, null=True, blank=True, related_name="manifests", on_delete=models.CASCADE)
+    source = models.CharField(max_length=255, help_text="Storage name of the video_file it was made from")
+    directory = models.CharField(max_length=255, blank=True)
+    status = models.CharField(max_length=10, choices=STATUSES, default='pending')
+    segment_count = models.PositiveIntegerField(default=0)
+    duration = models.FloatField(blank=True, null=True, help_text="Duration in seconds")
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.content_type} {self.movie_id or self.episode_id} HLS ({self.status})"
+
+class VideoSegment(models.Model):
+    """One media segment of a VideoManifest, in playlist order"""
+    manifest = models.ForeignKey(VideoManifest, related_name="segments", on_delete=models.CASCADE)
+    sequence = models.PositiveIntegerField()
+    name = models.CharField(max_length=100)
+    duration = models.FloatField(help_text="Duration in seconds")
+    size = models.PositiveBigIntegerField(help_text="Size in bytes")
+    
+    def __str__(self):
+        return f"{self.manifest_id}/{self.name}"
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['manifest', 'sequence'], name='video_segment_sequence_uniq'),
+        ]
+
 class Purchase(models.Model):
     """Model to track user purchases"""
     CONTENT_TYPES = (
@@ -96,6 +173,12 @@ class Purchase(models.Model):
     def __str__(self):
         content = self.movie.title if self.movie else self.season.__str__()
         return f"{self.user.username} purchased {content} on {self.purchase_date.strftime('%Y-%m-%d')}"
+    
+    class Meta:
+        indexes = [
+            # Cursor pagination order within a user's purchases
+            models.Index(fields=['user', '-purchase_date', '-id'], name='purchase_user_date_idx'),
+        ]
 
 class Rental(models.Model):
     """Model to track user rentals"""
@@ -116,3 +199,167 @@ class Rental(models.Model):
     def __str__(self):
         content = self.movie.title if self.movie else self.episode.__str__()
         return f"{self.user.username} rented {content} until {self.expiry_date.strftime('%Y-%m-%d %H:%M')}"
+    
+    class Meta:
+        indexes = [
+            # Cursor pagination order within a user's rentals
+            models.Index(fields=['user', '-rental_date', '-id'], name='rental_user_date_idx'),
+            # Active rental lookup in my_library
+            models.Index(fields=['user', 'expiry_date'], name='rental_user_expiry_idx'),
+            # Expiry sweep (zaukho_api.expiry)
+            models.Index(fields=['expiry_date', 'id'], name='rental_expiry_idx'),
+        ]
+
+class RentalArchive(models.Model):
+    """
+    Expired rentals, moved out of Rental by `manage.py expire_rentals` so
+    the Rental table only holds active rows. Keeps the original primary key.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, related_name="archived_rentals", on_delete=models.CASCADE)
+    content_type = models.CharField(max_length=10, choices=Rental.CONTENT_TYPES)
+    movie = models.ForeignKey(Movie, null=True, blank=True, related_name='+', on_delete=models.SET_NULL)
+    episode = models.ForeignKey(Episode, null=True, blank=True, related_name='+', on_delete=models.SET_NULL)
+    rental_date = models.DateTimeField()
+    expiry_date = models.DateTimeField()
+    amount = models.DecimalField(max_digits=8, decimal_places=2)
+    transaction_id = models.CharField(max_length=100, unique=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.user_id} rented {self.content_type} until {self.expiry_date.strftime('%Y-%m-%d %H:%M')} (archived)"
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-rental_date', '-id'], name='rental_archive_user_date_idx'),
+        ]
+
+class Entitlement(models.Model):
+    """
+    Denormalized record of what a user may watch, kept in sync from
+    Purchase and Rental rows (see zaukho_api.entitlements).
+
+    A season purchase also grants every episode of the season, so playback
+    checks never have to walk from an episode back to its season.
+    """
+    CONTENT_TYPES = (
+        ('movie', 'Movie'),
+        ('season', 'TV Season'),
+        ('episode', 'TV Episode'),
+    )
+    
+    user = models.ForeignKey(User, related_name="entitlements", on_delete=models.CASCADE)
+    content_type = models.CharField(max_length=10, choices=CONTENT_TYPES)
+    object_id = models.PositiveBigIntegerField()
+    expires_at = models.DateTimeField(blank=True, null=True, help_text="Empty for owned content")
+    
+    def __str__(self):
+        until = f"until {self.expires_at.strftime('%Y-%m-%d %H:%M')}" if self.expires_at else "permanently"
+        return f"{self.user_id} may watch {self.content_type} {self.object_id} {until}"
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'content_type', 'object_id'], name='entitlement_user_content_uniq'),
+        ]
+
+class ActivityBucket(models.Model):
+    """Purchase and rental counts of one title over one hour or one day"""
+    CONTENT_TYPES = (
+        ('movie', 'Movie'),
+        ('tv_series', 'TV Series'),
+        ('episode', 'TV Episode'),
+    )
+    GRANULARITIES = (
+        ('hour', 'Hourly'),
+        ('day', 'Daily'),
+    )
+    
+    content_type = models.CharField(max_length=10, choices=CONTENT_TYPES)
+    object_id = models.PositiveBigIntegerField()
+    granularity = models.CharField(max_length=4, choices=GRANULARITIES)
+    bucket_start = models.DateTimeField()
+    purchases = models.PositiveIntegerField(default=0)
+    rentals = models.PositiveIntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.content_type} {self.object_id} {self.granularity} of {self.bucket_start:%Y-%m-%d %H:%M}"
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['content_type', 'object_id', 'granularity', 'bucket_start'],
+                name='activity_bucket_uniq',
+            ),
+        ]
+        indexes = [
+            # Windowed rollups and pruning
+            models.Index(fields=['granularity', 'bucket_start'], name='activity_window_idx'),
+        ]
+
+class TrendingScore(models.Model):
+    """
+    Time-decayed popularity of a title (see zaukho_api.trending).
+    Scores are stored relative to a fixed epoch, as base-2 logarithms, so
+    that they only ever grow and their order never has to be recomputed as
+    time passes.
+    """
+    content_type = models.CharField(max_length=10, choices=ActivityBucket.CONTENT_TYPES)
+    object_id = models.PositiveBigIntegerField()
+    score = models.FloatField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.content_type} {self.object_id}: {self.score:.3g}"
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['content_type', 'object_id'], name='trending_score_uniq'),
+        ]
+        indexes = [
+            # Top-N per content type
+            models.Index(fields=['content_type', '-score'], name='trending_score_idx'),
+        ]
+
+class ItemNeighbor(models.Model):
+    """
+    One of the top-K most similar titles to a title, precomputed by
+    `manage.py build_recommendations` (see zaukho_api.recommendations).
+    """
+    CONTENT_TYPES = (
+        ('movie', 'Movie'),
+        ('tv_series', 'TV Series'),
+    )
+    
+    content_type = models.CharField(max_length=10, choices=CONTENT_TYPES)
+    object_id = models.PositiveBigIntegerField()
+    neighbor_type = models.CharField(max_length=10, choices=CONTENT_TYPES)
+    neighbor_id = models.PositiveBigIntegerField()
+    score = models.FloatField()
+    rank = models.PositiveSmallIntegerField()
+    
+    def __str__(self):
+        return f"{self.content_type} {self.object_id} -> {self.neighbor_type} {self.neighbor_id} ({self.score:.3f})"
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['content_type', 'object_id', 'rank'], name='item_neighbor_rank_uniq'),
+        ]
+
+class LoginIdentifier(models.Model):
+    """
+    Normalized (lower-cased) username or email a user can log in with,
+    kept in sync from User by signals.py. The unique index makes login a
+    single equality lookup. If two users share an email, the identifier
+    belongs to the one who had it first.
+    """
+    KINDS = (
+        ('username', 'Username'),
+        ('email', 'Email'),
+    )
+    
+    identifier = models.CharField(max_length=254, unique=True)
+    user = models.ForeignKey(User, related_name="login_identifiers", on_delete=models.CASCADE)
+    kind = models.CharField(max_length=10, choices=KINDS)
+    
+    def __str__(self):
+        return f"{self.identifier} ({self.kind}) -> {self.user_id}"
@@ -0,0 +1,62 @@
+from rest_framework.pagination import CursorPagination
+
+
+class CatalogCursorPagination(CursorPagination):
+    """
+    Keyset pagination over (created_at, id) for catalog listings.
+
+    Avoids the COUNT(*) and OFFSET scans of page number pagination, so deep
+    pages cost the same as the first one. Clients may pass ?page_size= up to
+    `max_page_size`.
+    """
+    ordering = ('-created_at', '-id')
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        paginate_queryset() for async views. The parent method's only query
+        is list(queryset[a:b]): a first pass records that slice, the rows are
+        fetched with the async ORM, and a second pass pages over them.
+        """
+        probe = _SliceRecorder(queryset)
+        self.paginate_queryset(probe, request, view)
+        if not probe.sliced:
+            return None
+        rows = [row async for row in probe.queryset]
+        return self.paginate_queryset(_SliceRecorder(queryset, rows), request, view)
+
+
+class PurchaseCursorPagination(CatalogCursorPagination):
+    """Keyset pagination over a user's purchases, newest first"""
+    ordering = ('-purchase_date', '-id')
+
+
+class RentalCursorPagination(CatalogCursorPagination):
+    """Keyset pagination over a user's rentals, newest first"""
+    ordering = ('-rental_date', '-id')
+
+
+class _SliceRecorder:
+    """
+    Stands in for the queryset given to CursorPagination.paginate_queryset,
+    which only calls order_by(), filter() and slices it once. Records the
+    final queryset and answers the slice with `rows`.
+    """
+    def __init__(self, queryset, rows=()):
+        self.queryset = queryset
+        self.rows = list(rows)
+        self.sliced = False
+
+    def order_by(self, *fields):
+        self.queryset = self.queryset.order_by(*fields)
+        return self
+
+    def filter(self, *args, **kwargs):
+        self.queryset = self.queryset.filter(*args, **kwargs)
+        return self
+
+    def __getitem__(self, key):
+        self.queryset = self.queryset[key]
+        self.sliced = True
+        return self.rows
@@ -0,0 +1,338 @@
+import multiprocessing
+import os
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Count, Max, Min
+from django.utils import timezone
+
+from . import auth_backends, entitlements, search, synthetic, trending
+from .models import (
+    ActivityBucket, Category, Entitlement, Episode, ItemNeighbor, LoginIdentifier, Movie, Purchase, Rental,
+    RentalArchive, Season, TrendingScore, TVSeries,
+)
+
+# Bulk loading of the catalog, for populate_db.py and the synthetic
+# datasets of `manage.py generate_catalog`. Rows go in with bulk_create()
+# and explicit primary keys, so no signal fires: the search index,
+# entitlements, trending scores and login identifiers are built in bulk
+# afterwards, and the cache is cleared once the load commits.
+
+# Row counts at --scale 1
+SCALE = {
+    'movies': 100_000,
+    'tv_series': 10_000,
+    'users': 1_000_000,
+    'purchases': 10_000_000,
+    'rentals': 2_000_000,
+}
+
+# Tables emptied before a load, together with every table that references them
+CLEARED = [
+    Category, Movie, TVSeries, Purchase, Rental, RentalArchive, Entitlement, ActivityBucket, TrendingScore,
+    ItemNeighbor,
+]
+
+
+def counts(scale, **overrides):
+    """Row counts for `scale`; overrides that aren't None win"""
+    result = {name: int(count * scale) for name, count in SCALE.items()}
+    result.update({name: count for name, count in overrides.items() if count is not None})
+    return result
+
+
+def pool(max_workers=None):
+    return ProcessPoolExecutor(
+        max_workers=max_workers or os.cpu_count(),
+        mp_context=multiprocessing.get_context('spawn'),
+    )
+
+
+def _tables(models):
+    """db tables of `models` and of everything that cascades from them, M2M through tables included"""
+    seen = []
+    pending = list(models)
+    while pending:
+        model = pending.pop()
+        if model in seen:
+            continue
+        seen.append(model)
+        pending.extend(
+            field.related_model for field in model._meta.get_fields(include_hidden=True)
+            if field.auto_created and not field.concrete and (field.one_to_many or field.one_to_one)
+        )
+    return [model._meta.db_table for model in seen]
+
+
+def truncate(users=False):
+    """
+    Empty the catalog and activity tables (and, with `users`, every user)
+    with one flush statement per table instead of a cascading delete()
+    """
+    tables = _tables(CLEARED + [User] if users else CLEARED)
+    connection.ops.execute_sql_flush(connection.ops.sql_flush(no_style(), tables, reset_sequences=True))
+
+
+def reset_sequences(*models):
+    """Move id sequences past rows inserted with explicit ids (a no-op on SQLite)"""
+    statements = connection.ops.sequence_reset_sql(no_style(), models)
+    if statements:
+        with connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+
+
+@contextmanager
+def given_dates(*fields):
+    """Keep the values set on auto_now_add `fields`, which bulk_create() would stamp with the current time"""
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def _chunks(total, size):
+    for start in range(1, total + 1, size):
+        yield start, min(start + size, total + 1)
+
+
+def _user_ids():
+    """
+    Ids of the existing users, in a form that is cheap to send with every
+    task: a range when they have no gaps, else an array of 8-byte ints
+    """
+    stats = User.objects.aggregate(first=Min('id'), last=Max('id'), count=Count('id'))
+    if not stats['count']:
+        return range(0)
+    if stats['last'] - stats['first'] + 1 == stats['count']:
+        return range(stats['first'], stats['last'] + 1)
+    return array('q', User.objects.order_by('id').values_list('id', flat=True).iterator())
+
+
+def _results(executor, function, tasks, window):
+    """Results of function(*task) in order, with at most `window` tasks in flight"""
+    pending = deque()
+    for task in tasks:
+        pending.append(executor.submit(function, *task))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def insert_categories(rows, batch_size):
+    """rows: [(id, name, description)]"""
+    Category.objects.bulk_create(
+        [Category(id=pk, name=name, description=description) for pk, name, description in rows],
+        batch_size=batch_size,
+    )
+
+
+def insert_movies(rows, links, batch_size):
+    """rows and links as returned by synthetic.movies()"""
+    Movie.objects.bulk_create(
+        [
+            Movie(
+                id=pk, title=title, description=description, release_date=released, duration=duration,
+                price_buy=price_buy, price_rent=price_rent, is_featured=featured,
+            )
+            for pk, title, description, released, duration, price_buy, price_rent, featured in rows
+        ],
+        batch_size=batch_size,
+    )
+    through = Movie.categories.through
+    through.objects.bulk_create(
+        [through(movie_id=movie_id, category_id=category_id) for movie_id, category_id in links],
+        batch_size=batch_size,
+    )
+
+
+def insert_tv_series(rows, links, seasons, episodes, batch_size):
+    """rows, links, seasons and episodes as returned by synthetic.tv_series()"""
+    TVSeries.objects.bulk_create(
+        [
+            TVSeries(id=pk, title=title, description=description, release_date=released, is_featured=featured)
+            for pk, title, description, released, featured in rows
+        ],
+        batch_size=batch_size,
+    )
+    through = TVSeries.categories.through
+    through.objects.bulk_create(
+        [through(tvseries_id=tv_series_id, category_id=category_id) for tv_series_id, category_id in links],
+        batch_size=batch_size,
+    )
+    Season.objects.bulk_create(
+        [
+            Season(
+                id=pk, tv_series_id=tv_series_id, season_number=number, title=title, release_date=released,
+                price_buy=price_buy,
+            )
+            for pk, tv_series_id, number, title, released, price_buy in seasons
+        ],
+        batch_size=batch_size,
+    )
+    Episode.objects.bulk_create(
+        [
+            Episode(
+                id=pk, season_id=season_id, episode_number=number, title=title, description=description,
+                duration=duration, price_rent=price_rent,
+            )
+            for pk, season_id, number, title, description, duration, price_rent in episodes
+        ],
+        batch_size=batch_size,
+    )
+
+
+def insert_users(rows, password, now, batch_size):
+    """rows: [(id, username, email)], all with the same `password` hash"""
+    User.objects.bulk_create(
+        [
+            User(id=pk, username=username, email=email, password=password, date_joined=now)
+            for pk, username, email in rows
+        ],
+        batch_size=batch_size,
+    )
+    LoginIdentifier.objects.bulk_create(
+        [
+            LoginIdentifier(identifier=auth_backends.normalize(value), user_id=pk, kind=kind)
+            for pk, username, email in rows
+            for kind, value in (('username', username), ('email', email))
+        ],
+        batch_size=batch_size,
+    )
+
+
+def insert_purchases(rows, batch_size):
+    """rows as returned by synthetic.purchases()"""
+    with given_dates(Purchase._meta.get_field('purchase_date')):
+        Purchase.objects.bulk_create(
+            [
+                Purchase(
+                    user_id=user_id, content_type=content_type, movie_id=movie_id, season_id=season_id,
+                    purchase_date=purchased, amount=amount, transaction_id=transaction_id,
+                )
+                for user_id, content_type, movie_id, season_id, purchased, amount, transaction_id in rows
+            ],
+            batch_size=batch_size,
+        )
+
+
+def insert_rentals(rows, batch_size):
+    """rows as returned by synthetic.rentals()"""
+    with given_dates(Rental._meta.get_field('rental_date')):
+        Rental.objects.bulk_create(
+            [
+                Rental(
+                    user_id=user_id, content_type=content_type, movie_id=movie_id, episode_id=episode_id,
+                    rental_date=rented, expiry_date=expires, amount=amount, transaction_id=transaction_id,
+                )
+                for user_id, content_type, movie_id, episode_id, rented, expires, amount, transaction_id in rows
+            ],
+            batch_size=batch_size,
+        )
+
+
+def rebuild_derived(batch_size=5000):
+    """Build what the skipped signals would have maintained; returns {name: rows}"""
+    result = {
+        'search documents': search.rebuild(batch_size=batch_size),
+        'entitlements': entitlements.rebuild_all(batch_size=batch_size),
+        'trending titles': trending.rebuild(batch_size=batch_size),
+    }
+    # Cached responses and version tokens refer to the rows just replaced
+    transaction.on_commit(cache.clear)
+    return result
+
+
+def generate(counts, seed=0, workers=None, chunk_size=10_000, batch_size=5000, password=None, days=365,
+             replace_users=False, progress=None):
+    """
+    Replace the catalog, and with counts['users'] the users, by a synthetic
+    dataset of `counts` rows in one transaction. Rows are generated by
+    zaukho_api.synthetic on a pool of `workers` processes, `chunk_size` at
+    a time, and inserted here as they arrive. Purchases and rentals go to
+    the existing users when no users are generated. Generated users replace
+    existing ones, admins included, only with `replace_users`.
+    `progress(name, rows)` is called after each table. Returns {name: rows}.
+    """
+    progress = progress or (lambda name, rows: None)
+    workers = workers or os.cpu_count()
+    window = workers * 2
+    now = timezone.now()
+    result = {}
+    if counts['users'] and not replace_users and User.objects.exists():
+        raise ValueError("Generating users deletes the existing ones; allow it with --replace-users or pass --users 0")
+
+    with transaction.atomic(), pool(workers) as executor:
+        truncate(users=counts['users'] > 0)
+        insert_categories(
+            [(pk, name, description) for pk, (name, description) in enumerate(synthetic.CATEGORIES, start=1)],
+            batch_size,
+        )
+        categories = result['categories'] = len(synthetic.CATEGORIES)
+        progress('categories', categories)
+
+        tasks = [(seed, start, stop, categories) for start, stop in _chunks(counts['movies'], chunk_size)]
+        for rows, links in _results(executor, synthetic.movies, tasks, window):
+            insert_movies(rows, links, batch_size)
+        result['movies'] = counts['movies']
+        progress('movies', counts['movies'])
+
+        # Season and episode ids of each chunk follow from the layouts of the series before it
+        tasks, seasons, episodes = [], 0, 0
+        for start, stop in _chunks(counts['tv_series'], chunk_size):
+            tasks.append((seed, start, stop, categories, seasons + 1, episodes + 1))
+            for pk in range(start, stop):
+                layout = synthetic.layout(seed, pk)
+                seasons += len(layout)
+                episodes += sum(layout)
+        for rows in _results(executor, synthetic.tv_series, tasks, window):
+            insert_tv_series(*rows, batch_size)
+        result.update(tv_series=counts['tv_series'], seasons=seasons, episodes=episodes)
+        progress('tv series', counts['tv_series'])
+        progress('seasons', seasons)
+        progress('episodes', episodes)
+
+        if counts['users']:
+            hashed = make_password(password)
+            tasks = [(seed, start, stop) for start, stop in _chunks(counts['users'], chunk_size)]
+            for rows in _results(executor, synthetic.users, tasks, window):
+                insert_users(rows, hashed, now, batch_size)
+            user_ids = range(1, counts['users'] + 1)
+            result['users'] = counts['users']
+            progress('users', counts['users'])
+        else:
+            user_ids = _user_ids()
+        if not user_ids and (counts['purchases'] or counts['rentals']):
+            raise ValueError("Purchases and rentals need users")
+        if not (counts['movies'] or seasons) and (counts['purchases'] or counts['rentals']):
+            raise ValueError("Purchases and rentals need movies or TV series")
+
+        for name, function, insert, titles in (
+            ('purchases', synthetic.purchases, insert_purchases, seasons),
+            ('rentals', synthetic.rentals, insert_rentals, episodes),
+        ):
+            tasks = [
+                (seed, start, stop, user_ids, counts['movies'], titles, now, days)
+                for start, stop in _chunks(counts[name], chunk_size)
+            ]
+            for rows in _results(executor, function, tasks, window):
+                insert(rows, batch_size)
+            result[name] = counts[name]
+            progress(name, counts[name])
+
+        reset_sequences(Category, Movie, TVSeries, Season, Episode, *([User] if counts['users'] else []))
+        for name, rows in rebuild_derived(batch_size).items():
+            result[name] = rows
+            progress(name, rows)
+    return result
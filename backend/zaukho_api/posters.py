@@ -0,0 +1,136 @@
+import functools
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+
+from . import images
+from .models import Movie, TVSeries
+
+logger = logging.getLogger(__name__)
+
+# Smaller copies of Movie and TVSeries posters for browse rails. Saving a
+# new poster clears the title's `poster_variants` and, after commit, renders
+# POSTER_WIDTHS in WebP and JPEG on a pool of POSTER_MAX_WORKERS spawned
+# processes. The result is stored on the title as
+# {'source': <poster name>, 'webp': {'<width>': <name>}, 'jpeg': {...}}.
+
+MODELS = {
+    'movie': Movie,
+    'tv_series': TVSeries,
+}
+DIRECTORY = 'posters/variants'
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def pool(max_workers=None):
+    return ProcessPoolExecutor(
+        max_workers=max_workers or getattr(settings, 'POSTER_MAX_WORKERS', 2),
+        mp_context=multiprocessing.get_context('spawn'),
+    )
+
+
+def _pool():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = pool()
+        return _executor
+
+
+def is_current(instance):
+    """True if the title's variants were made from its current poster"""
+    return instance.poster_variants.get('source') == (instance.poster.name or None)
+
+
+def poster_changing(instance):
+    """pre_save: variants of a previous poster must not outlive it"""
+    if instance.poster_variants and not is_current(instance):
+        instance.poster_variants = {}
+
+
+def poster_saved(instance, content_type, update_fields=None, queue=None):
+    """post_save: with `queue` (default POSTER_VARIANTS_ON_SAVE), render variants of a new poster after commit"""
+    if update_fields is not None and 'poster' not in update_fields:
+        return
+    if not instance.poster or is_current(instance):
+        return
+    if queue if queue is not None else getattr(settings, 'POSTER_VARIANTS_ON_SAVE', True):
+        pk, source = instance.pk, instance.poster.name
+        transaction.on_commit(lambda: enqueue(content_type, pk, source))
+
+
+def _task(source):
+    return functools.partial(
+        images.render_variants, default_storage.path(source), settings.MEDIA_ROOT, DIRECTORY,
+        getattr(settings, 'POSTER_WIDTHS', (160, 320, 480, 720)),
+        quality=getattr(settings, 'POSTER_QUALITY', 80),
+    )
+
+
+def submit(pool, source):
+    return pool.submit(_task(source))
+
+
+def enqueue(content_type, pk, source):
+    future = submit(_pool(), source)
+    future.add_done_callback(lambda future: _done(content_type, pk, source, future))
+    return future
+
+
+def finish(content_type, pk, source, future):
+    """Record the outcome of a future returned by submit(); returns the variants or None"""
+    error = future.exception()
+    if error is not None:
+        logger.error("Poster variants failed", extra={
+            'content_type': content_type, 'object_id': pk, 'source': source, 'error': str(error),
+        })
+        return None
+    return record(content_type, pk, source, future.result())
+
+
+def _done(content_type, pk, source, future):
+    # Runs on the pool's management thread, which has its own connection
+    try:
+        finish(content_type, pk, source, future)
+    finally:
+        close_old_connections()
+
+
+def run(content_type, pk, source):
+    """Render and record variants in this process"""
+    return record(content_type, pk, source, _task(source)())
+
+
+def record(content_type, pk, source, variants):
+    """
+    Store variants on the title unless its poster changed meanwhile. Saved
+    through the model so the usual signals invalidate cached responses.
+    """
+    instance = MODELS[content_type].objects.filter(pk=pk).first()
+    if instance is None or instance.poster.name != source:
+        return None
+    instance.poster_variants = {
+        'source': source,
+        **{image_format: {str(width): name for width, name in sizes.items()} for image_format, sizes in variants.items()},
+    }
+    instance.save(update_fields=['poster_variants', 'updated_at'])
+    return instance.poster_variants
+
+
+def srcset(variants, image_format, build_url=None):
+    """`url 160w, url 320w, ...` for one format of `poster_variants`, or None"""
+    sizes = variants.get(image_format) if variants else None
+    if not sizes:
+        return None
+    build_url = build_url or (lambda url: url)
+    return ', '.join(
+        f'{build_url(default_storage.url(name))} {width}w'
+        for width, name in sorted(sizes.items(), key=lambda item: int(item[0]))
+    )
@@ -0,0 +1,223 @@
+import atexit
+import hmac
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse
+
+# Histograms served at /metrics in the Prometheus text format, labelled by
+# view: `MovieViewSet.list`, `login_view`, `async.my_library`, ...
+#
+# Observations go to a shard owned by the calling thread, so recording one
+# takes no lock. Under gunicorn each worker also writes its totals to
+# METRICS_MULTIPROC_DIR/metrics-<pid>.json every METRICS_FLUSH_INTERVAL
+# seconds, and /metrics adds up the files of every worker, past and present.
+
+HISTOGRAMS = {
+    'zaukho_request_duration_seconds': (
+        "Time spent handling the request",
+        (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+    ),
+    'zaukho_request_queries': (
+        "SQL queries run while handling the request",
+        (0, 1, 2, 5, 10, 20, 50, 100),
+    ),
+    'zaukho_response_size_bytes': (
+        "Size of the response body",
+        (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304),
+    ),
+}
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class ShardedHistograms:
+    """
+    Histograms kept as one dict per thread. A series is a list of
+    per-bucket counts (the last bucket is +Inf) followed by the sum of the
+    observed values. Shards outlive their threads so no count is lost.
+    """
+    def __init__(self, histograms):
+        self.bounds = {name: bounds for name, (_, bounds) in histograms.items()}
+        self.reset()
+
+    def reset(self):
+        self._local = threading.local()
+        self._shards = []
+        self._lock = threading.Lock()
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._shards.append(shard)
+        return shard
+
+    def observe(self, name, label, value):
+        shard = self._shard()
+        bounds = self.bounds[name]
+        series = shard.get((name, label))
+        if series is None:
+            series = shard[(name, label)] = [0] * (len(bounds) + 2)
+        series[bisect_left(bounds, value)] += 1
+        series[-1] += value
+
+    def snapshot(self):
+        """The totals of every shard, keyed by (name, label)"""
+        with self._lock:
+            shards = list(self._shards)
+        totals = {}
+        for shard in shards:
+            # list() copies the items without letting the owning thread run
+            for key, series in list(shard.items()):
+                _add(totals, key, series)
+        return totals
+
+
+def _add(totals, key, series):
+    current = totals.get(key)
+    if current is None:
+        totals[key] = list(series)
+    elif len(current) == len(series):
+        for i, value in enumerate(series):
+            current[i] += value
+
+
+histograms = ShardedHistograms(HISTOGRAMS)
+
+
+def view_label(request):
+    """`ViewSet.action` for viewsets, the function name for other views"""
+    match = request.resolver_match
+    if match is None:
+        return 'unmatched'
+    func = match.func
+    cls = getattr(func, 'cls', None)
+    if cls is not None:
+        # api_view() names its APIView subclass after the function
+        actions = getattr(func, 'actions', None)
+        if actions:
+            method = request.method.lower()
+            return f'{cls.__name__}.{actions.get(method, method)}'
+        return cls.__name__
+    name = getattr(func, '__name__', type(func).__name__)
+    return f'async.{name}' if iscoroutinefunction(func) else name
+
+
+def observe_request(request, response, metrics):
+    label = view_label(request)
+    histograms.observe('zaukho_request_duration_seconds', label, metrics.duration)
+    histograms.observe('zaukho_request_queries', label, metrics.db_queries)
+    if not response.streaming:
+        histograms.observe('zaukho_response_size_bytes', label, len(response.content))
+    if _directory() is not None and _flusher_pid != os.getpid():
+        _start_flusher()
+
+
+def _directory():
+    directory = getattr(settings, 'METRICS_MULTIPROC_DIR', None) or os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    return Path(directory) if directory else None
+
+
+def flush():
+    """Write this process's totals to its file in METRICS_MULTIPROC_DIR"""
+    directory = _directory()
+    if directory is None:
+        return
+    directory.mkdir(parents=True, exist_ok=True)
+    data = {f'{name}\t{label}': series for (name, label), series in histograms.snapshot().items()}
+    path = directory / f'metrics-{os.getpid()}.json'
+    tmp = path.with_suffix('.tmp')
+    tmp.write_text(json.dumps(data))
+    os.replace(tmp, path)
+
+
+_flusher_pid = None
+_flusher_lock = threading.Lock()
+
+
+def _start_flusher():
+    global _flusher_pid
+    with _flusher_lock:
+        if _flusher_pid == os.getpid():
+            return
+        _flusher_pid = os.getpid()
+
+    def run():
+        interval = getattr(settings, 'METRICS_FLUSH_INTERVAL', 5)
+        while True:
+            time.sleep(interval)
+            flush()
+
+    threading.Thread(target=run, name='zaukho-metrics-flush', daemon=True).start()
+    atexit.register(flush)
+
+
+def collect():
+    """Totals across every process that wrote to METRICS_MULTIPROC_DIR, or this process's alone"""
+    directory = _directory()
+    if directory is None:
+        return histograms.snapshot()
+    flush()
+    totals = {}
+    for path in directory.glob('metrics-*.json'):
+        try:
+            data = json.loads(path.read_text())
+        except (OSError, ValueError):
+            continue  # a worker's file being replaced
+        for key, series in data.items():
+            name, label = key.split('\t', 1)
+            if name in HISTOGRAMS and len(series) == len(HISTOGRAMS[name][1]) + 2:
+                _add(totals, (name, label), series)
+    return totals
+
+
+def _escape(value):
+    return value.replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(totals):
+    """Prometheus text exposition of `totals`"""
+    lines = []
+    for name, (help_text, bounds) in HISTOGRAMS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} histogram')
+        for (series_name, label), series in sorted(totals.items()):
+            if series_name != name:
+                continue
+            view = f'view="{_escape(label)}"'
+            cumulative = 0
+            for bound, count in zip(list(bounds) + ['+Inf'], series[:-1]):
+                cumulative += count
+                le = bound if bound == '+Inf' else _number(float(bound))
+                lines.append(f'{name}_bucket{{{view},le="{le}"}} {cumulative}')
+            lines.append(f'{name}_sum{{{view}}} {_number(series[-1])}')
+            lines.append(f'{name}_count{{{view}}} {cumulative}')
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """
+    GET /metrics. When METRICS_TOKEN is set, scrapers must send it as
+    `Authorization: Bearer <token>`.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return HttpResponse(status=401)
+    return HttpResponse(render(collect()), content_type=CONTENT_TYPE)
+
+
+if hasattr(os, 'register_at_fork'):
+    # A forked worker starts with no observations and its own flush thread
+    os.register_at_fork(after_in_child=histograms.reset)
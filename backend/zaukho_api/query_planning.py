@@ -0,0 +1,90 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+
+
+def plan_queryset(queryset, serializer, only=False, extra_columns=()):
+    """
+    Apply select_related/prefetch_related to a queryset based on the
+    nested fields of a serializer, so that serializing any number of rows
+    costs a fixed number of queries.
+
+    `serializer` may be a serializer class or an instance. With `only=True`
+    the queryset is also restricted with .only() to the columns the
+    serializer reads, when all of them can be resolved to model fields.
+    """
+    if isinstance(serializer, type):
+        serializer = serializer()
+    select, prefetch, columns = _collect(serializer, queryset.model, prefix='', only=only)
+    if select:
+        queryset = queryset.select_related(*select)
+    if prefetch:
+        queryset = queryset.prefetch_related(*prefetch)
+    if only and columns is not None:
+        queryset = queryset.only(*columns, *extra_columns)
+    return queryset
+
+
+def _model_field(model, name):
+    try:
+        return model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return None
+
+
+def _collect(serializer, model, prefix, only):
+    """
+    Walk a serializer's fields and return (select_related, prefetch_related, columns).
+
+    `columns` is None when some field reads something other than a model
+    field (a property, a method, a dotted source), in which case the rows
+    can't be safely restricted with .only().
+    """
+    select = []
+    prefetch = []
+    columns = []
+
+    for field in serializer.fields.values():
+        if field.write_only:
+            continue
+        source = field.source
+        if not source or source == '*' or '.' in source:
+            columns = None
+            continue
+        model_field = _model_field(model, source)
+        if model_field is None:
+            columns = None
+            continue
+        lookup = prefix + source
+
+        if isinstance(field, serializers.ListSerializer):
+            child = field.child
+            if isinstance(child, serializers.ModelSerializer):
+                # Reverse FK / M2M with a nested serializer: plan the inner queryset too.
+                # A reverse FK needs the FK column on the child rows to match them up.
+                remote = () if model_field.many_to_many else (model_field.field.name,)
+                inner = plan_queryset(
+                    child.Meta.model._default_manager.all(), child, only=only, extra_columns=remote
+                )
+                prefetch.append(Prefetch(lookup, queryset=inner))
+            else:
+                prefetch.append(lookup)
+        elif isinstance(field, serializers.ModelSerializer):
+            # Forward FK / one-to-one: join it and keep walking
+            select.append(lookup)
+            child_select, child_prefetch, child_columns = _collect(
+                field, model_field.related_model, prefix=lookup + '__', only=only
+            )
+            select.extend(child_select)
+            prefetch.extend(child_prefetch)
+            if columns is not None:
+                columns.append(source)
+                if child_columns is not None:
+                    columns.extend(f'{source}__{column}' for column in child_columns)
+        elif isinstance(field, serializers.ManyRelatedField):
+            # M2M rendered as primary keys
+            prefetch.append(lookup)
+        elif columns is not None and model_field.concrete:
+            columns.append(source)
+
+    return select, prefetch, columns
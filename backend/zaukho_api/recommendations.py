@@ -0,0 +1,176 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from . import entitlements, trending
+from .models import ItemNeighbor, Movie, Purchase, Rental, RentalArchive, TVSeries
+
+TOP_K = getattr(settings, 'RECOMMENDATIONS_TOP_K', 20)
+CO_PURCHASE_WEIGHT = 1.0
+CATEGORY_WEIGHT = 0.3
+CONTENT_TYPES = ('movie', 'tv_series')
+
+
+def _load_items():
+    """Every recommendable title as (content_type, object_id), and its row in the matrices"""
+    items = [('movie', pk) for pk in Movie.objects.order_by('id').values_list('id', flat=True)]
+    items += [('tv_series', pk) for pk in TVSeries.objects.order_by('id').values_list('id', flat=True)]
+    return items, {item: row for row, item in enumerate(items)}
+
+
+def _interactions(positions):
+    """
+    (user_id, item row) pairs for every purchase and rental, archived or
+    not. Season purchases and episode rentals count towards their series.
+    """
+    sources = [
+        (Purchase, [('movie', 'movie_id'), ('tv_series', 'season__tv_series_id')]),
+        (Rental, [('movie', 'movie_id'), ('tv_series', 'episode__season__tv_series_id')]),
+        (RentalArchive, [('movie', 'movie_id'), ('tv_series', 'episode__season__tv_series_id')]),
+    ]
+    pairs = set()
+    for model, titles in sources:
+        for content_type, field in titles:
+            rows = model.objects.filter(**{f'{field}__isnull': False}) \
+                .values_list('user_id', field).distinct().order_by()
+            for user_id, object_id in rows.iterator():
+                row = positions.get((content_type, object_id))
+                if row is not None:
+                    pairs.add((user_id, row))
+    return pairs
+
+
+def _category_links(positions):
+    """(item row, category_id) pairs from the categories M2M tables"""
+    links = []
+    for content_type, model, column in (('movie', Movie, 'movie_id'), ('tv_series', TVSeries, 'tvseries_id')):
+        rows = model.categories.through.objects.values_list(column, 'category_id')
+        for object_id, category_id in rows.iterator():
+            row = positions.get((content_type, object_id))
+            if row is not None:
+                links.append((row, category_id))
+    return links
+
+
+def _binary_matrix(pairs, n_columns, np, sparse):
+    """A CSR matrix with a 1 for every (row label, column) pair, row labels compacted to 0..n"""
+    if not pairs:
+        return sparse.csr_matrix((0, n_columns), dtype=np.float32)
+    labels, columns = zip(*pairs)
+    _, rows = np.unique(np.fromiter(labels, dtype=np.int64, count=len(labels)), return_inverse=True)
+    columns = np.fromiter(columns, dtype=np.int64, count=len(columns))
+    data = np.ones(len(columns), dtype=np.float32)
+    return sparse.csr_matrix((data, (rows, columns)), shape=(rows.max() + 1, n_columns))
+
+
+def _l2_normalize_columns(matrix, np, sparse):
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=0)).ravel())
+    norms[norms == 0] = 1
+    return (matrix @ sparse.diags(1 / norms)).tocsr()
+
+
+def compute_neighbors(top_k=TOP_K, co_purchase_weight=CO_PURCHASE_WEIGHT,
+                      category_weight=CATEGORY_WEIGHT, chunk_size=512):
+    """
+    Item-item similarity as a weighted sum of co-purchase cosine (over the
+    user x item interaction matrix) and category cosine (over the item x
+    category matrix), both computed with sparse matrix products.
+
+    The n x n product is never materialized: rows are scored `chunk_size`
+    at a time and only the best `top_k` neighbours of each row are kept.
+    Yields (item, [(neighbor, score), ...]) for items with any neighbour.
+    """
+    import numpy as np
+    from scipy import sparse
+
+    items, positions = _load_items()
+    n = len(items)
+    if n == 0:
+        return
+
+    # Columns are items in both matrices, so X.T @ X is item x item
+    interactions = _l2_normalize_columns(
+        _binary_matrix(_interactions(positions), n, np, sparse), np, sparse
+    )
+    category_pairs = [(category_id, row) for row, category_id in _category_links(positions)]
+    categories = _l2_normalize_columns(_binary_matrix(category_pairs, n, np, sparse), np, sparse)
+
+    interactions_t = interactions.T.tocsr()
+    categories_t = categories.T.tocsr()
+    top_k = min(top_k, n - 1)
+    if top_k <= 0:
+        return
+
+    for start in range(0, n, chunk_size):
+        stop = min(start + chunk_size, n)
+        block = (
+            co_purchase_weight * (interactions_t[start:stop] @ interactions)
+            + category_weight * (categories_t[start:stop] @ categories)
+        ).toarray()
+        # An item is not its own neighbour
+        block[np.arange(stop - start), np.arange(start, stop)] = 0
+
+        best = np.argpartition(-block, top_k - 1, axis=1)[:, :top_k]
+        best_scores = np.take_along_axis(block, best, axis=1)
+        order = np.argsort(-best_scores, axis=1)
+        best = np.take_along_axis(best, order, axis=1)
+        best_scores = np.take_along_axis(best_scores, order, axis=1)
+
+        for offset in range(stop - start):
+            neighbors = [
+                (items[column], float(score))
+                for column, score in zip(best[offset], best_scores[offset])
+                if score > 0
+            ]
+            if neighbors:
+                yield items[start + offset], neighbors
+
+
+def rebuild(top_k=TOP_K, co_purchase_weight=CO_PURCHASE_WEIGHT, category_weight=CATEGORY_WEIGHT,
+            chunk_size=512, batch_size=5000):
+    """Replace every stored neighbour list. Returns the number of items with neighbours."""
+    rows = []
+    count = 0
+    for (content_type, object_id), neighbors in compute_neighbors(
+        top_k, co_purchase_weight, category_weight, chunk_size
+    ):
+        count += 1
+        rows.extend(
+            ItemNeighbor(
+                content_type=content_type, object_id=object_id,
+                neighbor_type=neighbor_type, neighbor_id=neighbor_id,
+                score=score, rank=rank,
+            )
+            for rank, ((neighbor_type, neighbor_id), score) in enumerate(neighbors)
+        )
+
+    with transaction.atomic():
+        ItemNeighbor.objects.all().delete()
+        ItemNeighbor.objects.bulk_create(rows, batch_size=batch_size)
+    return count
+
+
+def recommend(user, limit=20, fallback=True):
+    """
+    Titles for a user: the precomputed neighbours of everything they own,
+    merged by summed score, minus what they already own. With `fallback`,
+    trending titles stand in when there is nothing to go on.
+    """
+    owned = entitlements.owned_titles(user) if user.is_authenticated else {}
+    owned_keys = {(content_type, pk) for content_type, pks in owned.items() for pk in pks}
+
+    scores = {}
+    if owned_keys:
+        lookup = Q()
+        for content_type in CONTENT_TYPES:
+            if owned.get(content_type):
+                lookup |= Q(content_type=content_type, object_id__in=owned[content_type])
+        rows = ItemNeighbor.objects.filter(lookup).values_list('neighbor_type', 'neighbor_id', 'score')
+        for neighbor_type, neighbor_id, score in rows:
+            key = (neighbor_type, neighbor_id)
+            if key not in owned_keys:
+                scores[key] = scores.get(key, 0) + score
+
+    if not scores and fallback:
+        return [key for key in trending.top(limit=limit + len(owned_keys)) if key not in owned_keys][:limit]
+    return sorted(scores, key=lambda key: (-scores[key], key))[:limit]
@@ -0,0 +1,105 @@
+import hashlib
+import threading
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import instrumentation
+
+KEY_PREFIX = 'zaukho:response'
+
+_stats_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0}
+
+
+def _version_key(scope):
+    return f'{KEY_PREFIX}:version:{scope}'
+
+
+def _new_version():
+    return uuid.uuid4().hex[:12]
+
+
+def get_versions(scopes):
+    """Return the current version token of each scope, creating missing ones"""
+    keys = [_version_key(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # add() so that concurrent requests agree on a single token
+            cache.add(key, _new_version(), timeout=None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+async def aget_versions(scopes):
+    """get_versions() for async views"""
+    keys = [_version_key(scope) for scope in scopes]
+    versions = await cache.aget_many(keys)
+    for key in keys:
+        if key not in versions:
+            await cache.aadd(key, _new_version(), timeout=None)
+            versions[key] = await cache.aget(key)
+    return [versions[key] for key in keys]
+
+
+def bump(*scopes):
+    """Invalidate every cached response that depends on any of `scopes`"""
+    if scopes:
+        cache.set_many({_version_key(scope): _new_version() for scope in scopes}, timeout=None)
+
+
+def origin(request):
+    """Scheme and host of the request, which absolute URLs in a cached payload are built from"""
+    return f'{request.scheme}://{request.get_host()}'
+
+
+def _request_digest(request):
+    query = sorted(request.GET.lists())
+    return hashlib.md5(f'{origin(request)}{request.path}?{query}'.encode(), usedforsecurity=False).hexdigest()
+
+
+def cache_key(request, scopes):
+    """
+    Key a response on its origin, path and query parameters and the
+    versions of the scopes it depends on
+    """
+    return f"{KEY_PREFIX}:{_request_digest(request)}:{'.'.join(get_versions(scopes))}"
+
+
+async def acache_key(request, scopes):
+    return f"{KEY_PREFIX}:{_request_digest(request)}:{'.'.join(await aget_versions(scopes))}"
+
+
+def _count(data):
+    with _stats_lock:
+        _stats['hits' if data is not None else 'misses'] += 1
+    return instrumentation.cache_lookup(data)
+
+
+def load(key):
+    return _count(cache.get(key))
+
+
+async def aload(key):
+    return _count(await cache.aget(key))
+
+
+def store(key, data):
+    cache.set(key, data, timeout=getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 300))
+
+
+async def astore(key, data):
+    await cache.aset(key, data, timeout=getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 300))
+
+
+def stats():
+    with _stats_lock:
+        hits, misses = _stats['hits'], _stats['misses']
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': hits / total if total else 0.0,
+    }
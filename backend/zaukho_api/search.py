@@ -0,0 +1,194 @@
+import re
+import time
+
+from django.conf import settings
+from django.db import OperationalError, connection, transaction
+
+from .models import Movie, TVSeries, Episode
+
+INDEX_TABLE = 'zaukho_api_search_index'
+
+# Each indexed row is identified by a single integer so that updates and
+# deletes are primary key operations: doc_id = pk * 4 + kind code.
+KIND_CODES = {'movie': 1, 'tv_series': 2, 'episode': 3}
+KINDS = {code: kind for kind, code in KIND_CODES.items()}
+MODELS = {'movie': Movie, 'tv_series': TVSeries, 'episode': Episode}
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+MAX_TOKENS = 8
+
+
+def doc_id(kind, pk):
+    return pk * 4 + KIND_CODES[kind]
+
+
+def split_doc_id(value):
+    return KINDS[value % 4], value // 4
+
+
+def kind_of(instance):
+    for kind, model in MODELS.items():
+        if isinstance(instance, model):
+            return kind
+    return None
+
+
+def document(instance):
+    """(doc_id, title, body) for a Movie, TVSeries or Episode"""
+    return doc_id(kind_of(instance), instance.pk), instance.title, instance.description or ''
+
+
+def tokenize(query):
+    return TOKEN_RE.findall(query.lower())[:MAX_TOKENS]
+
+
+class SQLiteBackend:
+    """FTS5 virtual table, ranked with bm25 (title weighted over body)"""
+
+    def upsert(self, cursor, rows):
+        cursor.executemany(f'DELETE FROM {INDEX_TABLE} WHERE rowid = %s', [(row[0],) for row in rows])
+        cursor.executemany(f'INSERT INTO {INDEX_TABLE} (rowid, title, body) VALUES (%s, %s, %s)', rows)
+
+    def delete(self, cursor, doc_ids):
+        cursor.executemany(f'DELETE FROM {INDEX_TABLE} WHERE rowid = %s', [(value,) for value in doc_ids])
+
+    def clear(self, cursor):
+        cursor.execute(f'DELETE FROM {INDEX_TABLE}')
+
+    def query(self, cursor, tokens, kind, limit, budget):
+        # Every token must match; the last one may be a prefix ("adven" -> "adventure")
+        match = ' '.join(f'"{token}"' for token in tokens) + '*'
+        sql = f'SELECT rowid FROM {INDEX_TABLE} WHERE {INDEX_TABLE} MATCH %s'
+        params = [match]
+        if kind:
+            sql += ' AND rowid %% 4 = %s'
+            params.append(KIND_CODES[kind])
+        sql += f' ORDER BY bm25({INDEX_TABLE}, 10.0, 1.0) LIMIT %s'
+        params.append(limit)
+
+        # Abort the statement once the latency budget is spent
+        deadline = time.monotonic() + budget
+        connection.ensure_connection()
+        raw = connection.connection
+        raw.set_progress_handler(lambda: int(time.monotonic() > deadline), 1000)
+        try:
+            cursor.execute(sql, params)
+            return [row[0] for row in cursor.fetchall()]
+        finally:
+            raw.set_progress_handler(None, 0)
+
+
+class PostgreSQLBackend:
+    """Table with a generated, weighted tsvector column behind a GIN index, ranked with ts_rank_cd"""
+
+    def upsert(self, cursor, rows):
+        cursor.executemany(
+            f'INSERT INTO {INDEX_TABLE} (doc_id, title, body) VALUES (%s, %s, %s) '
+            'ON CONFLICT (doc_id) DO UPDATE SET title = EXCLUDED.title, body = EXCLUDED.body',
+            rows,
+        )
+
+    def delete(self, cursor, doc_ids):
+        cursor.execute(f'DELETE FROM {INDEX_TABLE} WHERE doc_id = ANY(%s)', [list(doc_ids)])
+
+    def clear(self, cursor):
+        cursor.execute(f'TRUNCATE {INDEX_TABLE}')
+
+    def query(self, cursor, tokens, kind, limit, budget):
+        tsquery = ' & '.join(tokens) + ':*'
+        sql = (
+            f"SELECT doc_id FROM {INDEX_TABLE}, to_tsquery('english', %s) query "
+            'WHERE document @@ query'
+        )
+        params = [tsquery]
+        if kind:
+            sql += ' AND doc_id %% 4 = %s'
+            params.append(KIND_CODES[kind])
+        sql += ' ORDER BY ts_rank_cd(document, query) DESC LIMIT %s'
+        params.append(limit)
+
+        with transaction.atomic():
+            cursor.execute('SET LOCAL statement_timeout = %s', [max(int(budget * 1000), 1)])
+            cursor.execute(sql, params)
+            return [row[0] for row in cursor.fetchall()]
+
+
+BACKENDS = {
+    'sqlite': SQLiteBackend(),
+    'postgresql': PostgreSQLBackend(),
+}
+
+
+def get_backend():
+    return BACKENDS.get(connection.vendor)
+
+
+def index(*instances):
+    """Add or refresh the index rows of Movie, TVSeries or Episode instances"""
+    backend = get_backend()
+    if backend and instances:
+        with connection.cursor() as cursor:
+            backend.upsert(cursor, [document(instance) for instance in instances])
+
+
+def unindex(*instances):
+    backend = get_backend()
+    if backend and instances:
+        with connection.cursor() as cursor:
+            backend.delete(cursor, [doc_id(kind_of(instance), instance.pk) for instance in instances])
+
+
+def rebuild(batch_size=1000):
+    """Rebuild the whole index from the catalog tables; returns the number of documents"""
+    backend = get_backend()
+    if backend is None:
+        return 0
+    count = 0
+    with transaction.atomic(), connection.cursor() as cursor:
+        backend.clear(cursor)
+        for kind, model in MODELS.items():
+            rows = model.objects.values_list('pk', 'title', 'description').order_by('pk')
+            batch = []
+            for pk, title, description in rows.iterator(chunk_size=batch_size):
+                batch.append((doc_id(kind, pk), title, description or ''))
+                if len(batch) >= batch_size:
+                    backend.upsert(cursor, batch)
+                    count += len(batch)
+                    batch = []
+            if batch:
+                backend.upsert(cursor, batch)
+                count += len(batch)
+    return count
+
+
+def search(query, kind=None, limit=20):
+    """
+    Ranked (kind, pk) hits for `query`, best first.
+
+    The query is abandoned once SEARCH_LATENCY_BUDGET_MS is spent; the
+    second item of the result tells whether that happened.
+    """
+    tokens = tokenize(query)
+    if not tokens:
+        return [], False
+    budget = getattr(settings, 'SEARCH_LATENCY_BUDGET_MS', 200) / 1000
+
+    backend = get_backend()
+    if backend is None:
+        # Unsupported database: fall back to a title scan
+        models = {kind: MODELS[kind]} if kind else MODELS
+        hits = []
+        for model_kind, model in models.items():
+            pks = model.objects.filter(title__icontains=' '.join(tokens)).values_list('pk', flat=True)[:limit]
+            hits.extend((model_kind, pk) for pk in pks)
+        return hits[:limit], False
+
+    try:
+        with connection.cursor() as cursor:
+            doc_ids = backend.query(cursor, tokens, kind, limit, budget)
+    except OperationalError as exc:
+        # Interrupted by the progress handler (SQLite) or by statement_timeout (PostgreSQL)
+        if 'interrupted' in str(exc) or 'statement timeout' in str(exc):
+            return [], True
+        raise
+    return [split_doc_id(value) for value in doc_ids], False
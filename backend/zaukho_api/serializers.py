@@ -1,6 +1,9 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
+from django.urls import reverse
 from .models import Category, Movie, TVSeries, Season, Episode, Purchase, Rental
+from . import images, posters
+from .query_planning import plan_queryset
 
 class UserSerializer(serializers.ModelSerializer):
     """Serializer for User model"""
@@ -9,27 +12,91 @@ class UserSerializer(serializers.ModelSerializer):
         fields = ['id', 'username', 'email', 'first_name', 'last_name']
         read_only_fields = ['id']
 
+class DynamicFieldsModelSerializer(serializers.ModelSerializer):
+    """
+    ModelSerializer that takes optional `fields` and `expand` arguments.
+
+    `fields` restricts the output to the given field names. When `fields` is
+    not given, `Meta.default_fields` (if set) is used instead, and `expand`
+    adds back any of the remaining fields by name.
+    """
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        expand = kwargs.pop('expand', None)
+        super().__init__(*args, **kwargs)
+
+        selected = fields or getattr(self.Meta, 'default_fields', None)
+        if selected is None:
+            return
+        allowed = set(selected) | set(expand or ())
+        for field_name in set(self.fields) - allowed:
+            self.fields.pop(field_name)
+
+class PlaybackField(serializers.Field):
+    """
+    Path of the playback endpoint for a title with a video, else None.
+    Reads `video_file` rather than the file's URL: the video itself is only
+    served through signed playback URLs (the HLS manifest or the file).
+    """
+    def __init__(self, content_type, **kwargs):
+        self.content_type = content_type
+        kwargs.setdefault('source', 'video_file')
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        if not value:
+            return None
+        return reverse('playback', args=[self.content_type, value.instance.pk])
+
+class PosterSrcsetField(serializers.Field):
+    """
+    `srcset` strings of the poster's resized copies by format, e.g.
+    {'webp': 'https://.../x-160w.webp 160w, ...', 'jpeg': ...}, or None
+    until they have been rendered (see zaukho_api.posters).
+    """
+    def __init__(self, **kwargs):
+        kwargs.setdefault('source', 'poster_variants')
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        request = self.context.get('request')
+        build_url = request.build_absolute_uri if request is not None else None
+        srcsets = {
+            image_format: posters.srcset(value, image_format, build_url)
+            for image_format in images.FORMATS
+        }
+        return srcsets if any(srcsets.values()) else None
+
 class CategorySerializer(serializers.ModelSerializer):
     """Serializer for Category model"""
     class Meta:
         model = Category
         fields = '__all__'
 
-class MovieSerializer(serializers.ModelSerializer):
+class MovieSerializer(DynamicFieldsModelSerializer):
     """Serializer for Movie model"""
     categories = CategorySerializer(many=True, read_only=True)
+    playback = PlaybackField('movie')
+    poster_srcset = PosterSrcsetField()
     
     class Meta:
         model = Movie
-        fields = '__all__'
+        # poster_variants is maintained by zaukho_api.posters and shown as poster_srcset
+        exclude = ['poster_variants']
+        extra_kwargs = {'video_file': {'write_only': True}}
 
-class EpisodeSerializer(serializers.ModelSerializer):
+class EpisodeSerializer(DynamicFieldsModelSerializer):
     """Serializer for Episode model"""
+    playback = PlaybackField('episode')
+    
     class Meta:
         model = Episode
         fields = '__all__'
+        extra_kwargs = {'video_file': {'write_only': True}}
 
-class SeasonSerializer(serializers.ModelSerializer):
+class SeasonSerializer(DynamicFieldsModelSerializer):
     """Serializer for Season model"""
     episodes = EpisodeSerializer(many=True, read_only=True)
     
@@ -37,14 +104,36 @@ class SeasonSerializer(serializers.ModelSerializer):
         model = Season
         fields = '__all__'
 
-class TVSeriesSerializer(serializers.ModelSerializer):
+class TVSeriesSerializer(DynamicFieldsModelSerializer):
     """Serializer for TVSeries model"""
     categories = CategorySerializer(many=True, read_only=True)
     seasons = SeasonSerializer(many=True, read_only=True)
+    poster_srcset = PosterSrcsetField()
     
     class Meta:
         model = TVSeries
-        fields = '__all__'
+        exclude = ['poster_variants']
+
+class MovieListSerializer(MovieSerializer):
+    """Compact Movie serializer for list responses"""
+    class Meta(MovieSerializer.Meta):
+        default_fields = ['id', 'title', 'poster', 'poster_srcset', 'release_date', 'duration',
+                          'price_buy', 'price_rent', 'is_featured']
+
+class EpisodeListSerializer(EpisodeSerializer):
+    """Compact Episode serializer for list responses"""
+    class Meta(EpisodeSerializer.Meta):
+        default_fields = ['id', 'season', 'episode_number', 'title', 'duration', 'price_rent']
+
+class SeasonListSerializer(SeasonSerializer):
+    """Compact Season serializer for list responses"""
+    class Meta(SeasonSerializer.Meta):
+        default_fields = ['id', 'tv_series', 'season_number', 'title', 'release_date', 'price_buy']
+
+class TVSeriesListSerializer(TVSeriesSerializer):
+    """Compact TVSeries serializer for list responses"""
+    class Meta(TVSeriesSerializer.Meta):
+        default_fields = ['id', 'title', 'poster', 'poster_srcset', 'release_date', 'is_featured']
 
 class PurchaseSerializer(serializers.ModelSerializer):
     """Serializer for Purchase model"""
@@ -64,4 +153,38 @@ class RentalSerializer(serializers.ModelSerializer):
     class Meta:
         model = Rental
         fields = '__all__'
-        read_only_fields = ['user', 'rental_date', 'expiry_date', 'transaction_id'] 
\ No newline at end of file
+        read_only_fields = ['user', 'rental_date', 'expiry_date', 'transaction_id'] 
+
+def serialize_titles(groups, request=None):
+    """
+    Serialize several lists of (content_type, pk) keys with the compact list
+    serializers, running one query per content type however many lists an
+    item appears in. Returns the lists in the same shape, with each item
+    tagged with its `type`; keys that no longer exist are dropped. Pass the
+    `request` for absolute poster URLs, as the viewsets give.
+    """
+    serializer_classes = {
+        'movie': MovieListSerializer,
+        'tv_series': TVSeriesListSerializer,
+        'season': SeasonListSerializer,
+        'episode': EpisodeListSerializer,
+    }
+    ids = {content_type: set() for content_type in serializer_classes}
+    for keys in groups.values():
+        for content_type, pk in keys:
+            ids[content_type].add(pk)
+
+    context = {'request': request}
+    items = {}
+    for content_type, serializer_class in serializer_classes.items():
+        if not ids[content_type]:
+            continue
+        model = serializer_class.Meta.model
+        queryset = plan_queryset(model.objects.filter(pk__in=ids[content_type]), serializer_class, only=True)
+        for obj in queryset:
+            items[(content_type, obj.pk)] = {'type': content_type, **serializer_class(obj, context=context).data}
+
+    return {
+        name: [items[key] for key in keys if key in items]
+        for name, keys in groups.items()
+    }
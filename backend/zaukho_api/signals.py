@@ -0,0 +1,226 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_save, post_delete, pre_delete, pre_save, m2m_changed
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+
+from . import (
+    auth_backends, authentication, entitlements, ingest, instrumentation, library, posters, prometheus, response_cache,
+    search, suggest, trending,
+)
+from .models import Category, Movie, TVSeries, Season, Episode, Purchase, Rental, VideoManifest
+
+# Sent by zaukho_api.expiry after a batch of expired rentals has been moved
+# to RentalArchive. `rentals` is a list of dicts of the archived fields.
+rental_expired = Signal()
+
+
+@receiver(post_save, sender=Purchase)
+def purchase_saved(sender, instance, created, **kwargs):
+    """Keep the user's entitlements and library in sync with their purchases, and count new ones towards trending"""
+    library.invalidate(instance.user_id)
+    if created:
+        entitlements.sync_purchase(instance)
+        trending.record(instance, 'purchase', instance.purchase_date)
+    else:
+        entitlements.rebuild_for_user(instance.user_id)
+
+
+@receiver(post_save, sender=Rental)
+def rental_saved(sender, instance, created, **kwargs):
+    """Keep the user's entitlements and library in sync with their rentals, and count new ones towards trending"""
+    library.invalidate(instance.user_id)
+    if created:
+        entitlements.sync_rental(instance)
+        trending.record(instance, 'rental', instance.rental_date)
+    else:
+        entitlements.rebuild_for_user(instance.user_id)
+
+
+@receiver(post_delete, sender=Purchase)
+@receiver(post_delete, sender=Rental)
+def purchase_or_rental_deleted(sender, instance, **kwargs):
+    if sender is Rental and instance.expiry_date <= timezone.now():
+        return  # an expired rental is already out of the library and grants nothing
+    library.invalidate(instance.user_id)
+    entitlements.rebuild_for_user(instance.user_id)
+
+
+@receiver(rental_expired)
+def rentals_expired(sender, rentals, **kwargs):
+    """Drop the library snapshots of users whose rentals were archived"""
+    for user_id in {rental['user_id'] for rental in rentals}:
+        library.invalidate(user_id)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    """Drop the cached row used by StatelessJWTAuthentication"""
+    authentication.user_cache.discard(instance.pk)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, update_fields=None, **kwargs):
+    """Keep the user's login identifiers in sync with their username and email"""
+    if update_fields is not None and not {'username', 'email'} & set(update_fields):
+        return  # e.g. a password rehash on login
+    auth_backends.sync_identifiers(instance)
+
+
+@receiver(post_save, sender=Episode)
+def episode_saved(sender, instance, created, **kwargs):
+    """New episodes of an owned season become watchable straight away"""
+    if created:
+        entitlements.grant_new_episode(instance)
+
+
+# Response cache invalidation.
+# Each function bumps the cache scopes whose responses render the changed row.
+# Changes to rows nested inside a Movie/TVSeries also touch its updated_at,
+# which the conditional GET validators are computed from.
+
+def touch(model, ids):
+    """Bump updated_at without re-sending save signals"""
+    if ids:
+        model.objects.filter(pk__in=ids).update(updated_at=timezone.now())
+
+
+def invalidate_movies(*movie_ids, touched=False):
+    response_cache.bump('movies:list', *(f'movies:{pk}' for pk in movie_ids))
+    if touched:
+        touch(Movie, movie_ids)
+
+
+def invalidate_tv_series(*tv_series_ids, touched=False):
+    response_cache.bump('tv-series:list', *(f'tv-series:{pk}' for pk in tv_series_ids))
+    if touched:
+        touch(TVSeries, tv_series_ids)
+
+
+def invalidate_seasons(*seasons):
+    response_cache.bump('seasons:list', *(f'seasons:{season.pk}' for season in seasons))
+    invalidate_tv_series(*{season.tv_series_id for season in seasons}, touched=True)
+
+
+@receiver(post_save, sender=Movie)
+@receiver(post_delete, sender=Movie)
+def movie_changed(sender, instance, **kwargs):
+    invalidate_movies(instance.pk)
+
+
+@receiver(post_save, sender=TVSeries)
+@receiver(post_delete, sender=TVSeries)
+def tv_series_changed(sender, instance, **kwargs):
+    invalidate_tv_series(instance.pk)
+
+
+@receiver(post_save, sender=Season)
+@receiver(post_delete, sender=Season)
+def season_changed(sender, instance, **kwargs):
+    invalidate_seasons(instance)
+
+
+@receiver(post_save, sender=Episode)
+@receiver(post_delete, sender=Episode)
+def episode_changed(sender, instance, **kwargs):
+    response_cache.bump('episodes:list', f'episodes:{instance.pk}')
+    invalidate_seasons(instance.season)
+
+
+@receiver(post_save, sender=Category)
+@receiver(pre_delete, sender=Category)
+def category_changed(sender, instance, **kwargs):
+    # pre_delete: the M2M links are gone by the time post_delete fires
+    response_cache.bump('categories:list', f'categories:{instance.pk}')
+    invalidate_movies(*instance.movies.values_list('id', flat=True), touched=True)
+    invalidate_tv_series(*instance.tv_series.values_list('id', flat=True), touched=True)
+
+
+@receiver(m2m_changed, sender=Movie.categories.through)
+@receiver(m2m_changed, sender=TVSeries.categories.through)
+def categories_changed(sender, instance, action, reverse, model, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    invalidate = invalidate_movies if sender is Movie.categories.through else invalidate_tv_series
+    if not reverse:
+        # movie.categories.add(...) and friends
+        invalidate(instance.pk, touched=True)
+    elif action == 'pre_clear':
+        # category.movies.clear(): the affected rows are only known before the clear
+        related_name = 'movies' if sender is Movie.categories.through else 'tv_series'
+        invalidate(*getattr(instance, related_name).values_list('id', flat=True), touched=True)
+    else:
+        invalidate(*pk_set, touched=True)
+
+
+# Full-text search index
+
+@receiver(post_save, sender=Movie)
+@receiver(post_save, sender=TVSeries)
+@receiver(post_save, sender=Episode)
+def searchable_saved(sender, instance, **kwargs):
+    search.index(instance)
+
+
+@receiver(post_delete, sender=Movie)
+@receiver(post_delete, sender=TVSeries)
+@receiver(post_delete, sender=Episode)
+def searchable_deleted(sender, instance, **kwargs):
+    search.unindex(instance)
+
+
+# Typeahead prefix index
+
+SUGGEST_KINDS = {Movie: 'movie', TVSeries: 'tv_series', Category: 'category'}
+
+
+@receiver(post_save, sender=Movie)
+@receiver(post_save, sender=TVSeries)
+@receiver(post_save, sender=Category)
+def suggestable_saved(sender, instance, **kwargs):
+    label = instance.name if sender is Category else instance.title
+    suggest.update(SUGGEST_KINDS[sender], instance.pk, label)
+
+
+@receiver(post_delete, sender=Movie)
+@receiver(post_delete, sender=TVSeries)
+@receiver(post_delete, sender=Category)
+def suggestable_deleted(sender, instance, **kwargs):
+    suggest.remove(SUGGEST_KINDS[sender], instance.pk)
+
+
+# HLS ingest
+
+@receiver(post_save, sender=Movie)
+@receiver(post_save, sender=Episode)
+def video_saved(sender, instance, update_fields=None, **kwargs):
+    """Segment a newly uploaded video_file once the upload is committed"""
+    ingest.video_saved(instance, 'movie' if sender is Movie else 'episode', update_fields)
+
+
+@receiver(post_delete, sender=VideoManifest)
+def manifest_deleted(sender, instance, **kwargs):
+    ingest.manifest_deleted(instance)
+
+
+# Poster variants
+
+@receiver(pre_save, sender=Movie)
+@receiver(pre_save, sender=TVSeries)
+def poster_changing(sender, instance, **kwargs):
+    posters.poster_changing(instance)
+
+
+@receiver(post_save, sender=Movie)
+@receiver(post_save, sender=TVSeries)
+def poster_saved(sender, instance, update_fields=None, **kwargs):
+    """Render smaller copies of a new poster once it is committed"""
+    posters.poster_saved(instance, 'movie' if sender is Movie else 'tv_series', update_fields)
+
+
+# Request metrics
+
+@receiver(instrumentation.request_measured)
+def request_measured(sender, request, response, metrics, **kwargs):
+    """Feed the /metrics histograms"""
+    prometheus.observe_request(request, response, metrics)
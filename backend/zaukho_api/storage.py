@@ -0,0 +1,35 @@
+import hashlib
+import os
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+HASH_LENGTH = 32
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Saves each upload under the SHA-256 of its content (keeping the upload
+    directory and extension), so a file's URL changes exactly when its
+    bytes do and can be cached forever. Saving the same bytes twice stores
+    one file.
+    """
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        directory, basename = os.path.split(name)
+        name = os.path.join(directory, digest.hexdigest()[:HASH_LENGTH] + os.path.splitext(basename)[1].lower())
+        if self.exists(name):
+            return name
+        return super().save(name, content, max_length)
+
+
+def poster_storage():
+    # A callable so migrations refer to it by path; it resolves MEDIA_ROOT lazily
+    return ContentAddressedStorage()
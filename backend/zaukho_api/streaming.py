@@ -0,0 +1,211 @@
+import mimetypes
+import os
+import re
+import time
+from datetime import datetime, timezone as dt_timezone
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core import signing
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, HttpResponse
+from django.urls import reverse
+from django.views.decorators.http import require_safe
+
+from . import hls
+from .models import Episode, Movie
+
+# Playback is a two step affair. The playback endpoint checks the user's
+# entitlement once and hands out signed URLs, for the video file and for
+# its HLS playlist; every request a player then makes against them is
+# served from the token alone, with no session, user or entitlement lookup.
+
+SALT = 'zaukho_api.streaming'
+
+# content type -> model with a `video_file`
+STREAMABLE = {
+    'movie': Movie,
+    'episode': Episode,
+}
+
+# Types mimetypes may not know
+CONTENT_TYPES = {
+    '.m3u8': 'application/vnd.apple.mpegurl',
+    '.ts': 'video/mp2t',
+}
+
+_range = re.compile(r'^bytes=(\d*)-(\d*)$')
+_segment_name = re.compile(r'^[\w-][\w.-]*$')
+
+
+def video_name(content_type, object_id):
+    """Storage name of the item's video, or None"""
+    model = STREAMABLE.get(content_type)
+    if model is None:
+        return None
+    return model.objects.filter(pk=object_id).values_list('video_file', flat=True).first() or None
+
+
+def issue_token(user_id, content_type, object_id, name, expires_at=None, kind='file'):
+    """
+    A signed token for streaming `name`, a file or, for kind 'hls', a
+    manifest directory. Valid for STREAM_TOKEN_MAX_AGE seconds or until
+    `expires_at` (the end of a rental), whichever is first.
+    Returns (token, expiry).
+    """
+    expiry = time.time() + getattr(settings, 'STREAM_TOKEN_MAX_AGE', 4 * 3600)
+    if expires_at is not None:
+        expiry = min(expiry, expires_at.timestamp())
+    token = signing.dumps(
+        {'u': user_id, 't': content_type, 'id': object_id, 'k': kind, 'f': name, 'e': int(expiry)},
+        salt=SALT, compress=True,
+    )
+    return token, datetime.fromtimestamp(int(expiry), tz=dt_timezone.utc)
+
+
+def stream_url(request, token):
+    return request.build_absolute_uri(reverse('stream', args=[token]))
+
+
+def manifest_url(request, token):
+    # Segments are listed by bare name, so players fetch them from under the token too
+    return request.build_absolute_uri(reverse('hls', args=[token, hls.PLAYLIST]))
+
+
+def parse_range(header, size):
+    """
+    The (start, end) byte positions, inclusive, asked for by a single-range
+    `Range` header. None means send the whole file: no header, a header we
+    don't understand, or several ranges. Raises ValueError if the range
+    lies past the end of the file.
+    """
+    match = _range.match(header or '')
+    if match is None or match.group(0) == 'bytes=-':
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        if last and int(last) < start:
+            return None  # invalid, so ignored
+        end = min(int(last), size - 1) if last else size - 1
+    else:
+        # bytes=-N: the last N bytes
+        suffix = int(last)
+        if suffix == 0:
+            raise ValueError("empty suffix range")
+        start, end = max(size - suffix, 0), size - 1
+    if start >= size:
+        raise ValueError("range starts past the end of the file")
+    return start, end
+
+
+class FileRange:
+    """
+    `length` bytes of a file from `start`. The file is unbuffered so the
+    descriptor's offset is the range start: gunicorn's sendfile() path sends
+    from there and stops at Content-Length, and everything else reads it
+    in blocks. Nothing is held in memory beyond one block.
+    """
+    def __init__(self, path, start, length):
+        self.file = open(path, 'rb', buffering=0)
+        self.file.seek(start)
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size) if size else b''
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def _etag(stat):
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def _claims(token, kind):
+    try:
+        claims = signing.loads(token, salt=SALT)
+    except signing.BadSignature:
+        raise Http404
+    if claims.get('k', 'file') != kind:
+        raise Http404
+    return claims
+
+
+@require_safe
+def stream(request, token):
+    """
+    Serve the video a playback token was issued for, honouring Range (and
+    If-Range). With STREAM_ACCEL_REDIRECT_LOCATION set the front proxy
+    serves the file, ranges included, from that internal location.
+    """
+    claims = _claims(token, 'file')
+    if claims['e'] <= time.time():
+        return HttpResponse(status=403)
+    return serve(request, claims['f'])
+
+
+@require_safe
+def playlist(request, token, name):
+    """The HLS playlist or a segment of the manifest a playback token was issued for"""
+    claims = _claims(token, 'hls')
+    if claims['e'] <= time.time():
+        return HttpResponse(status=403)
+    if not _segment_name.match(name):
+        raise Http404
+    return serve(request, f"{claims['f']}/{name}")
+
+
+def serve(request, name):
+    """A response for the stored file `name`, see stream()"""
+    extension = os.path.splitext(name)[1]
+    content_type = CONTENT_TYPES.get(extension) or mimetypes.guess_type(name)[0] or 'application/octet-stream'
+
+    location = getattr(settings, 'STREAM_ACCEL_REDIRECT_LOCATION', None)
+    if location:
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = location.rstrip('/') + '/' + quote(name)
+        response['Cache-Control'] = 'private'
+        return response
+
+    try:
+        path = default_storage.path(name)
+        stat = os.stat(path)
+    except (FileNotFoundError, NotImplementedError):
+        raise Http404
+    size = stat.st_size
+    etag = _etag(stat)
+
+    requested = request.headers.get('Range')
+    if_range = request.headers.get('If-Range')
+    if if_range is not None and if_range != etag:
+        requested = None  # the file changed since the client's first request
+    try:
+        byte_range = parse_range(requested, size)
+    except ValueError:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+    start, end = byte_range if byte_range is not None else (0, size - 1)
+    length = end - start + 1 if size else 0
+
+    if request.method == 'HEAD':
+        response = HttpResponse(content_type=content_type)
+    else:
+        response = FileResponse(FileRange(path, start, length), content_type=content_type)
+        response.block_size = getattr(settings, 'STREAM_BLOCK_SIZE', 256 * 1024)
+    if byte_range is not None:
+        response.status_code = 206
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Content-Length'] = str(length)
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private'
+    return response
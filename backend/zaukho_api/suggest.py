@@ -0,0 +1,264 @@
+import bisect
+import random
+import sys
+from array import array
+import threading
+import unicodedata
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, connection, transaction
+
+from .models import Category, Movie, TVSeries
+
+# A title is findable from the start of each of its first few words
+MAX_WORDS_PER_LABEL = 4
+MAX_KEY_LENGTH = 64
+
+# Processes share catalog changes through a log in the cache: SEQUENCE_KEY
+# counts them and each one is kept under its number for CHANGE_LOG_TIMEOUT.
+# A process catches up by applying the changes after the last one it has
+# seen. When it is too far behind, or the log lost some of them, it rebuilds
+# from the database in a background thread and keeps answering from its
+# current index meanwhile.
+SEQUENCE_KEY = 'zaukho:suggest:sequence'
+CHANGE_KEY = 'zaukho:suggest:change:{}'
+CHANGE_LOG_TIMEOUT = 86400
+MAX_CATCH_UP = 1000
+
+
+def normalize(text):
+    """Lowercase and strip accents, so "Amélie" is found by "ame" """
+    decomposed = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def label_keys(label):
+    """Index keys for a label: the label itself and its tails starting at each later word"""
+    words = normalize(label).split()
+    return [
+        ' '.join(words[position:])[:MAX_KEY_LENGTH]
+        for position in range(min(len(words), MAX_WORDS_PER_LABEL))
+    ]
+
+
+class PrefixIndex:
+    """
+    In-memory prefix index over short labels.
+
+    Entries live in a sorted list of keys with a parallel array of packed
+    integer refs (item number * MAX_WORDS_PER_LABEL + word position), so a
+    lookup is a binary search followed by a short forward scan. `max_entries`
+    bounds the memory footprint; past it, new entries are not indexed.
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.version = None
+        self._keys = []
+        self._refs = array('q')
+        self._items = []    # item number -> (kind, pk)
+        self._labels = []   # item number -> label
+        self._numbers = {}  # (kind, pk) -> item number
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._keys)
+
+    def build(self, items, version=None):
+        """Replace the contents with `items`, an iterable of ((kind, pk), label)"""
+        entries = []
+        item_list, labels, numbers = [], [], {}
+        for item, label in items:
+            number = len(item_list)
+            item_list.append(item)
+            labels.append(label)
+            numbers[item] = number
+            for position, key in enumerate(label_keys(label)):
+                entries.append((key, number * MAX_WORDS_PER_LABEL + position))
+        entries.sort(key=lambda entry: entry[0])
+        del entries[self.max_entries:]
+        keys = [key for key, _ in entries]
+        refs = array('q', (ref for _, ref in entries))
+        with self._lock:
+            self._keys, self._refs = keys, refs
+            self._items, self._labels, self._numbers = item_list, labels, numbers
+            self.version = version
+
+    def add(self, item, label):
+        with self._lock:
+            self.remove(item)
+            number = self._numbers.get(item)
+            if number is None:
+                number = len(self._items)
+                self._items.append(item)
+                self._labels.append(label)
+                self._numbers[item] = number
+            else:
+                self._labels[number] = label
+            for position, key in enumerate(label_keys(label)):
+                if len(self._keys) >= self.max_entries:
+                    break
+                index = bisect.bisect_right(self._keys, key)
+                self._keys.insert(index, key)
+                self._refs.insert(index, number * MAX_WORDS_PER_LABEL + position)
+
+    def remove(self, item):
+        with self._lock:
+            number = self._numbers.get(item)
+            if number is None or self._labels[number] is None:
+                return
+            for position, key in enumerate(label_keys(self._labels[number])):
+                ref = number * MAX_WORDS_PER_LABEL + position
+                index = bisect.bisect_left(self._keys, key)
+                while index < len(self._keys) and self._keys[index] == key:
+                    if self._refs[index] == ref:
+                        del self._keys[index]
+                        del self._refs[index]
+                        break
+                    index += 1
+            # Keep the item number so a re-add reuses its slot
+            self._labels[number] = None
+
+    def lookup(self, prefix, limit=10):
+        """
+        Up to `limit` ((kind, pk), label) pairs whose label has a word
+        starting with `prefix`. Matches at the start of the label come first,
+        then shorter labels.
+        """
+        prefix = normalize(prefix).strip()[:MAX_KEY_LENGTH]
+        if not prefix:
+            return []
+        candidates = {}
+        starts = 0  # labels starting with the prefix, which outrank every other match
+        with self._lock:
+            index = bisect.bisect_left(self._keys, prefix)
+            while starts < limit and index < len(self._keys) and self._keys[index].startswith(prefix):
+                number, position = divmod(self._refs[index], MAX_WORDS_PER_LABEL)
+                if number not in candidates or position < candidates[number]:
+                    starts += position == 0
+                    candidates[number] = position
+                index += 1
+            labels = self._labels
+            ranked = sorted(candidates, key=lambda number: (candidates[number], len(labels[number]), labels[number]))
+            return [(self._items[number], labels[number]) for number in ranked[:limit]]
+
+    def memory_bytes(self):
+        """Approximate size of the index structures"""
+        with self._lock:
+            size = sys.getsizeof(self._keys) + sys.getsizeof(self._refs)
+            size += sys.getsizeof(self._items) + sys.getsizeof(self._labels) + sys.getsizeof(self._numbers)
+            size += sum(sys.getsizeof(key) for key in self._keys)
+            size += sum(sys.getsizeof(item) for item in self._items)
+            size += sum(sys.getsizeof(label) for label in self._labels if label is not None)
+        return size
+
+
+def catalog_items():
+    """((kind, pk), label) for everything that can be suggested"""
+    for pk, title in Movie.objects.values_list('pk', 'title').iterator():
+        yield ('movie', pk), title
+    for pk, title in TVSeries.objects.values_list('pk', 'title').iterator():
+        yield ('tv_series', pk), title
+    for pk, name in Category.objects.values_list('pk', 'name').iterator():
+        yield ('category', pk), name
+
+
+index = PrefixIndex(max_entries=getattr(settings, 'SUGGEST_MAX_ENTRIES', 500_000))
+
+
+def _sequence():
+    """Number of the last change in the shared log"""
+    sequence = cache.get(SEQUENCE_KEY)
+    if sequence is None:
+        # A new log; start it far from the old one so no process takes it for a continuation
+        cache.add(SEQUENCE_KEY, random.randrange(2 ** 48), timeout=None)
+        sequence = cache.get(SEQUENCE_KEY)
+    return sequence
+
+
+_sync_lock = threading.Lock()
+_rebuild_lock = threading.Lock()
+
+
+def _apply(item, label):
+    if label is None:
+        index.remove(item)
+    else:
+        index.add(item, label)
+
+
+def _rebuild():
+    """Rebuild the index from the database; run in a thread holding _rebuild_lock"""
+    try:
+        # Changes logged while the catalog is read are applied again afterwards, which is harmless
+        index.build(catalog_items(), version=_sequence())
+    finally:
+        connection.close()
+        _rebuild_lock.release()
+
+
+def _rebuild_in_background():
+    if _rebuild_lock.acquire(blocking=False):
+        threading.Thread(target=_rebuild, name='suggest-rebuild', daemon=True).start()
+
+
+def _catch_up(sequence):
+    """Apply the logged changes the index hasn't seen, or rebuild it if they are gone"""
+    with _sync_lock:
+        seen = index.version
+        if seen == sequence or _rebuild_lock.locked():
+            return
+        numbers = range(seen + 1, sequence + 1)
+        changes = cache.get_many([CHANGE_KEY.format(number) for number in numbers]) \
+            if 0 < len(numbers) <= MAX_CATCH_UP else {}
+        if CHANGE_KEY.format(seen + 1) not in changes:
+            _rebuild_in_background()
+            return
+        for number in numbers:
+            change = changes.get(CHANGE_KEY.format(number))
+            if change is None:
+                break  # logged by a process that hasn't stored it yet; picked up next time
+            _apply(*change)
+            index.version = number
+
+
+def current_index():
+    """
+    The process-wide index, built on first use and brought up to date with
+    the changes other processes have logged since.
+    """
+    sequence = _sequence()
+    if index.version is None:
+        index.build(catalog_items(), version=sequence)
+    elif index.version != sequence:
+        _catch_up(sequence)
+    return index
+
+
+def warm_up():
+    """Build the index at process start; a database that isn't ready just defers it"""
+    try:
+        current_index()
+    except DatabaseError:
+        pass
+
+
+def _publish(item, label):
+    """Log a change for every process and apply it here"""
+    _sequence()
+    number = cache.incr(SEQUENCE_KEY)
+    cache.set(CHANGE_KEY.format(number), (item, label), timeout=CHANGE_LOG_TIMEOUT)
+    with _sync_lock:
+        # Otherwise the next lookup catches up, this change included
+        if index.version == number - 1 and not _rebuild_lock.locked():
+            _apply(item, label)
+            index.version = number
+
+
+def update(kind, pk, label):
+    transaction.on_commit(lambda: _publish((kind, pk), label))
+
+
+def remove(kind, pk):
+    transaction.on_commit(lambda: _publish((kind, pk), None))
@@ -0,0 +1,195 @@
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+
+# Synthetic catalog rows for load testing. Like zaukho_api.hls this runs in
+# spawned worker processes and only uses the standard library: every
+# function returns plain tuples for one id range, with ids, prices and
+# layout derived from the seed so that the same seed gives the same data
+# whatever the number of workers.
+
+CATEGORIES = [
+    ("Action", "Action-packed movies and shows"),
+    ("Comedy", "Funny and humorous content"),
+    ("Drama", "Emotional and serious storylines"),
+    ("Sci-Fi", "Science fiction content"),
+    ("Horror", "Scary and thrilling content"),
+    ("Romance", "Love stories and relationships"),
+    ("Documentary", "Real-life stories and events"),
+    ("Animation", "Animated movies and shows"),
+    ("Thriller", "Suspenseful and exciting content"),
+    ("Fantasy", "Magical and mythical stories"),
+]
+
+PRICES = {
+    'movie_buy': [Decimal(p) for p in ('7.99', '8.99', '9.99', '11.99', '12.99', '13.99', '14.99', '15.99')],
+    'movie_rent': [Decimal(p) for p in ('1.99', '2.49', '2.99', '3.49', '3.99', '4.49', '4.99', '5.99')],
+    'season_buy': [Decimal(p) for p in ('19.99', '24.99', '29.99')],
+    'episode_rent': [Decimal(p) for p in ('1.99', '2.49', '2.99')],
+}
+
+ADJECTIVES = [
+    "Last", "Midnight", "Silent", "Hidden", "Broken", "Golden", "Frozen", "Burning", "Lost", "Final",
+    "Dark", "Crimson", "Distant", "Wild", "Secret", "Endless", "Electric", "Hollow", "Savage", "Quiet",
+]
+NOUNS = [
+    "Adventure", "Shadows", "Empire", "Heist", "Kingdom", "Voyage", "Signal", "Horizon", "Manor", "Frontier",
+    "Detective", "Ocean", "Protocol", "Legacy", "Harbor", "Summit", "Garden", "Circuit", "Storm", "Witness",
+]
+PLACES = [
+    "Paris", "the Desert", "the North", "Tokyo", "the Deep", "Mars", "the Valley", "Lagos", "the Old City", "Orbit",
+]
+PLOTS = [
+    "An unlikely team races against time", "A family uncovers a secret", "A detective follows a cold trail",
+    "Two rivals are forced to work together", "A stranger arrives with a warning", "A crew is stranded",
+    "An heir returns home", "A scientist makes a discovery", "A heist goes wrong", "Old friends reunite",
+]
+
+FIRST_RELEASE = date(2000, 1, 1)
+RELEASE_SPAN_DAYS = 9000
+RENTAL_PERIOD = timedelta(hours=48)
+
+# 1 to 4 seasons of 8 to 12 episodes, as populate_db.py has always made
+SEASONS = (1, 4)
+EPISODES = (8, 12)
+
+
+def price(kind, seed, object_id):
+    """The price of a title, a cheap hash of its id so purchases can charge it without a lookup"""
+    choices = PRICES[kind]
+    return choices[(object_id * 2654435761 + seed) % 4294967296 % len(choices)]
+
+
+def _rng(seed, kind, start):
+    return random.Random(f'{seed}:{kind}:{start}')
+
+
+def _popular(rng, count):
+    """An id in 1..count, skewed towards low ids so a few titles sell most"""
+    return int(count * rng.random() ** 3) + 1
+
+
+def _title(rng):
+    if rng.random() < 0.3:
+        return f"{rng.choice(NOUNS)} of {rng.choice(PLACES)}"
+    return f"The {rng.choice(ADJECTIVES)} {rng.choice(NOUNS)}"
+
+
+def _description(rng):
+    return f"{rng.choice(PLOTS)} in {rng.choice(PLACES)}."
+
+
+def _release(rng):
+    return FIRST_RELEASE + timedelta(days=rng.randrange(RELEASE_SPAN_DAYS))
+
+
+def _categories(rng, categories):
+    return rng.sample(range(1, categories + 1), min(rng.randint(2, 3), categories))
+
+
+def movies(seed, start, stop, categories):
+    """
+    Movies with ids in [start, stop). Returns
+    ([(id, title, description, release_date, duration, price_buy, price_rent, is_featured)],
+     [(movie_id, category_id)])
+    """
+    rng = _rng(seed, 'movie', start)
+    rows, links = [], []
+    for pk in range(start, stop):
+        rows.append((
+            pk, _title(rng), _description(rng), _release(rng), rng.randint(80, 160),
+            price('movie_buy', seed, pk), price('movie_rent', seed, pk), rng.random() < 0.05,
+        ))
+        links.extend((pk, category) for category in _categories(rng, categories))
+    return rows, links
+
+
+def layout(seed, tv_series_id):
+    """Episodes in each season of a series"""
+    rng = _rng(seed, 'layout', tv_series_id)
+    return [rng.randint(*EPISODES) for _ in range(rng.randint(*SEASONS))]
+
+
+def tv_series(seed, start, stop, categories, first_season, first_episode):
+    """
+    Series with ids in [start, stop) and their seasons and episodes, whose
+    ids start at `first_season` and `first_episode`. Returns
+    ([(id, title, description, release_date, is_featured)], [(tv_series_id, category_id)],
+     [(id, tv_series_id, season_number, title, release_date, price_buy)],
+     [(id, season_id, episode_number, title, description, duration, price_rent)])
+    """
+    rng = _rng(seed, 'tv_series', start)
+    rows, links, seasons, episodes = [], [], [], []
+    season_id, episode_id = first_season, first_episode
+    for pk in range(start, stop):
+        title, released = _title(rng), _release(rng)
+        rows.append((pk, title, _description(rng), released, rng.random() < 0.05))
+        links.extend((pk, category) for category in _categories(rng, categories))
+        for number, count in enumerate(layout(seed, pk), start=1):
+            seasons.append((
+                season_id, pk, number, f"Season {number}", released + timedelta(days=365 * (number - 1)),
+                price('season_buy', seed, season_id),
+            ))
+            for episode in range(1, count + 1):
+                name = "Pilot" if episode == 1 else "Season Finale" if episode == count else f"Episode {episode}"
+                episodes.append((
+                    episode_id, season_id, episode, name, f"{title} S{number}E{episode}: {_description(rng)}",
+                    rng.randint(40, 60), price('episode_rent', seed, episode_id),
+                ))
+                episode_id += 1
+            season_id += 1
+    return rows, links, seasons, episodes
+
+
+def users(seed, start, stop):
+    """[(id, username, email)] for ids in [start, stop)"""
+    return [(pk, f"user{pk}", f"user{pk}@example.com") for pk in range(start, stop)]
+
+
+def _when(rng, now, days):
+    return now - timedelta(seconds=rng.random() * days * 86400)
+
+
+def purchases(seed, start, stop, user_ids, movies, seasons, now, days):
+    """
+    Purchases numbered [start, stop) by users in `user_ids` of movies
+    1..movies and seasons 1..seasons over the `days` before `now`. Returns
+    [(user_id, content_type, movie_id, season_id, purchase_date, amount, transaction_id)]
+    """
+    rng = _rng(seed, 'purchase', start)
+    rows = []
+    for number in range(start, stop):
+        if seasons and (not movies or rng.random() < 0.3):
+            content_type, movie_id, season_id = 'season', None, _popular(rng, seasons)
+            amount = price('season_buy', seed, season_id)
+        else:
+            content_type, movie_id, season_id = 'movie', _popular(rng, movies), None
+            amount = price('movie_buy', seed, movie_id)
+        rows.append((
+            rng.choice(user_ids), content_type, movie_id, season_id, _when(rng, now, days), amount,
+            f"GEN-P-{seed}-{number}",
+        ))
+    return rows
+
+
+def rentals(seed, start, stop, user_ids, movies, episodes, now, days):
+    """
+    Rentals numbered [start, stop), like purchases() but of movies and
+    episodes. Returns
+    [(user_id, content_type, movie_id, episode_id, rental_date, expiry_date, amount, transaction_id)]
+    """
+    rng = _rng(seed, 'rental', start)
+    rows = []
+    for number in range(start, stop):
+        if episodes and (not movies or rng.random() < 0.5):
+            content_type, movie_id, episode_id = 'episode', None, _popular(rng, episodes)
+            amount = price('episode_rent', seed, episode_id)
+        else:
+            content_type, movie_id, episode_id = 'movie', _popular(rng, movies), None
+            amount = price('movie_rent', seed, movie_id)
+        rented = _when(rng, now, days)
+        rows.append((
+            rng.choice(user_ids), content_type, movie_id, episode_id, rented, rented + RENTAL_PERIOD, amount,
+            f"GEN-R-{seed}-{number}",
+        ))
+    return rows
@@ -1,3 +1,1541 @@
-from django.test import TestCase
+import json
+import logging
+import os
+import queue
+import shutil
+import tempfile
+import time
+from datetime import date, timedelta
+from importlib import import_module
+from io import StringIO
+from logging.handlers import QueueListener
+from unittest import mock, skipIf
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.contrib.auth import authenticate
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import Count, Max
+from django.templatetags.static import static
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from . import (
+    authentication, entitlements, expiry, hls, ingest, instrumentation, populate, posters, prometheus, recommendations,
+    search, streaming, suggest, synthetic, throttling, trending,
+)
+from .management.commands import explain_queries
+from .storage import ContentAddressedStorage
+from .models import (
+    Category, Movie, TVSeries, Season, Episode, Purchase, Rental, RentalArchive, Entitlement, VideoManifest,
+    LoginIdentifier, TrendingScore, ActivityBucket, ItemNeighbor,
+)
+
+
+def create_catalog(movies=5, series=3, seasons=3, episodes=4):
+    """Create a small catalog with enough nesting to expose N+1 queries"""
+    categories = [
+        Category.objects.create(name=f"Category {i}") for i in range(3)
+    ]
+    for i in range(movies):
+        movie = Movie.objects.create(
+            title=f"Movie {i}",
+            description="A movie",
+            release_date=date(2024, 1, 1),
+            duration=100,
+            price_buy=9.99,
+            price_rent=2.99,
+            is_featured=i % 2 == 0,
+        )
+        movie.categories.set(categories)
+    for i in range(series):
+        tv = TVSeries.objects.create(
+            title=f"Series {i}",
+            description="A series",
+            release_date=date(2024, 1, 1),
+        )
+        tv.categories.set(categories)
+        for s in range(1, seasons + 1):
+            season = Season.objects.create(
+                tv_series=tv, season_number=s, release_date=date(2024, 1, 1), price_buy=19.99
+            )
+            for e in range(1, episodes + 1):
+                Episode.objects.create(
+                    season=season,
+                    episode_number=e,
+                    title=f"Episode {e}",
+                    description="An episode",
+                    duration=40,
+                    price_rent=1.99,
+                )
+
+
+class CatalogQueryCountTests(TestCase):
+    """Each catalog endpoint must run a fixed number of queries, whatever the data size"""
+
+    # endpoint -> queries for one page of results. Every catalog endpoint
+    # also runs one aggregate query for its ETag.
+    LIST_BUDGETS = {
+        '/api/movies/': 2,                                  # etag, movies
+        '/api/movies/?expand=categories': 3,                # + categories
+        '/api/tv-series/': 2,                               # etag, series
+        '/api/tv-series/?expand=categories,seasons': 5,     # + categories, seasons, episodes
+        '/api/seasons/': 3,                                 # etag, count, seasons
+        '/api/seasons/?expand=episodes': 4,                 # + episodes
+        '/api/episodes/': 3,                                # etag, count, episodes
+    }
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def assertListBudget(self, url, budget):
+        with self.assertNumQueries(budget):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['results'])
+
+    def test_list_query_counts_are_constant(self):
+        create_catalog(movies=2, series=1, seasons=1, episodes=1)
+        for url, budget in self.LIST_BUDGETS.items():
+            self.assertListBudget(url, budget)
+
+        create_catalog(movies=8, series=4, seasons=3, episodes=5)
+        for url, budget in self.LIST_BUDGETS.items():
+            self.assertListBudget(url, budget)
+
+    def test_retrieve_query_counts(self):
+        create_catalog()
+        budgets = {
+            f'/api/movies/{Movie.objects.first().pk}/': 3,
+            f'/api/tv-series/{TVSeries.objects.first().pk}/': 5,
+            f'/api/seasons/{Season.objects.first().pk}/': 3,
+            f'/api/episodes/{Episode.objects.first().pk}/': 2,
+        }
+        for url, budget in budgets.items():
+            with self.assertNumQueries(budget):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+
+
+class SparseFieldsetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        create_catalog(movies=1, series=1, seasons=1, episodes=1)
+
+    def test_list_uses_compact_serializer(self):
+        response = self.client.get('/api/tv-series/')
+        item = response.data['results'][0]
+        self.assertNotIn('seasons', item)
+        self.assertNotIn('description', item)
+
+    def test_fields_restricts_output(self):
+        response = self.client.get('/api/movies/?fields=id,title')
+        self.assertEqual(set(response.data['results'][0]), {'id', 'title'})
+
+    def test_expand_adds_fields(self):
+        response = self.client.get('/api/movies/?expand=description')
+        item = response.data['results'][0]
+        self.assertIn('description', item)
+        self.assertIn('title', item)
+
+    def test_fields_on_detail(self):
+        movie = Movie.objects.get()
+        response = self.client.get(f'/api/movies/{movie.pk}/?fields=title,categories')
+        self.assertEqual(set(response.data), {'title', 'categories'})
+        self.assertEqual(len(response.data['categories']), 3)
+
+
+class CursorPaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        create_catalog(movies=5, series=0)
+
+    def test_walks_every_page_once(self):
+        seen = []
+        url = '/api/movies/?page_size=2&fields=id'
+        while url:
+            with self.assertNumQueries(2):  # etag, movies
+                response = self.client.get(url)
+            self.assertNotIn('count', response.data)
+            seen.extend(item['id'] for item in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(seen, sorted(Movie.objects.values_list('id', flat=True), reverse=True))
+
+    def test_page_size_is_capped(self):
+        response = self.client.get('/api/movies/?page_size=100000')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 5)
+
+
+class ResponseCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        create_catalog(movies=1, series=1, seasons=1, episodes=1)
+
+    def test_second_request_is_served_from_cache(self):
+        self.assertEqual(self.client.get('/api/movies/')['X-Cache'], 'MISS')
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/movies/')
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(self.client.get('/api/movies/?page_size=1')['X-Cache'], 'MISS')
+
+    @override_settings(ALLOWED_HOSTS=['testserver', 'api.example.com'])
+    def test_origins_are_cached_apart(self):
+        Movie.objects.update(poster='movies/posters/a.jpg')
+        self.assertEqual(self.client.get('/api/movies/')['X-Cache'], 'MISS')
+        for options in ({'HTTP_HOST': 'api.example.com'}, {'secure': True}):
+            response = self.client.get('/api/movies/', **options)
+            self.assertEqual(response['X-Cache'], 'MISS')
+            host = options.get('HTTP_HOST', 'testserver')
+            scheme = 'https' if options.get('secure') else 'http'
+            self.assertEqual(response.data['results'][0]['poster'], f'{scheme}://{host}/media/movies/posters/a.jpg')
+
+    def test_saving_a_movie_invalidates_its_responses(self):
+        movie = Movie.objects.get()
+        url = f'/api/movies/{movie.pk}/'
+        self.client.get(url)
+        self.client.get('/api/movies/')
+        movie.title = 'Renamed'
+        movie.save()
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['title'], 'Renamed')
+        self.assertEqual(self.client.get('/api/movies/')['X-Cache'], 'MISS')
+
+    def test_episode_change_invalidates_parent_series(self):
+        tv = TVSeries.objects.get()
+        url = f'/api/tv-series/{tv.pk}/'
+        self.client.get(url)
+        self.client.get('/api/categories/')
+        self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+        episode = Episode.objects.get()
+        episode.title = 'Pilot'
+        episode.save()
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['seasons'][0]['episodes'][0]['title'], 'Pilot')
+        self.assertEqual(self.client.get('/api/categories/')['X-Cache'], 'HIT')
+
+    def test_category_m2m_change_invalidates_movie(self):
+        movie = Movie.objects.get()
+        url = f'/api/movies/{movie.pk}/'
+        self.client.get(url)
+        movie.categories.add(Category.objects.create(name='New'))
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(len(response.data['categories']), 4)
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        create_catalog(movies=2, series=1, seasons=1, episodes=1)
+
+    def test_list_not_modified(self):
+        etag = self.client.get('/api/movies/')['ETag']
+        cache.clear()
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/movies/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_cached_response_answers_conditional_request(self):
+        etag = self.client.get('/api/movies/')['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/movies/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_detail_last_modified(self):
+        movie = Movie.objects.first()
+        response = self.client.get(f'/api/movies/{movie.pk}/')
+        self.assertIn('Last-Modified', response)
+        response = self.client.get(
+            f'/api/movies/{movie.pk}/', HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_malformed_pk_is_not_found(self):
+        for url in ('/api/movies/abc/', '/api/tv-series/abc/', '/api/seasons/1.5/', '/api/episodes/x/'):
+            self.assertEqual(self.client.get(url).status_code, 404, url)
+
+    def test_episode_change_updates_series_etag(self):
+        tv = TVSeries.objects.get()
+        url = f'/api/tv-series/{tv.pk}/'
+        etag = self.client.get(url)['ETag']
+        episode = Episode.objects.get()
+        episode.title = 'Pilot'
+        episode.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        create_catalog(movies=3, series=1, seasons=1, episodes=1)
+        self.user = User.objects.create_user('viewer', password='secret')
+        self.movie = Movie.objects.order_by('id').first()
+        Purchase.objects.create(
+            user=self.user, content_type='movie', movie=self.movie, amount=9.99, transaction_id='p1'
+        )
+        Rental.objects.create(
+            user=self.user, content_type='episode', episode=Episode.objects.get(),
+            amount=1.99, transaction_id='r1', expiry_date=timezone.now() + timedelta(hours=48),
+        )
+        token = RefreshToken.for_user(self.user).access_token
+        self.auth = {'Authorization': f'Bearer {token}'}
+
+    async def test_library_matches_sync_view(self):
+        response = await self.async_client.get('/api/async/library/', headers=self.auth)
+        self.assertEqual(response.status_code, 200)
+        expected = await sync_to_async(self.client.get)('/api/library/', headers=self.auth)
+        self.assertEqual(response.json(), expected.json())
+
+    async def test_library_requires_authentication(self):
+        response = await self.async_client.get('/api/async/library/')
+        self.assertEqual(response.status_code, 401)
+        response = await self.async_client.get(
+            '/api/async/library/', headers={'Authorization': 'Bearer nonsense'}
+        )
+        self.assertEqual(response.status_code, 401)
+
+    async def test_user_view(self):
+        response = await self.async_client.get('/api/async/auth/user/', headers=self.auth)
+        self.assertEqual(response.json()['username'], 'viewer')
+
+    async def test_movie_list_pages_like_sync_view(self):
+        response = await self.async_client.get('/api/async/movies/?page_size=2&fields=id')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        first = response.json()
+        expected = await sync_to_async(self.client.get)('/api/movies/?page_size=2&fields=id')
+        self.assertEqual(first['results'], expected.json()['results'])
+        second = await self.async_client.get(first['next'])
+        self.assertEqual(len(second.json()['results']), 1)
+        self.assertIsNone(second.json()['next'])
+
+        cached = await self.async_client.get(
+            '/api/async/movies/?page_size=2&fields=id', headers={'If-None-Match': response['ETag']}
+        )
+        self.assertEqual(cached.status_code, 304)
+
+    async def test_retrieve(self):
+        response = await self.async_client.get(f'/api/async/movies/{self.movie.pk}/')
+        self.assertEqual(response.json()['title'], self.movie.title)
+        self.assertIn('Last-Modified', response)
+        response = await self.async_client.get('/api/async/movies/0/')
+        self.assertEqual(response.status_code, 404)
+
+
+class LibraryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        create_catalog(movies=3, series=1, seasons=2, episodes=2)
+        self.user = User.objects.create_user('collector', password='secret')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        for i, movie in enumerate(Movie.objects.order_by('id')):
+            Purchase.objects.create(
+                user=self.user, content_type='movie', movie=movie, amount=9.99, transaction_id=f'm{i}'
+            )
+        Purchase.objects.create(
+            user=self.user, content_type='season', season=Season.objects.first(), amount=19.99,
+            transaction_id='s1',
+        )
+        self.rental = Rental.objects.create(
+            user=self.user, content_type='episode', episode=Episode.objects.first(), amount=1.99,
+            transaction_id='r1', expiry_date=timezone.now() + timedelta(hours=2),
+        )
+
+    def test_sections_by_content_type(self):
+        response = self.client.get('/api/library/')
+        self.assertEqual({name: section['count'] for name, section in response.data.items()},
+                         {'movie': 3, 'season': 1, 'episode': 1})
+        rental = response.data['episode']['results'][0]
+        self.assertEqual(rental['access'], 'rental')
+        self.assertEqual(rental['content']['id'], self.rental.episode_id)
+
+    def test_pages_through_one_type(self):
+        response = self.client.get('/api/library/?type=movie&limit=2')
+        self.assertEqual(len(response.data['results']), 2)
+        response = self.client.get(response.data['next'])
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertIsNone(response.data['next'])
+        self.assertEqual(self.client.get('/api/library/?type=album').status_code, 400)
+
+    def test_snapshot_is_cached_until_the_user_buys_something(self):
+        self.client.get('/api/library/')
+        with self.assertNumQueries(0):
+            self.client.get('/api/library/?type=movie')
+        Purchase.objects.create(
+            user=self.user, content_type='season', season=Season.objects.last(), amount=19.99,
+            transaction_id='s2',
+        )
+        self.assertEqual(self.client.get('/api/library/').data['season']['count'], 2)
+
+    def test_snapshot_expires_with_first_rental(self):
+        self.client.get('/api/library/')
+        Rental.objects.filter(pk=self.rental.pk).update(expiry_date=timezone.now() - timedelta(minutes=1))
+        self.assertEqual(self.client.get('/api/library/').data['episode']['count'], 1)
+        cache.clear()  # as the snapshot's timeout would
+        self.assertEqual(self.client.get('/api/library/').data['episode']['count'], 0)
+
+
+class RentalExpiryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        create_catalog(movies=3, series=0)
+        self.user = User.objects.create_user('renter', password='secret')
+        now = timezone.now()
+        for i, movie in enumerate(Movie.objects.order_by('id')):
+            Rental.objects.create(
+                user=self.user, content_type='movie', movie=movie, amount=2.99, transaction_id=f'r{i}',
+                expiry_date=now + timedelta(hours=1 if i == 0 else -1),
+            )
+
+    def test_sweep_archives_expired_rentals_in_batches(self):
+        archived, purged = expiry.sweep(batch_size=1)
+        self.assertEqual((archived, purged), (2, 2))
+        self.assertEqual(Rental.objects.count(), 1)
+        self.assertEqual(
+            set(RentalArchive.objects.values_list('transaction_id', flat=True)), {'r1', 'r2'}
+        )
+        self.assertEqual(Entitlement.objects.filter(user=self.user).count(), 1)
+
+    def test_sweep_does_not_rebuild_entitlements(self):
+        with CaptureQueriesContext(connection) as queries:
+            expiry.sweep(batch_size=10)
+        inserts = [query['sql'] for query in queries if 'INSERT INTO "zaukho_api_entitlement"' in query['sql']]
+        self.assertEqual(inserts, [])
+
+
+class StatelessJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        authentication.user_cache.clear()
+        authentication.blacklist.clear()
+        self.user = User.objects.create_user('token-holder', email='holder@example.com', password='secret')
+        self.client = APIClient()
+        self.access = RefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.access}')
+
+    def test_user_row_is_cached(self):
+        with self.assertNumQueries(3):  # blacklist, user, entitlements
+            self.client.get('/api/entitlements/?movie=1')
+        with self.assertNumQueries(1):  # entitlements only
+            response = self.client.get('/api/entitlements/?movie=1')
+        self.assertEqual(response.status_code, 200)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/api/auth/user/').data['username'], 'token-holder')
+
+    def test_logout_revokes_the_access_token(self):
+        response = self.client.post('/api/auth/logout/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get('/api/auth/user/').status_code, 401)
+
+    def test_blacklist_picks_up_tokens_revoked_elsewhere(self):
+        self.client.get('/api/entitlements/?movie=1')
+        other = RefreshToken.for_user(self.user).access_token
+        authentication.blacklist_access_token(other, self.user.pk)
+        authentication.blacklist.clear()  # as in another process
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {other}')
+        self.assertEqual(self.client.get('/api/entitlements/?movie=1').status_code, 401)
+
+    def test_deactivated_user_is_rejected_on_id_only_views(self):
+        self.assertEqual(self.client.get('/api/entitlements/?movie=1').status_code, 200)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/api/entitlements/?movie=1').status_code, 401)
+
+    def test_deactivation_elsewhere_applies_when_the_cached_row_expires(self):
+        self.client.get('/api/entitlements/?movie=1')
+        User.objects.filter(pk=self.user.pk).update(is_active=False)  # no signal, as in another process
+        self.assertEqual(self.client.get('/api/entitlements/?movie=1').status_code, 200)
+        later = time.monotonic() + settings.JWT_USER_CACHE_TTL
+        with mock.patch.object(authentication.time, 'monotonic', return_value=later):
+            self.assertEqual(self.client.get('/api/entitlements/?movie=1').status_code, 401)
+
+    def test_deleted_user_is_rejected(self):
+        self.client.get('/api/entitlements/?movie=1')
+        self.user.delete()
+        self.assertEqual(self.client.get('/api/entitlements/?movie=1').status_code, 401)
+
+
+@override_settings(PASSWORD_PBKDF2_ITERATIONS=1000)
+class LoginTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('Reader', email='Reader@Example.com', password='secret')
+
+    def test_single_lookup_by_email_or_username(self):
+        for identifier in ('reader@example.com', 'READER'):
+            with self.assertNumQueries(1):
+                self.assertEqual(authenticate(None, username=identifier, password='secret'), self.user)
+        with self.assertNumQueries(1):
+            self.assertIsNone(authenticate(None, username='nobody@example.com', password='secret'))
+
+    def test_changed_email_moves_identifier(self):
+        self.user.email = 'new@example.com'
+        self.user.save()
+        self.assertIsNone(authenticate(None, username='reader@example.com', password='secret'))
+        self.assertEqual(authenticate(None, username='new@example.com', password='secret'), self.user)
+
+    def test_non_string_credentials_are_rejected(self):
+        for username, password in ((123, 'secret'), (['reader'], 'secret'), ({'a': 1}, 'secret'), ('reader', 123)):
+            self.assertIsNone(authenticate(None, username=username, password=password))
+        response = APIClient().post('/api/auth/login/', {'email': 123, 'password': 'x'}, format='json')
+        self.assertEqual(response.status_code, 401)
+
+    def test_password_is_rehashed_with_configured_iterations(self):
+        with override_settings(PASSWORD_PBKDF2_ITERATIONS=2000):
+            self.assertEqual(authenticate(None, username='reader', password='secret'), self.user)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$2000$'))
+
+
+@override_settings(PASSWORD_PBKDF2_ITERATIONS=1000)
+class LoginThrottleTests(TestCase):
+    def setUp(self):
+        throttling.store.clear()
+        User.objects.create_user('target', email='target@example.com', password='secret')
+        self.client = APIClient()
+
+    def tearDown(self):
+        throttling.store.clear()
+
+    def login(self, email, password='wrong'):
+        return self.client.post('/api/auth/login/', {'email': email, 'password': password}, format='json')
+
+    def test_account_bucket_rejects_before_hashing(self):
+        for _ in range(5):
+            self.assertEqual(self.login('TARGET@example.com').status_code, 401)
+        with self.assertNumQueries(0):
+            response = self.login('target@example.com', password='secret')
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+        # Other accounts are only limited by the per-IP bucket
+        self.assertEqual(self.login('someone@example.com').status_code, 401)
+
+    def test_account_bucket_needs_a_string(self):
+        throttle = throttling.LoginAccountThrottle()
+        for data in ({'email': 123}, {'email': ['target@example.com']}, {'email': {'a': 1}}, ['x']):
+            self.assertIsNone(throttle.get_cache_key(mock.Mock(data=data), None))
+        request = mock.Mock(data={'email': ' Target@Example.com ', 'password': 'x'})
+        self.assertEqual(throttle.get_cache_key(request, None), 'target@example.com')
+
+    def test_ip_bucket(self):
+        statuses = [self.login(f'user{i}@example.com').status_code for i in range(21)]
+        self.assertEqual(statuses[:20], [401] * 20)
+        self.assertEqual(statuses[20], 429)
+
+    def test_ip_bucket_ignores_forwarded_for_without_proxies(self):
+        statuses = [
+            self.client.post('/api/auth/login/', {'email': f'user{i}@example.com', 'password': 'wrong'},
+                             format='json', HTTP_X_FORWARDED_FOR=f'10.0.0.{i}').status_code
+            for i in range(21)
+        ]
+        self.assertEqual(statuses[20], 429)
+
+    def test_busy_hash_slots_shed_load(self):
+        with override_settings(PASSWORD_HASH_SLOT_TIMEOUT=0):
+            acquired = []
+            while throttling._hash_slots.acquire(blocking=False):
+                acquired.append(True)
+            try:
+                response = self.login('target@example.com', password='secret')
+            finally:
+                for _ in acquired:
+                    throttling._hash_slots.release()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(self.login('target@example.com', password='secret').status_code, 200)
+
+
+class InstrumentationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        create_catalog(movies=2, series=1, seasons=1, episodes=1)
+        self.measured = []
+        instrumentation.request_measured.connect(self.record)
+        self.addCleanup(instrumentation.request_measured.disconnect, self.record)
+
+    def record(self, sender, request, response, metrics, **kwargs):
+        self.measured.append(metrics)
+
+    def test_counts_queries_and_cache_hits(self):
+        self.client.get('/api/movies/')
+        self.client.get('/api/movies/')
+        miss, hit = self.measured
+        self.assertGreater(miss.db_queries, 0)
+        self.assertEqual((miss.cache_hits, miss.cache_misses), (0, 1))
+        self.assertEqual(hit.db_queries, 0)
+        self.assertEqual((hit.cache_hits, hit.cache_misses), (1, 0))
+        self.assertGreater(hit.duration, 0)
+
+    async def test_counts_queries_of_async_views(self):
+        await self.async_client.get('/api/async/movies/')
+        self.assertGreater(self.measured[0].db_queries, 0)
+
+    @override_settings(REQUEST_LOG_SAMPLE_RATE=0, REQUEST_LOG_SLOW_MS=60_000)
+    def test_unsampled_requests_are_measured_but_not_logged(self):
+        with self.assertNoLogs('zaukho_api.requests'):
+            self.client.get('/api/movies/')
+        self.assertEqual(len(self.measured), 1)
+
+    @override_settings(REQUEST_LOG_SAMPLE_RATE=0, REQUEST_LOG_SLOW_MS=0)
+    def test_slow_requests_are_always_logged(self):
+        with self.assertLogs('zaukho_api.requests', level='WARNING') as logs:
+            self.client.get('/api/movies/')
+        record = logs.records[0]
+        self.assertEqual((record.path, record.status, record.view), ('/api/movies/', 200, 'movie-list'))
+        self.assertGreater(record.db_queries, 0)
+
+    def test_json_formatter_includes_extra_fields(self):
+        record = logging.makeLogRecord({
+            'name': 'zaukho_api.test', 'levelno': logging.INFO, 'levelname': 'INFO',
+            'msg': 'GET %s', 'args': ('/api/movies/',), 'status': 200,
+        })
+        entry = json.loads(instrumentation.JSONFormatter().format(record))
+        self.assertEqual(entry['message'], 'GET /api/movies/')
+        self.assertEqual((entry['level'], entry['status']), ('INFO', 200))
+        self.assertNotIn('args', entry)
+
+    def test_exceptions_keep_their_own_key_through_the_queue(self):
+        stream = StringIO()
+        output = logging.StreamHandler(stream)
+        output.setFormatter(instrumentation.JSONFormatter())
+        records = queue.SimpleQueue()
+        listener = QueueListener(records, output)
+        queued = logging.getLogger('zaukho_api.test.queue')
+        queued.addHandler(instrumentation.StructuredQueueHandler(records))
+        self.addCleanup(queued.handlers.clear)
+        self.enterContext(mock.patch.object(queued, 'propagate', False))
+        listener.start()
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            queued.error("GET %s failed", '/api/movies/', exc_info=True, extra={'status': 500})
+        finally:
+            listener.stop()
+
+        entry = json.loads(stream.getvalue())
+        self.assertEqual((entry['message'], entry['status']), ('GET /api/movies/ failed', 500))
+        self.assertTrue(entry['exc_info'].startswith('Traceback (most recent call last):'))
+        self.assertIn('ValueError: boom', entry['exc_info'])
+        self.assertNotIn('exc_text', entry)
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        prometheus.histograms.reset()
+        create_catalog(movies=2, series=1, seasons=1, episodes=1)
+
+    def scrape(self, **headers):
+        response = self.client.get('/metrics', headers=headers)
+        return response.status_code, response.content.decode()
+
+    def test_histograms_are_labelled_by_view_and_action(self):
+        self.client.get('/api/movies/')
+        self.client.get('/api/movies/')
+        self.client.get(f'/api/movies/{Movie.objects.first().pk}/')
+        self.client.post('/api/auth/login/', {'email': 'nobody@example.com', 'password': 'x'})
+        status, body = self.scrape()
+        self.assertEqual(status, 200)
+        self.assertIn('# TYPE zaukho_request_duration_seconds histogram', body)
+        self.assertIn('zaukho_request_duration_seconds_count{view="MovieViewSet.list"} 2', body)
+        self.assertIn('zaukho_request_queries_count{view="MovieViewSet.retrieve"} 1', body)
+        self.assertIn('zaukho_response_size_bytes_count{view="login_view"} 1', body)
+        self.assertIn('zaukho_request_queries_bucket{view="MovieViewSet.list",le="+Inf"} 2', body)
+
+    async def test_async_views_get_their_own_label(self):
+        await self.async_client.get('/api/async/movies/')
+        self.assertIn('zaukho_request_queries_count{view="async.movie_list"} 1', prometheus.render(prometheus.collect()))
+
+    def test_multiprocess_totals_add_up_worker_files(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_MULTIPROC_DIR=directory):
+            other_worker = [0] * (len(prometheus.HISTOGRAMS['zaukho_request_queries'][1]) + 2)
+            other_worker[2] = 3
+            other_worker[-1] = 6
+            with open(f'{directory}/metrics-1.json', 'w') as f:
+                json.dump({'zaukho_request_queries\tMovieViewSet.list': other_worker}, f)
+            self.client.get('/api/movies/')
+            status, body = self.scrape()
+        self.assertIn('zaukho_request_queries_count{view="MovieViewSet.list"} 4', body)
+        self.assertIn('zaukho_request_queries_bucket{view="MovieViewSet.list",le="1.0"} 0', body)
+
+    @override_settings(METRICS_TOKEN='scrape-me')
+    def test_token(self):
+        self.assertEqual(self.scrape()[0], 401)
+        self.assertEqual(self.scrape(Authorization='Bearer scrape-me')[0], 200)
+
+
+class StreamingTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+        os.makedirs(f'{media.name}/tv/episodes')
+        self.video = bytes(range(256)) * 40
+        with open(f'{media.name}/tv/episodes/pilot.mp4', 'wb') as f:
+            f.write(self.video)
+        create_catalog(movies=0, series=1, seasons=1, episodes=2)
+        self.episode = Episode.objects.order_by('id').first()
+        self.episode.video_file = 'tv/episodes/pilot.mp4'
+        self.episode.save()
+        self.user = User.objects.create_user('viewer', password='secret')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def rent(self):
+        Rental.objects.create(
+            user=self.user, content_type='episode', episode=self.episode,
+            amount=1.99, transaction_id='r1', expiry_date=timezone.now() + timedelta(hours=48),
+        )
+
+    def play(self):
+        return self.client.post(f'/api/playback/episode/{self.episode.pk}/')
+
+    def test_playback_requires_entitlement(self):
+        self.assertEqual(self.play().status_code, 403)
+        other = Episode.objects.exclude(pk=self.episode.pk).get()
+        self.assertEqual(self.client.post(f'/api/playback/episode/{other.pk}/').status_code, 404)
+
+    def test_range_requests(self):
+        self.rent()
+        response = self.play()
+        self.assertEqual(response.status_code, 200)
+        url = response.data['url']
+        with self.assertNumQueries(0):
+            response = self.client.get(url, headers={'Range': 'bytes=100-199'})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 100-199/{len(self.video)}')
+        self.assertEqual(response['Content-Length'], '100')
+        self.assertEqual(b''.join(response.streaming_content), self.video[100:200])
+
+        response = self.client.get(url, headers={'Range': 'bytes=-10'})
+        self.assertEqual(b''.join(response.streaming_content), self.video[-10:])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(b''.join(response.streaming_content), self.video)
+
+        response = self.client.get(url, headers={'Range': f'bytes={len(self.video)}-'})
+        self.assertEqual(response.status_code, 416)
+        response = self.client.get(url, headers={'Range': 'bytes=0-9', 'If-Range': '"stale"'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_tokens_are_signed_and_expire(self):
+        token, _ = streaming.issue_token(
+            self.user.pk, 'episode', self.episode.pk, self.episode.video_file.name,
+            expires_at=timezone.now() - timedelta(seconds=1),
+        )
+        self.assertEqual(self.client.get(f'/api/stream/{token}/').status_code, 403)
+        self.assertEqual(self.client.get(f'/api/stream/{token[:-2]}xx/').status_code, 404)
+
+    @override_settings(STREAM_ACCEL_REDIRECT_LOCATION='/protected/')
+    def test_accel_redirect(self):
+        self.rent()
+        response = self.client.get(self.play().data['url'], headers={'Range': 'bytes=0-9'})
+        self.assertEqual(response['X-Accel-Redirect'], '/protected/tv/episodes/pilot.mp4')
+        self.assertEqual(response['Content-Type'], 'video/mp4')
+
+    def test_parse_range(self):
+        self.assertEqual(streaming.parse_range('bytes=0-', 10), (0, 9))
+        self.assertEqual(streaming.parse_range('bytes=5-100', 10), (5, 9))
+        self.assertIsNone(streaming.parse_range('bytes=0-1,4-5', 10))
+        self.assertIsNone(streaming.parse_range('bytes=5-2', 10))
+        with self.assertRaises(ValueError):
+            streaming.parse_range('bytes=-0', 10)
+
+
+@mock.patch.object(hls, 'STAND_IN_BYTE_RATE', 100)
+@mock.patch.object(hls.shutil, 'which', return_value=None)
+class HLSIngestTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name, HLS_SEGMENT_SECONDS=2))
+        os.makedirs(f'{media.name}/movies/videos')
+        self.video = os.urandom(1000)
+        with open(f'{media.name}/movies/videos/feature.mp4', 'wb') as f:
+            f.write(self.video)
+        create_catalog(movies=1, series=0)
+        self.movie = Movie.objects.get()
+        self.user = User.objects.create_user('viewer', password='secret')
+        Purchase.objects.create(
+            user=self.user, content_type='movie', movie=self.movie, amount=9.99, transaction_id='p1'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def upload(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.movie.video_file = 'movies/videos/feature.mp4'
+            self.movie.save()
+        return VideoManifest.objects.get(movie=self.movie)
+
+    def test_stand_in_segmenter(self, which):
+        with tempfile.TemporaryDirectory() as output:
+            source = f'{output}/source.mp4'
+            with open(source, 'wb') as f:
+                f.write(self.video)
+            segments = hls.segment(source, f'{output}/hls', segment_seconds=3)
+            self.assertEqual([size for _, _, size in segments], [300, 300, 300, 100])
+            self.assertEqual(segments[-1][:2], ('seg00003.ts', 1.0))
+            with open(f'{output}/hls/{hls.PLAYLIST}') as f:
+                playlist = f.read()
+        self.assertIn('#EXT-X-TARGETDURATION:3', playlist)
+        self.assertTrue(playlist.endswith('#EXT-X-ENDLIST\n'))
+
+    def test_upload_is_segmented_and_served_as_hls(self, which):
+        with mock.patch.object(ingest, 'enqueue') as enqueue:
+            manifest = self.upload()
+        enqueue.assert_called_once_with(manifest.pk)
+        self.assertEqual(manifest.status, 'pending')
+        self.assertIsNone(self.client.post(f'/api/playback/movie/{self.movie.pk}/').data['manifest_url'])
+
+        manifest = ingest.run(manifest.pk)
+        self.assertEqual((manifest.status, manifest.segment_count, manifest.duration), ('ready', 5, 10.0))
+        detail = self.client.get(f'/api/movies/{self.movie.pk}/').data
+        self.assertNotIn('video_file', detail)
+        self.assertEqual(detail['playback'], f'/api/playback/movie/{self.movie.pk}/')
+
+        url = self.client.post(detail['playback']).data['manifest_url']
+        response = self.client.get(url)
+        self.assertEqual(response['Content-Type'], 'application/vnd.apple.mpegurl')
+        playlist = b''.join(response.streaming_content).decode()
+        segment = [line for line in playlist.splitlines() if line and not line.startswith('#')][1]
+        response = self.client.get(url.replace(hls.PLAYLIST, segment))
+        self.assertEqual(b''.join(response.streaming_content), self.video[200:400])
+        self.assertEqual(self.client.get(url.replace(hls.PLAYLIST, '..')).status_code, 404)
+
+    def test_new_upload_replaces_manifest(self, which):
+        with mock.patch.object(ingest, 'enqueue'):
+            first = ingest.run(self.upload().pk)
+            shutil.copy(self.movie.video_file.path, self.movie.video_file.path.replace('feature', 'recut'))
+            self.movie.video_file = 'movies/videos/recut.mp4'
+            with self.captureOnCommitCallbacks(execute=True):
+                self.movie.save()
+        second = VideoManifest.objects.exclude(pk=first.pk).get()
+        with self.captureOnCommitCallbacks(execute=True):
+            ingest.run(second.pk)
+        self.assertFalse(VideoManifest.objects.filter(pk=first.pk).exists())
+        self.assertFalse(os.path.exists(f'{settings.MEDIA_ROOT}/{first.directory}'))
+
+    @skipIf(shutil.which('ffmpeg'), "the test video is random bytes, which ffmpeg rejects")
+    def test_command_segments_on_a_process_pool(self, which):
+        Movie.objects.filter(pk=self.movie.pk).update(video_file='movies/videos/feature.mp4')
+        call_command('segment_videos', '--missing', '--workers=2', stdout=open(os.devnull, 'w'))
+        manifest = VideoManifest.objects.get(movie=self.movie)
+        self.assertEqual((manifest.status, manifest.segment_count), ('ready', 1))
+
+
+class PosterVariantTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name, POSTER_WIDTHS=(160, 320, 1200)))
+        os.makedirs(f'{media.name}/movies/posters')
+        for name, size in (('a', (600, 900)), ('b', (600, 900)), ('small', (100, 150))):
+            Image.new('RGB', size, 'navy').save(f'{media.name}/movies/posters/{name}.jpg')
+        create_catalog(movies=2, series=0)
+        self.movie, self.other = Movie.objects.order_by('id')
+
+    def set_poster(self, movie, name):
+        with mock.patch.object(posters, 'enqueue') as enqueue, self.captureOnCommitCallbacks(execute=True):
+            movie.poster = f'movies/posters/{name}.jpg'
+            movie.save()
+        return enqueue
+
+    def test_variants_are_rendered_and_listed(self):
+        enqueue = self.set_poster(self.movie, 'a')
+        enqueue.assert_called_once_with('movie', self.movie.pk, 'movies/posters/a.jpg')
+        variants = posters.run('movie', self.movie.pk, 'movies/posters/a.jpg')
+        # No upscaling past the 600px original
+        self.assertEqual(sorted(variants['webp'], key=int), ['160', '320'])
+        with Image.open(f"{settings.MEDIA_ROOT}/{variants['jpeg']['320']}") as image:
+            self.assertEqual((image.format, image.size), ('JPEG', (320, 480)))
+
+        item = next(m for m in self.client.get('/api/movies/').json()['results'] if m['id'] == self.movie.pk)
+        webp = item['poster_srcset']['webp'].split(', ')
+        self.assertEqual(len(webp), 2)
+        self.assertTrue(webp[0].startswith('http://testserver/media/posters/variants/'))
+        self.assertTrue(webp[0].endswith('-160w.webp 160w'))
+        self.assertNotIn('poster_variants', item)
+
+    def test_variants_are_not_writable(self):
+        admin = User.objects.create_superuser('admin', password='secret')
+        client = APIClient()
+        client.force_authenticate(admin)
+        response = client.patch(f'/api/movies/{self.movie.pk}/', {'poster_variants': {'source': 'x'}},
+                                     format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('poster_variants', response.data)
+        self.movie.refresh_from_db()
+        self.assertEqual(self.movie.poster_variants, {})
+
+    def test_variants_are_content_addressed(self):
+        self.set_poster(self.movie, 'a')
+        self.set_poster(self.other, 'b')
+        first = posters.run('movie', self.movie.pk, 'movies/posters/a.jpg')
+        second = posters.run('movie', self.other.pk, 'movies/posters/b.jpg')
+        self.assertEqual(first['webp'], second['webp'])
+
+    def test_small_poster_keeps_its_width(self):
+        self.set_poster(self.movie, 'small')
+        variants = posters.run('movie', self.movie.pk, 'movies/posters/small.jpg')
+        self.assertEqual(list(variants['jpeg']), ['100'])
+
+    def test_new_poster_drops_old_variants(self):
+        self.set_poster(self.movie, 'a')
+        posters.run('movie', self.movie.pk, 'movies/posters/a.jpg')
+        self.set_poster(self.movie, 'b')
+        self.movie.refresh_from_db()
+        self.assertEqual(self.movie.poster_variants, {})
+        # A late result for the old poster is discarded
+        self.assertIsNone(posters.run('movie', self.movie.pk, 'movies/posters/a.jpg'))
+
+    def test_command_renders_on_a_process_pool(self):
+        Movie.objects.filter(pk=self.movie.pk).update(poster='movies/posters/a.jpg')
+        call_command('build_poster_variants', '--workers=1', stdout=open(os.devnull, 'w'))
+        self.movie.refresh_from_db()
+        self.assertEqual(self.movie.poster_variants['source'], 'movies/posters/a.jpg')
+        self.assertEqual(sorted(self.movie.poster_variants['webp'], key=int), ['160', '320'])
+
+
+class StaticAndMediaTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+        self.poster = (os.urandom(16) + b'poster')
+
+    def test_uploads_are_content_addressed(self):
+        storage = ContentAddressedStorage()
+        first = storage.save('movies/posters/Original Name.JPG', ContentFile(self.poster))
+        second = storage.save('movies/posters/copy.jpg', ContentFile(self.poster))
+        self.assertEqual(first, second)
+        self.assertRegex(first, r'^movies/posters/[0-9a-f]{32}\.jpg$')
+        self.assertEqual(os.listdir(f'{settings.MEDIA_ROOT}/movies/posters'), [os.path.basename(first)])
+
+    def test_hashed_posters_are_immutable(self):
+        create_catalog(movies=1, series=0)
+        movie = Movie.objects.get()
+        movie.poster = SimpleUploadedFile('poster.jpg', self.poster, content_type='image/jpeg')
+        movie.save()
+        response = self.client.get(movie.poster.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertEqual(b''.join(response.streaming_content), self.poster)
+
+    def test_only_public_uploads_are_served(self):
+        os.makedirs(f'{settings.MEDIA_ROOT}/tv/episodes')
+        with open(f'{settings.MEDIA_ROOT}/tv/episodes/pilot.mp4', 'wb') as f:
+            f.write(b'video')
+        self.assertEqual(self.client.get('/media/tv/episodes/pilot.mp4').status_code, 404)
+        for url in ('/media/movies/posters/%2e%2e/%2e%2e/tv/episodes/pilot.mp4',
+                    '/media/movies/posters/../../tv/episodes/pilot.mp4',
+                    '/media/posters/variants/%2E%2E/%2E%2E/tv/episodes/pilot.mp4'):
+            self.assertEqual(self.client.get(url).status_code, 404, url)
+
+    def test_collected_static_files_are_hashed_compressed_and_immutable(self):
+        with tempfile.TemporaryDirectory() as root, override_settings(STATIC_ROOT=root):
+            call_command('collectstatic', '--noinput', verbosity=0)
+            url = static('admin/css/base.css')
+            self.assertRegex(url, r'^/static/admin/css/base\.[0-9a-f]{12}\.css$')
+            response = self.client.get(url, headers={'Accept-Encoding': 'gzip'})
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('immutable', response['Cache-Control'])
+            self.assertEqual(response['Content-Encoding'], 'gzip')
+            response.close()
+
+
+class GenerateCatalogTests(TestCase):
+    def generate(self, *args):
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command(
+                'generate_catalog', '--movies', '40', '--tv-series', '6', '--purchases', '300', '--rentals', '120',
+                '--chunk-size', '7', '--workers', '2', *args, stdout=StringIO(),
+            )
+
+    def test_generates_a_consistent_catalog(self):
+        cache.set('stale', 1)
+        self.generate('--users', '25', '--password', 'secret')
+
+        self.assertEqual(Movie.objects.count(), 40)
+        self.assertEqual(Movie.objects.aggregate(Max('id'))['id__max'], 40)
+        self.assertEqual(Category.objects.count(), len(synthetic.CATEGORIES))
+        self.assertFalse(Movie.objects.annotate(n=Count('categories')).filter(n__lt=2).exists())
+        layouts = [synthetic.layout(0, pk) for pk in range(1, 7)]
+        self.assertEqual(Season.objects.count(), sum(len(layout) for layout in layouts))
+        self.assertEqual(Episode.objects.count(), sum(sum(layout) for layout in layouts))
+        self.assertEqual(User.objects.count(), 25)
+        self.assertEqual((Purchase.objects.count(), Rental.objects.count()), (300, 120))
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA foreign_key_check')
+            self.assertEqual(cursor.fetchall(), [])
+
+        # Dated over the past year and charged the title's price
+        purchase = Purchase.objects.filter(content_type='movie').select_related('movie').first()
+        self.assertEqual(purchase.amount, purchase.movie.price_buy)
+        self.assertGreater(Purchase.objects.values('purchase_date__date').distinct().count(), 100)
+
+        # What the signals would have done
+        self.assertEqual(LoginIdentifier.objects.count(), 50)
+        self.assertEqual(authenticate(None, username='USER3@example.com', password='secret').pk, 3)
+        self.assertTrue(Entitlement.objects.filter(user_id=purchase.user_id, object_id=purchase.movie_id).exists())
+        self.assertTrue(TrendingScore.objects.exists())
+        self.assertIn(('movie', 1), search.search(Movie.objects.get(pk=1).title)[0])
+        self.assertIsNone(cache.get('stale'))
+
+    def test_regenerating_replaces_the_catalog(self):
+        self.generate('--users', '5')
+        titles = list(Movie.objects.values_list('title', flat=True))
+        self.generate('--users', '5', '--workers', '1', '--replace-users')
+        self.assertEqual(list(Movie.objects.values_list('title', flat=True)), titles)
+        self.assertEqual(Purchase.objects.count(), 300)
+        self.assertEqual(LoginIdentifier.objects.count(), 10)
+
+    def test_without_users_activity_goes_to_existing_users(self):
+        user = User.objects.create_user('viewer', password='pw')
+        self.generate('--users', '0')
+        self.assertEqual(list(User.objects.all()), [user])
+        self.assertEqual(set(Purchase.objects.values_list('user_id', flat=True)), {user.pk})
+
+    def test_existing_users_are_only_replaced_on_request(self):
+        admin = User.objects.create_superuser('admin', password='secret')
+        with self.assertRaisesMessage(CommandError, "--replace-users"):
+            self.generate('--users', '5')
+        self.assertEqual(list(User.objects.all()), [admin])
+        self.assertFalse(Movie.objects.exists())
+        self.generate('--users', '5', '--replace-users')
+        self.assertFalse(User.objects.filter(username='admin').exists())
+
+    def test_user_ids_are_compact(self):
+        users = [User.objects.create_user(f'viewer{i}', password='pw') for i in range(4)]
+        self.assertEqual(populate._user_ids(), range(users[0].pk, users[-1].pk + 1))
+        users[1].delete()
+        self.assertEqual(list(populate._user_ids()), [users[0].pk, users[2].pk, users[3].pk])
+        self.generate('--users', '0')
+        self.assertEqual(set(Purchase.objects.values_list('user_id', flat=True)),
+                         {users[0].pk, users[2].pk, users[3].pk})
+
+    def test_activity_needs_users(self):
+        with self.assertRaises(CommandError):
+            self.generate('--users', '0')
+
+
+class EntitlementTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        create_catalog(movies=2, series=1, seasons=1, episodes=3)
+        self.user = User.objects.create_user('viewer', password='secret')
+        self.movie, self.other_movie = Movie.objects.order_by('id')
+        self.season = Season.objects.get()
+
+    def rent(self, hours, **title):
+        return Rental.objects.create(
+            user=self.user, amount=2.99, transaction_id=f'r{Rental.objects.count()}',
+            expiry_date=timezone.now() + timedelta(hours=hours), **title,
+        )
+
+    def grants(self, **filters):
+        return set(Entitlement.objects.filter(user=self.user, **filters).values_list(
+            'content_type', 'object_id', 'expires_at'
+        ))
+
+    def test_purchases_grant_ownership(self):
+        Purchase.objects.create(user=self.user, content_type='movie', movie=self.movie, amount=9.99,
+                                transaction_id='p1')
+        Purchase.objects.create(user=self.user, content_type='season', season=self.season, amount=19.99,
+                                transaction_id='p2')
+        episodes = set(self.season.episodes.values_list('id', flat=True))
+        self.assertEqual(self.grants(), {
+            ('movie', self.movie.pk, None), ('season', self.season.pk, None),
+            *(('episode', pk, None) for pk in episodes),
+        })
+
+        # Episodes added to an owned season come with it
+        episode = Episode.objects.create(season=self.season, episode_number=4, title="Finale",
+                                         description="", duration=40, price_rent=1.99)
+        self.assertIn(('episode', episode.pk, None), self.grants())
+
+    def test_rentals_grant_access_until_they_expire(self):
+        rental = self.rent(2, content_type='movie', movie=self.movie)
+        expired = self.rent(-1, content_type='movie', movie=self.other_movie)
+        self.assertEqual(self.grants(), {
+            ('movie', self.movie.pk, rental.expiry_date), ('movie', self.other_movie.pk, expired.expiry_date),
+        })
+        self.assertTrue(entitlements.can_watch(self.user, 'movie', self.movie.pk))
+        self.assertFalse(entitlements.can_watch(self.user, 'movie', self.other_movie.pk))
+
+        expiry.sweep()
+        self.assertEqual(self.grants(), {('movie', self.movie.pk, rental.expiry_date)})
+
+    def test_deleting_a_rental_revokes_it(self):
+        Purchase.objects.create(user=self.user, content_type='movie', movie=self.movie, amount=9.99,
+                                transaction_id='p1')
+        rental = self.rent(2, content_type='movie', movie=self.other_movie)
+        rental.delete()
+        self.assertEqual(self.grants(), {('movie', self.movie.pk, None)})
+
+    def test_a_rental_never_shortens_ownership(self):
+        Purchase.objects.create(user=self.user, content_type='movie', movie=self.movie, amount=9.99,
+                                transaction_id='p1')
+        self.rent(2, content_type='movie', movie=self.movie)
+        self.assertEqual(self.grants(), {('movie', self.movie.pk, None)})
+
+    def test_rebuild_all_matches_signals(self):
+        other = User.objects.create_user('other', password='secret')
+        Purchase.objects.create(user=self.user, content_type='season', season=self.season, amount=19.99,
+                                transaction_id='p1')
+        Purchase.objects.create(user=other, content_type='movie', movie=self.movie, amount=9.99,
+                                transaction_id='p2')
+        self.rent(2, content_type='movie', movie=self.other_movie)
+        self.rent(2, content_type='episode', episode=self.season.episodes.first())
+        expired = self.rent(-1, content_type='movie', movie=self.movie)
+        rows = lambda: set(Entitlement.objects.values_list('user_id', 'content_type', 'object_id', 'expires_at'))
+        maintained = rows()
+
+        # Same rows, less the expired rental's
+        self.assertEqual(entitlements.rebuild_all(batch_size=2), len(maintained) - 1)
+        self.assertEqual(rows(), maintained - {(self.user.pk, 'movie', self.movie.pk, expired.expiry_date)})
+
+        # The migration that adds the table backfills it the same way
+        rebuilt = rows()
+        Entitlement.objects.all().delete()
+        import_module('zaukho_api.migrations.0004_entitlement').grant_existing(django_apps, None)
+        self.assertEqual(rows(), rebuilt)
+
+    def test_endpoint(self):
+        client = APIClient()
+        url = f'/api/entitlements/?movie={self.movie.pk},{self.other_movie.pk}&episode=999'
+        self.assertEqual(client.get(url).status_code, 401)
+
+        Purchase.objects.create(user=self.user, content_type='movie', movie=self.movie, amount=9.99,
+                                transaction_id='p1')
+        client.force_authenticate(self.user)
+        response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {'movie': [self.movie.pk], 'episode': []})
+        self.assertEqual(client.get('/api/entitlements/?movie=one').status_code, 400)
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        create_catalog(movies=0, series=1, seasons=1, episodes=2)
+        self.ocean = self.movie("Ocean Depths", "A documentary about the deep sea.")
+        self.mention = self.movie("Harbor Lights", "Fishermen leave the harbor for the ocean.")
+        self.amelie = self.movie("Amélie", "A shy waitress in Paris.")
+
+    def movie(self, title, description):
+        return Movie.objects.create(title=title, description=description, release_date=date(2024, 1, 1),
+                                    duration=100, price_buy=9.99, price_rent=2.99)
+
+    def test_title_matches_rank_first(self):
+        hits, timed_out = search.search('ocean')
+        self.assertEqual(hits, [('movie', self.ocean.pk), ('movie', self.mention.pk)])
+        self.assertFalse(timed_out)
+
+    def test_last_token_is_a_prefix(self):
+        self.assertEqual(search.search('ocean dep')[0], [('movie', self.ocean.pk)])
+        self.assertEqual(search.search('dep ocean')[0], [])
+
+    def test_unicode_queries_ignore_accents_and_case(self):
+        for query in ('Amélie', 'AMELIE', 'amel'):
+            self.assertEqual(search.search(query)[0], [('movie', self.amelie.pk)], query)
+        self.assertEqual(search.search('!?')[0], [])
+
+    def test_kind_filter(self):
+        episode = Episode.objects.order_by('id').first()
+        self.assertEqual(search.search('episode', kind='episode')[0][0], ('episode', episode.pk))
+        self.assertEqual(search.search('episode', kind='movie')[0], [])
+
+    def test_signals_keep_the_index_current(self):
+        self.ocean.title = "Abyss"
+        self.ocean.save()
+        self.assertEqual(search.search('abyss')[0], [('movie', self.ocean.pk)])
+        self.assertEqual(search.search('depths')[0], [])
+        self.mention.delete()
+        self.assertEqual(search.search('ocean')[0], [])
+
+    def test_rebuild(self):
+        with connection.cursor() as cursor:
+            search.get_backend().clear(cursor)
+        self.assertEqual(search.search('ocean')[0], [])
+        self.assertEqual(search.rebuild(batch_size=2), 3 + 1 + 2)
+        self.assertEqual(search.search('ocean')[0], [('movie', self.ocean.pk), ('movie', self.mention.pk)])
+
+    def test_endpoint(self):
+        response = self.client.get('/api/search/', {'q': 'ocean', 'limit': 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([(item['type'], item['id']) for item in response.data['results']],
+                         [('movie', self.ocean.pk)])
+        self.assertFalse(response.data['timed_out'])
+        self.assertEqual(self.client.get('/api/search/', {'q': 'ocean', 'type': 'song'}).status_code, 400)
+
+    @override_settings(SEARCH_LATENCY_BUDGET_MS=-1000)
+    def test_spent_budget_abandons_the_query(self):
+        # Enough rows for the query to outlast SQLite's progress handler interval
+        with connection.cursor() as cursor:
+            search.get_backend().upsert(cursor, [
+                (search.doc_id('movie', pk), f"Movie {pk}", "A movie") for pk in range(1000, 6000)
+            ])
+        self.assertEqual(search.search('movie'), ([], True))
+        response = self.client.get('/api/search/', {'q': 'movie'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['results'], response.data['timed_out']), ([], True))
+
+
+class SuggestTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        suggest.index.build([])  # unbuilt, as in a new process
+        self.client = APIClient()
+
+    def create_movie(self, title):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Movie.objects.create(title=title, description="", release_date=date(2024, 1, 1), duration=100,
+                                        price_buy=9.99, price_rent=2.99)
+
+    def test_prefix_lookup_and_ordering(self):
+        index = suggest.PrefixIndex(max_entries=100)
+        index.build([
+            (('movie', 1), "The Last Adventure"),
+            (('movie', 2), "Adventure"),
+            (('tv_series', 3), "Adventures in Space"),
+            (('movie', 4), "Amélie"),
+            (('category', 5), "Action"),
+        ])
+        # Matches at the start of the label first, then shorter labels
+        self.assertEqual([item for item, _ in index.lookup('adv')], [('movie', 2), ('tv_series', 3), ('movie', 1)])
+        self.assertEqual(index.lookup('last adv'), [(('movie', 1), "The Last Adventure")])
+        self.assertEqual(index.lookup('AME'), [(('movie', 4), "Amélie")])
+        self.assertEqual(len(index.lookup('a', limit=2)), 2)
+        self.assertEqual(index.lookup('  '), [])
+        self.assertEqual(index.lookup('zz'), [])
+
+    def test_labels_starting_with_the_prefix_are_not_crowded_out(self):
+        index = suggest.PrefixIndex(max_entries=1000)
+        index.build([(('movie', pk), f"Old stable {pk}") for pk in range(30)] + [(('movie', 99), "Stay")])
+        self.assertEqual(index.lookup('sta', limit=2)[0], (('movie', 99), "Stay"))
+        self.assertEqual(len(index.lookup('sta', limit=2)), 2)
+
+    def test_max_entries_bounds_the_index(self):
+        index = suggest.PrefixIndex(max_entries=3)
+        index.build([(('movie', pk), f"Title number {pk}") for pk in range(5)])
+        self.assertEqual(len(index), 3)
+        index.add(('movie', 9), "Another")
+        self.assertEqual(len(index), 3)
+
+    def test_saves_and_deletes_update_the_built_index(self):
+        create_catalog(movies=1, series=0)
+        index = suggest.current_index()
+        with mock.patch.object(index, 'build', wraps=index.build) as build:
+            movie = self.create_movie("Galactic Wars")
+            self.assertEqual(suggest.current_index().lookup('gala'), [(('movie', movie.pk), "Galactic Wars")])
+
+            movie.title = "Stellar Wars"
+            with self.captureOnCommitCallbacks(execute=True):
+                movie.save()
+            self.assertEqual(suggest.current_index().lookup('gala'), [])
+            self.assertEqual(suggest.current_index().lookup('wars'), [(('movie', movie.pk), "Stellar Wars")])
+
+            with self.captureOnCommitCallbacks(execute=True):
+                movie.delete()
+            self.assertEqual(suggest.current_index().lookup('wars'), [])
+        build.assert_not_called()
+
+    def test_changes_made_by_other_processes_are_applied_in_place(self):
+        create_catalog(movies=1, series=0)
+        index = suggest.current_index()
+        # Saved by another process, with its own index
+        with mock.patch.object(suggest, 'index', suggest.PrefixIndex(max_entries=100)):
+            first = self.create_movie("Galactic Wars")
+            second = self.create_movie("Galactic Dawn")
+            with self.captureOnCommitCallbacks(execute=True):
+                first.delete()
+        self.assertEqual(index.lookup('gala'), [])
+        with mock.patch.object(index, 'build') as build:
+            self.assertEqual(suggest.current_index().lookup('gala'), [(('movie', second.pk), "Galactic Dawn")])
+        build.assert_not_called()
+
+    def test_lost_changes_rebuild_in_the_background(self):
+        movie = self.create_movie("Galactic Wars")
+        index = suggest.current_index()
+        cache.clear()
+        with mock.patch.object(suggest, '_rebuild_in_background') as rebuild:
+            # The old index keeps answering meanwhile
+            self.assertIs(suggest.current_index(), index)
+            self.assertEqual(index.lookup('gala'), [(('movie', movie.pk), "Galactic Wars")])
+        rebuild.assert_called_with()
+
+        # What the background thread runs, minus closing the test's connection
+        Movie.objects.filter(pk=movie.pk).update(title="Stellar Wars")
+        suggest._rebuild_lock.acquire()
+        with mock.patch.object(suggest.connection, 'close'):
+            suggest._rebuild()
+        self.assertFalse(suggest._rebuild_lock.locked())
+        self.assertEqual(index.lookup('gala'), [])
+        self.assertEqual(index.version, cache.get(suggest.SEQUENCE_KEY))
+
+    def test_endpoint(self):
+        create_catalog(movies=2, series=1, seasons=1, episodes=1)
+        response = self.client.get('/api/search/suggest/', {'q': 'ser'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['suggestions'], [
+            {'type': 'tv_series', 'id': TVSeries.objects.get().pk, 'label': "Series 0"},
+        ])
+
+
+class TrendingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        create_catalog(movies=3, series=1, seasons=1, episodes=2)
+        self.user = User.objects.create_user('fan', password='secret')
+        self.movies = list(Movie.objects.order_by('id'))
+        self.episode = Episode.objects.order_by('id').first()
+
+    def buy(self, movie, days_ago=0):
+        purchase = Purchase.objects.create(user=self.user, content_type='movie', movie=movie, amount=9.99,
+                                           transaction_id=f'p{Purchase.objects.count()}')
+        if days_ago:
+            Purchase.objects.filter(pk=purchase.pk).update(purchase_date=timezone.now() - timedelta(days=days_ago))
+        return purchase
+
+    def scores(self):
+        return dict(TrendingScore.objects.values_list('object_id', 'score').filter(content_type='movie'))
+
+    def test_record_adds_in_log_space(self):
+        first = self.buy(self.movies[0])
+        self.assertAlmostEqual(self.scores()[self.movies[0].pk], trending.log_weight(3, first.purchase_date))
+        self.buy(self.movies[0])
+        # Two purchases at (nearly) the same time count double: one more in log2
+        self.assertAlmostEqual(self.scores()[self.movies[0].pk], trending.log_weight(3, first.purchase_date) + 1,
+                               places=4)
+        self.assertAlmostEqual(trending.current_score(self.scores()[self.movies[0].pk]), 6, places=2)
+        self.assertEqual(
+            set(ActivityBucket.objects.filter(object_id=self.movies[0].pk).values_list('granularity', 'purchases')),
+            {('hour', 2), ('day', 2)},
+        )
+
+    def test_rentals_count_towards_the_episode_and_its_series(self):
+        Rental.objects.create(user=self.user, content_type='episode', episode=self.episode, amount=1.99,
+                              transaction_id='r1', expiry_date=timezone.now() + timedelta(hours=48))
+        self.assertEqual(
+            set(TrendingScore.objects.values_list('content_type', 'object_id')),
+            {('episode', self.episode.pk), ('tv_series', TVSeries.objects.get().pk)},
+        )
+
+    def test_scores_survive_far_past_the_epoch(self):
+        purchase = self.buy(self.movies[0])
+        years = timedelta(days=365)
+        trending.record(purchase, 'purchase', trending.EPOCH + 50 * years)
+        trending.record(purchase, 'purchase', trending.EPOCH + 60 * years)
+        self.assertAlmostEqual(self.scores()[self.movies[0].pk], trending.log_weight(3, trending.EPOCH + 60 * years),
+                               places=6)
+
+    def test_recent_activity_outranks_older_activity(self):
+        for _ in range(4):
+            self.buy(self.movies[0], days_ago=10)
+        self.buy(self.movies[1], days_ago=2)
+        self.buy(self.movies[2])
+        trending.rebuild()
+        # Four purchases ten days ago decay below one from two days ago
+        self.assertEqual(trending.top(('movie',)), [('movie', m.pk) for m in (self.movies[2], self.movies[1],
+                                                                                self.movies[0])])
+        self.assertEqual(trending.top_in_window(('movie',), window='day'), [('movie', self.movies[2].pk)])
+        self.assertEqual(set(trending.top_in_window(('movie',), window='week')),
+                         {('movie', self.movies[1].pk), ('movie', self.movies[2].pk)})
+
+        response = self.client.get('/api/content/trending/', {'type': 'movie', 'limit': 1})
+        self.assertEqual([item['id'] for item in response.data['results']], [self.movies[2].pk])
+
+    def test_rebuild_matches_incremental_scores(self):
+        for movie in self.movies:
+            self.buy(movie)
+        self.buy(self.movies[0])
+        Rental.objects.create(user=self.user, content_type='movie', movie=self.movies[1], amount=2.99,
+                              transaction_id='r1', expiry_date=timezone.now() + timedelta(hours=48))
+        incremental = self.scores()
+        self.assertEqual(trending.rebuild(), len(self.movies))
+        rebuilt = self.scores()
+        self.assertEqual(rebuilt.keys(), incremental.keys())
+        for pk, score in incremental.items():
+            # Replayed per hour: within an hour's decay, 1/72 in log2
+            self.assertAlmostEqual(rebuilt[pk], score, delta=1 / 72)
+
+
+class RecommendationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        create_catalog(movies=4, series=0)
+        self.a, self.b, self.c, self.d = Movie.objects.order_by('id')
+        self.users = [User.objects.create_user(f'buyer{i}', password='secret') for i in range(3)]
+        # A and B are bought together twice, A and C once; nobody buys D
+        for user, movies in zip(self.users, [(self.a, self.b), (self.a, self.b), (self.a, self.c)]):
+            for movie in movies:
+                self.buy(user, movie)
+
+    def buy(self, user, movie):
+        Purchase.objects.create(user=user, content_type='movie', movie=movie, amount=9.99,
+                                transaction_id=f'p{Purchase.objects.count()}')
+
+    def test_neighbours_follow_co_purchases(self):
+        # Every movie shares every category in create_catalog(), so leave categories out
+        neighbors = dict(recommendations.compute_neighbors(category_weight=0))
+        self.assertEqual([item for item, _ in neighbors[('movie', self.a.pk)]],
+                         [('movie', self.b.pk), ('movie', self.c.pk)])
+        (_, ab), (_, ac) = neighbors[('movie', self.a.pk)]
+        self.assertAlmostEqual(ab, 2 / 6 ** 0.5, places=5)
+        self.assertAlmostEqual(ac, 1 / 3 ** 0.5, places=5)
+        self.assertEqual([item for item, _ in neighbors[('movie', self.b.pk)]], [('movie', self.a.pk)])
+        self.assertNotIn(('movie', self.d.pk), neighbors)
+
+    def test_categories_link_titles_nobody_bought_together(self):
+        neighbors = dict(recommendations.compute_neighbors(co_purchase_weight=0))
+        self.assertIn(('movie', self.d.pk), [item for item, _ in neighbors[('movie', self.a.pk)]])
+
+    def test_recommend_excludes_owned_titles(self):
+        self.assertEqual(recommendations.rebuild(category_weight=0), 3)
+        self.assertEqual(ItemNeighbor.objects.filter(object_id=self.a.pk, rank=0).get().neighbor_id, self.b.pk)
+        newcomer = User.objects.create_user('newcomer', password='secret')
+        self.buy(newcomer, self.b)
+        self.assertEqual(recommendations.recommend(newcomer), [('movie', self.a.pk)])
+        # Owning A too brings in C, but never A or B
+        self.buy(newcomer, self.a)
+        self.assertEqual(recommendations.recommend(newcomer), [('movie', self.c.pk)])
+
+    def test_cold_start_falls_back_to_trending(self):
+        recommendations.rebuild(category_weight=0)
+        newcomer = User.objects.create_user('newcomer', password='secret')
+        self.assertEqual(recommendations.recommend(newcomer, limit=2), trending.top(limit=2))
+        self.assertEqual(recommendations.recommend(newcomer, fallback=False), [])
+
+        # Owning only D, which has no neighbours, also falls back, without D
+        self.buy(newcomer, self.d)
+        self.assertNotIn(('movie', self.d.pk), recommendations.recommend(newcomer))
+        self.assertEqual(recommendations.recommend(newcomer)[0], ('movie', self.a.pk))
+
+        response = APIClient().get('/api/content/recommended/', {'limit': 1})
+        self.assertEqual([item['id'] for item in response.data['results']], [self.a.pk])
+
+
+class HomeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        create_catalog(movies=4, series=2, seasons=1, episodes=1)
+        self.movies = list(Movie.objects.order_by('id'))
+        self.series = list(TVSeries.objects.order_by('id'))
+        TVSeries.objects.filter(pk=self.series[0].pk).update(is_featured=True)
+        buyer = User.objects.create_user('buyer', password='secret')
+        for i, movie in enumerate(self.movies[:2]):
+            Purchase.objects.create(user=buyer, content_type='movie', movie=movie, amount=9.99,
+                                    transaction_id=f'b{i}')
+        recommendations.rebuild(category_weight=0)
+        self.user = User.objects.create_user('viewer', password='secret')
+        Purchase.objects.create(user=self.user, content_type='movie', movie=self.movies[0], amount=9.99,
+                                transaction_id='v0')
+        self.client = APIClient()
+
+    def keys(self, items):
+        return [(item['type'], item['id']) for item in items]
+
+    def test_public_rails(self):
+        with self.assertNumQueries(8):  # featured, trending and new releases per type; movies; series
+            response = self.client.get('/api/home/')
+        self.assertEqual(set(response.data), {'featured', 'trending', 'new_releases'})
+        m, s = self.movies, self.series
+        self.assertEqual(self.keys(response.data['featured']),
+                         [('movie', m[2].pk), ('tv_series', s[0].pk), ('movie', m[0].pk)])
+        self.assertEqual(self.keys(response.data['trending'])[:2], [('movie', m[0].pk), ('movie', m[1].pk)])
+        self.assertEqual(self.keys(response.data['new_releases']), [
+            ('movie', m[3].pk), ('tv_series', s[1].pk), ('movie', m[2].pk), ('tv_series', s[0].pk),
+            ('movie', m[1].pk), ('movie', m[0].pk),
+        ])
+
+    def test_public_rails_are_cached_until_the_catalog_changes(self):
+        self.client.get('/api/home/')
+        with self.assertNumQueries(0):
+            self.client.get('/api/home/')
+        self.movies[3].is_featured = True
+        Movie.objects.filter(pk=self.movies[3].pk).update(is_featured=True)
+        self.assertNotIn(('movie', self.movies[3].pk), self.keys(self.client.get('/api/home/').data['featured']))
+        self.movies[3].save()  # bumps the list version
+        self.assertIn(('movie', self.movies[3].pk), self.keys(self.client.get('/api/home/').data['featured']))
+
+    def test_poster_urls_are_absolute(self):
+        Movie.objects.filter(pk=self.movies[0].pk).update(poster='movies/posters/a.jpg')
+        self.client.force_authenticate(self.user)
+        poster = 'http://testserver/media/movies/posters/a.jpg'
+        home = self.client.get('/api/home/').data
+        self.assertEqual(home['featured'][-1]['poster'], poster)
+        self.assertEqual(home['trending'][0]['poster'], poster)
+        self.assertEqual(self.client.get('/api/content/trending/').data['results'][0]['poster'], poster)
+        self.assertEqual(self.client.get('/api/search/', {'q': 'movie 0'}).data['results'][0]['poster'], poster)
+        library = self.client.get('/api/library/').data
+        self.assertEqual(library['movie']['results'][0]['content']['poster'], poster)
+
+    @override_settings(ALLOWED_HOSTS=['testserver', 'api.example.com'])
+    def test_origins_are_cached_apart(self):
+        Movie.objects.filter(pk=self.movies[0].pk).update(poster='movies/posters/a.jpg')
+        self.client.force_authenticate(self.user)
+        for host in ('testserver', 'api.example.com'):
+            poster = f'http://{host}/media/movies/posters/a.jpg'
+            self.assertEqual(self.client.get('/api/home/', HTTP_HOST=host).data['featured'][-1]['poster'], poster)
+            library = self.client.get('/api/library/', HTTP_HOST=host).data
+            self.assertEqual(library['movie']['results'][0]['content']['poster'], poster)
+
+    def test_personal_rails(self):
+        self.client.force_authenticate(self.user)
+        self.client.get('/api/home/')
+        # owned titles, neighbours, recommended movies, ownership badges
+        with self.assertNumQueries(4):
+            response = self.client.get('/api/home/')
+        self.assertEqual(self.keys(response.data['recommended']), [('movie', self.movies[1].pk)])
+        self.assertEqual(response.data['entitlements'], {'movie': [self.movies[0].pk]})
+        self.assertIn('featured', response.data)
+
+
+class ExplainQueriesTests(TestCase):
+    def test_every_endpoint_query_uses_an_index(self):
+        out = StringIO()
+        call_command('explain_queries', stdout=out, no_color=True)
+        lines = out.getvalue().splitlines()
+        labels = [label for label, _ in explain_queries.endpoint_queries()]
+        self.assertEqual(lines, [f"ok         {label}" for label in labels])
+
+    def test_login_lookup_uses_the_identifier_index(self):
+        out = StringIO()
+        call_command('explain_queries', stdout=out, verbosity=2, no_color=True)
+        self.assertIn('SEARCH zaukho_api_loginidentifier USING INDEX', out.getvalue())
+        # The LOWER() indexes the lookup used to need are dropped
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'auth_user'")
+            self.assertFalse({'zaukho_user_username_lower_idx', 'zaukho_user_email_lower_idx'} & {
+                name for name, in cursor.fetchall()
+            })
+
+    def test_full_scans_fail_the_command(self):
+        queries = [('by description', Movie.objects.filter(description='A movie'))]
+        out = StringIO()
+        with mock.patch.object(explain_queries, 'endpoint_queries', return_value=queries):
+            with self.assertRaisesMessage(CommandError, "1 endpoint queries do full table scans: by description"):
+                call_command('explain_queries', stdout=out, no_color=True)
+        self.assertEqual(out.getvalue(), "FULL SCAN  by description: zaukho_api_movie\n")
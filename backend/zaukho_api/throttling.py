@@ -0,0 +1,163 @@
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.module_loading import import_string
+from rest_framework.exceptions import Throttled
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+from .auth_backends import normalize
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """'5/min' -> (capacity 5, refill 5/60 tokens per second)"""
+    count, period = rate.split('/')
+    capacity = int(count)
+    return capacity, capacity / PERIODS[period[0]]
+
+
+def take(state, now, capacity, refill_rate, cost=1):
+    """
+    Token bucket step. `state` is (tokens, updated_at) or None for a full
+    bucket. Returns (new_state, seconds to wait, 0 if the request is allowed).
+    """
+    tokens, updated_at = state if state is not None else (capacity, now)
+    tokens = min(capacity, tokens + (now - updated_at) * refill_rate)
+    if tokens >= cost:
+        return (tokens - cost, now), 0
+    return (tokens, now), (cost - tokens) / refill_rate
+
+
+class LocalBucketStore:
+    """Buckets in a dict in this process; each worker process limits on its own"""
+    def __init__(self, max_keys=100_000):
+        self.max_keys = max_keys
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, refill_rate):
+        now = time.monotonic()
+        with self._lock:
+            state, wait = take(self._buckets.get(key), now, capacity, refill_rate)
+            if key not in self._buckets and len(self._buckets) >= self.max_keys:
+                self._buckets.pop(next(iter(self._buckets)))
+            self._buckets[key] = state
+        return wait
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class CacheBucketStore:
+    """
+    Buckets in the Django cache, shared by every process using it. The
+    read-modify-write is not atomic, so concurrent requests for one key can
+    occasionally both get the last token.
+    """
+    key_prefix = 'zaukho:throttle'
+
+    def take(self, key, capacity, refill_rate):
+        cache_key = f'{self.key_prefix}:{key}'
+        now = time.time()
+        state, wait = take(cache.get(cache_key), now, capacity, refill_rate)
+        # Drop the key once the bucket would be full again
+        cache.set(cache_key, state, timeout=int(capacity / refill_rate) + 1)
+        return wait
+
+    def clear(self):
+        pass
+
+
+store = import_string(getattr(settings, 'THROTTLE_BUCKET_STORE', 'zaukho_api.throttling.LocalBucketStore'))()
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Throttle with one token bucket per cache key. The rate for `scope` comes
+    from REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'], e.g. '5/min': a burst of
+    5, refilled at 5 per minute. Requests with no key are not throttled.
+    """
+    scope = None
+
+    def __init__(self):
+        self.wait_seconds = None
+
+    def get_cache_key(self, request, view):
+        raise NotImplementedError
+
+    def allow_request(self, request, view):
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(self.scope)
+        key = self.get_cache_key(request, view)
+        if rate is None or key is None:
+            return True
+        capacity, refill_rate = parse_rate(rate)
+        self.wait_seconds = store.take(f'{self.scope}:{key}', capacity, refill_rate)
+        return not self.wait_seconds
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class IPThrottle(TokenBucketThrottle):
+    """
+    One bucket per client address: REMOTE_ADDR, or with
+    REST_FRAMEWORK['NUM_PROXIES'] set, the address that many proxies back
+    in X-Forwarded-For
+    """
+    def get_cache_key(self, request, view):
+        return self.get_ident(request)
+
+
+class AccountThrottle(TokenBucketThrottle):
+    """
+    One bucket per account identifier named in the request body. Values
+    that aren't strings get no bucket; the view rejects them.
+    """
+    fields = ('email', 'username')
+
+    def get_cache_key(self, request, view):
+        if not hasattr(request.data, 'get'):
+            return None
+        for field in self.fields:
+            value = request.data.get(field)
+            identifier = normalize(value) if isinstance(value, str) else None
+            if identifier:
+                return identifier
+        return None
+
+
+class LoginIPThrottle(IPThrottle):
+    scope = 'login-ip'
+
+
+class LoginAccountThrottle(AccountThrottle):
+    scope = 'login-account'
+
+
+class RegisterIPThrottle(IPThrottle):
+    scope = 'register-ip'
+
+
+_hash_slots = threading.BoundedSemaphore(getattr(settings, 'MAX_CONCURRENT_PASSWORD_HASHES', 4))
+
+
+@contextmanager
+def hash_slot():
+    """
+    Hold one of this process's MAX_CONCURRENT_PASSWORD_HASHES slots while
+    hashing a password. When all are busy, wait up to
+    PASSWORD_HASH_SLOT_TIMEOUT seconds, then answer 429 instead of queueing.
+    """
+    timeout = getattr(settings, 'PASSWORD_HASH_SLOT_TIMEOUT', 0.5)
+    if not _hash_slots.acquire(timeout=timeout):
+        raise Throttled(wait=1)
+    try:
+        yield
+    finally:
+        _hash_slots.release()
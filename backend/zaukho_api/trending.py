@@ -0,0 +1,215 @@
+import math
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, FloatField, Sum, Value
+from django.db.models.functions import Greatest, Least, Log, Power, TruncHour
+from django.utils import timezone
+
+from . import instrumentation
+from .models import ActivityBucket, TrendingScore, Episode, Purchase, Rental, RentalArchive, Season
+
+# An event counts weight * 2 ** ((t - EPOCH) / HALF_LIFE): its weight
+# halves every HALF_LIFE relative to newer events, and with the epoch fixed
+# a title's score is a plain sum that never has to be recomputed. That sum
+# would overflow a float some 1000 half-lives after the epoch, so scores are
+# stored as its base-2 logarithm, which grows linearly with time and orders
+# titles the same way.
+EPOCH = getattr(settings, 'TRENDING_EPOCH', datetime(2025, 1, 1, tzinfo=dt_timezone.utc))
+HALF_LIFE = getattr(settings, 'TRENDING_HALF_LIFE', timedelta(days=3))
+
+WEIGHTS = {'purchase': 3.0, 'rental': 1.0}
+TOP_CACHE_TIMEOUT = 60
+HOURLY_RETENTION = timedelta(days=7)
+DAILY_RETENTION = timedelta(days=90)
+
+
+def log_weight(weight, at):
+    """log2 of an event's contribution to a stored score"""
+    return math.log2(weight) + (at - EPOCH) / HALF_LIFE
+
+
+def log_add(a, b):
+    """log2(2 ** a + 2 ** b) without leaving log space"""
+    high, low = max(a, b), min(a, b)
+    return high + math.log2(1 + 2 ** (low - high))
+
+
+def current_score(score, now=None):
+    """Convert a stored score into today's value (for display only, ranking doesn't need it)"""
+    return 2 ** (score - log_weight(1, now or timezone.now()))
+
+
+def bucket_starts(at):
+    hour = at.replace(minute=0, second=0, microsecond=0)
+    return {'hour': hour, 'day': hour.replace(hour=0)}
+
+
+def _increment(model, lookup, **deltas):
+    """UPDATE ... SET field = field + delta, creating the row on first use"""
+    updates = {field: F(field) + delta for field, delta in deltas.items()}
+    if model.objects.filter(**lookup).update(**updates):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, **deltas)
+    except IntegrityError:
+        # Another request created it first
+        model.objects.filter(**lookup).update(**updates)
+
+
+def _add_score(lookup, log_delta):
+    """log_add() the stored score and `log_delta` in one UPDATE, creating the row on first use"""
+    delta = Value(log_delta, output_field=FloatField())
+    high, low = Greatest(F('score'), delta), Least(F('score'), delta)
+    if TrendingScore.objects.filter(**lookup).update(score=high + Log(2, 1 + Power(2, low - high))):
+        return
+    try:
+        with transaction.atomic():
+            TrendingScore.objects.create(**lookup, score=log_delta)
+    except IntegrityError:
+        # Another request created it first
+        _add_score(lookup, log_delta)
+
+
+def titles_for(instance):
+    """The (content_type, object_id) pairs a purchase or rental counts towards"""
+    if instance.movie_id:
+        return [('movie', instance.movie_id)]
+    if getattr(instance, 'season_id', None):
+        tv_series_id = Season.objects.filter(pk=instance.season_id).values_list('tv_series_id', flat=True).first()
+        return [('tv_series', tv_series_id)] if tv_series_id else []
+    if getattr(instance, 'episode_id', None):
+        tv_series_id = Episode.objects.filter(pk=instance.episode_id) \
+            .values_list('season__tv_series_id', flat=True).first()
+        titles = [('episode', instance.episode_id)]
+        if tv_series_id:
+            titles.append(('tv_series', tv_series_id))
+        return titles
+    return []
+
+
+def record(instance, kind, at):
+    """Count a new purchase or rental (`kind` is 'purchase' or 'rental') towards its titles"""
+    log_delta = log_weight(WEIGHTS[kind], at)
+    counter = 'purchases' if kind == 'purchase' else 'rentals'
+    for content_type, object_id in titles_for(instance):
+        _add_score({'content_type': content_type, 'object_id': object_id}, log_delta)
+        for granularity, start in bucket_starts(at).items():
+            _increment(ActivityBucket, {
+                'content_type': content_type, 'object_id': object_id,
+                'granularity': granularity, 'bucket_start': start,
+            }, **{counter: 1})
+
+
+def top(content_types=('movie', 'tv_series'), limit=20):
+    """
+    The highest scoring (content_type, object_id) pairs, best first.
+    Each content type is an index range scan; results are cached briefly.
+    """
+    key = f"zaukho:trending:{','.join(content_types)}:{limit}"
+    result = instrumentation.cache_lookup(cache.get(key))
+    if result is None:
+        rows = []
+        for content_type in content_types:
+            rows.extend(
+                TrendingScore.objects.filter(content_type=content_type)
+                .order_by('-score').values_list('score', 'content_type', 'object_id')[:limit]
+            )
+        rows.sort(reverse=True)
+        result = [(content_type, object_id) for _, content_type, object_id in rows[:limit]]
+        cache.set(key, result, timeout=TOP_CACHE_TIMEOUT)
+    return result
+
+
+def top_in_window(content_types=('movie', 'tv_series'), window='day', limit=20):
+    """
+    Most purchased/rented titles over the last day (from hourly buckets) or
+    the last week (from daily buckets), purchases weighted over rentals.
+    """
+    now = timezone.now()
+    if window == 'day':
+        granularity, since = 'hour', bucket_starts(now - timedelta(days=1))['hour']
+    else:
+        granularity, since = 'day', bucket_starts(now - timedelta(days=7))['day']
+    rows = ActivityBucket.objects.filter(
+        granularity=granularity, bucket_start__gte=since, content_type__in=content_types
+    ).values('content_type', 'object_id').annotate(
+        total=Sum(F('purchases') * WEIGHTS['purchase'] + F('rentals') * WEIGHTS['rental'])
+    ).order_by('-total')[:limit]
+    return [(row['content_type'], row['object_id']) for row in rows]
+
+
+def prune(now=None):
+    """Drop buckets that have aged out of every window"""
+    now = now or timezone.now()
+    deleted, _ = ActivityBucket.objects.filter(granularity='hour', bucket_start__lt=now - HOURLY_RETENTION).delete()
+    deleted_days, _ = ActivityBucket.objects.filter(granularity='day', bucket_start__lt=now - DAILY_RETENTION).delete()
+    return deleted + deleted_days
+
+
+def rebuild(batch_size=1000):
+    """
+    Recompute every bucket and score from the Purchase and Rental history,
+    archived rentals included. Events are replayed per hour, so scores match
+    the incremental ones to within an hour of decay. Returns the number of
+    titles scored.
+    """
+    hourly = {}  # (content_type, object_id, hour) -> [purchases, rentals]
+
+    def add(content_type, object_id, hour, column, count):
+        if object_id is None:
+            return
+        hourly.setdefault((content_type, object_id, hour), [0, 0])[column] += count
+
+    sources = [
+        (Purchase, 'purchase_date', 0, [('movie', 'movie_id'), ('tv_series', 'season__tv_series_id')]),
+        (Rental, 'rental_date', 1, [
+            ('movie', 'movie_id'), ('episode', 'episode_id'), ('tv_series', 'episode__season__tv_series_id'),
+        ]),
+        (RentalArchive, 'rental_date', 1, [
+            ('movie', 'movie_id'), ('episode', 'episode_id'), ('tv_series', 'episode__season__tv_series_id'),
+        ]),
+    ]
+    for model, date_field, column, titles in sources:
+        for content_type, field in titles:
+            rows = model.objects.filter(**{f'{field}__isnull': False}).annotate(
+                hour=TruncHour(date_field)
+            ).values(field, 'hour').annotate(count=Count('id')).order_by()
+            for row in rows.iterator():
+                add(content_type, row[field], row['hour'], column, row['count'])
+
+    scores = {}
+    daily = {}
+    for (content_type, object_id, hour), (purchases, rentals) in hourly.items():
+        title = (content_type, object_id)
+        weight = purchases * WEIGHTS['purchase'] + rentals * WEIGHTS['rental']
+        score = log_weight(weight, hour)
+        scores[title] = log_add(scores[title], score) if title in scores else score
+        day = daily.setdefault((content_type, object_id, bucket_starts(hour)['day']), [0, 0])
+        day[0] += purchases
+        day[1] += rentals
+
+    with transaction.atomic():
+        ActivityBucket.objects.all().delete()
+        TrendingScore.objects.all().delete()
+        ActivityBucket.objects.bulk_create(
+            [
+                ActivityBucket(content_type=content_type, object_id=object_id, granularity=granularity,
+                               bucket_start=start, purchases=purchases, rentals=rentals)
+                for granularity, buckets in (('hour', hourly), ('day', daily))
+                for (content_type, object_id, start), (purchases, rentals) in buckets.items()
+            ],
+            batch_size=batch_size,
+        )
+        TrendingScore.objects.bulk_create(
+            [
+                TrendingScore(content_type=content_type, object_id=object_id, score=score)
+                for (content_type, object_id), score in scores.items()
+            ],
+            batch_size=batch_size,
+        )
+    prune()
+    return len(scores)
@@ -1,7 +1,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import TokenVerifyView
-from . import views
+from . import streaming, views
 from . import auth_views
 
 # Create a router and register our viewsets with it
@@ -28,5 +28,15 @@ auth_patterns = [
 urlpatterns = [
     path('', include(router.urls)),
     path('auth/', include(auth_patterns)),  # Custom auth views
+    path('home/', views.home, name='home'),
+    path('content/trending/', views.trending, name='trending'),
+    path('content/recommended/', views.recommended, name='recommended'),
+    path('search/', views.search, name='search'),
+    path('search/suggest/', views.search_suggest, name='search-suggest'),
     path('library/', views.my_library, name='my-library'),
+    path('entitlements/', views.my_entitlements, name='my-entitlements'),
+    path('playback/<str:content_type>/<int:pk>/', views.playback, name='playback'),
+    path('stream/<str:token>/', streaming.stream, name='stream'),
+    path('hls/<str:token>/<str:name>', streaming.playlist, name='hls'),
+    path('cache/stats/', views.cache_stats, name='cache-stats'),
 ] 
\ No newline at end of file
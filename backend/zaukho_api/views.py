@@ -9,18 +9,28 @@ import uuid
 
 from .models import (
     Category, Movie, TVSeries, Season, 
-    Episode, Purchase, Rental
+    Episode, Purchase, Rental, Entitlement
 )
 from .serializers import (
     UserSerializer, CategorySerializer, MovieSerializer, 
     TVSeriesSerializer, SeasonSerializer, EpisodeSerializer,
-    PurchaseSerializer, RentalSerializer
+    MovieListSerializer, TVSeriesListSerializer, SeasonListSerializer,
+    EpisodeListSerializer, PurchaseSerializer, RentalSerializer,
+    serialize_titles
 )
+from . import (
+    entitlements, home as home_rails, ingest, library, recommendations, response_cache, search as search_index, streaming,
+    suggest, trending as trending_scores,
+)
+from .mixins import CachedResponseMixin, ConditionalGetMixin, SparseFieldsetMixin
+from .pagination import CatalogCursorPagination, PurchaseCursorPagination, RentalCursorPagination
+from .query_planning import plan_queryset
 
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(CachedResponseMixin, viewsets.ModelViewSet):
     """ViewSet for Category model"""
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
+    cache_resource = 'categories'
     permission_classes = [permissions.IsAdminUser]
     
     def get_permissions(self):
@@ -31,10 +41,13 @@ class CategoryViewSet(viewsets.ModelViewSet):
             permission_classes = [permissions.IsAdminUser]
         return [permission() for permission in permission_classes]
 
-class MovieViewSet(viewsets.ModelViewSet):
+class MovieViewSet(CachedResponseMixin, ConditionalGetMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     """ViewSet for Movie model"""
     queryset = Movie.objects.all()
     serializer_class = MovieSerializer
+    list_serializer_class = MovieListSerializer
+    cache_resource = 'movies'
+    pagination_class = CatalogCursorPagination
     permission_classes = [permissions.IsAdminUser]
     
     def get_permissions(self):
@@ -57,12 +70,15 @@ class MovieViewSet(viewsets.ModelViewSet):
             featured_bool = featured.lower() == 'true'
             queryset = queryset.filter(is_featured=featured_bool)
             
-        return queryset
+        return self.plan_queryset(queryset)
 
-class TVSeriesViewSet(viewsets.ModelViewSet):
+class TVSeriesViewSet(CachedResponseMixin, ConditionalGetMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     """ViewSet for TVSeries model"""
     queryset = TVSeries.objects.all()
     serializer_class = TVSeriesSerializer
+    list_serializer_class = TVSeriesListSerializer
+    cache_resource = 'tv-series'
+    pagination_class = CatalogCursorPagination
     permission_classes = [permissions.IsAdminUser]
     
     def get_permissions(self):
@@ -85,12 +101,16 @@ class TVSeriesViewSet(viewsets.ModelViewSet):
             featured_bool = featured.lower() == 'true'
             queryset = queryset.filter(is_featured=featured_bool)
             
-        return queryset
+        return self.plan_queryset(queryset)
 
-class SeasonViewSet(viewsets.ModelViewSet):
+class SeasonViewSet(CachedResponseMixin, ConditionalGetMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     """ViewSet for Season model"""
     queryset = Season.objects.all()
     serializer_class = SeasonSerializer
+    list_serializer_class = SeasonListSerializer
+    # Season/Episode changes touch the parent series (see signals.py)
+    last_modified_field = 'tv_series__updated_at'
+    cache_resource = 'seasons'
     permission_classes = [permissions.IsAdminUser]
     
     def get_permissions(self):
@@ -109,12 +129,16 @@ class SeasonViewSet(viewsets.ModelViewSet):
         if tv_series:
             queryset = queryset.filter(tv_series__id=tv_series)
             
-        return queryset
+        return self.plan_queryset(queryset)
 
-class EpisodeViewSet(viewsets.ModelViewSet):
+class EpisodeViewSet(CachedResponseMixin, ConditionalGetMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     """ViewSet for Episode model"""
     queryset = Episode.objects.all()
     serializer_class = EpisodeSerializer
+    list_serializer_class = EpisodeListSerializer
+    # Season/Episode changes touch the parent series (see signals.py)
+    last_modified_field = 'season__tv_series__updated_at'
+    cache_resource = 'episodes'
     permission_classes = [permissions.IsAdminUser]
     
     def get_permissions(self):
@@ -133,16 +157,18 @@ class EpisodeViewSet(viewsets.ModelViewSet):
         if season:
             queryset = queryset.filter(season__id=season)
             
-        return queryset
+        return self.plan_queryset(queryset)
 
 class PurchaseViewSet(viewsets.ModelViewSet):
     """ViewSet for Purchase model"""
     serializer_class = PurchaseSerializer
+    pagination_class = PurchaseCursorPagination
     permission_classes = [permissions.IsAuthenticated]
     
     def get_queryset(self):
         """Users can only see their own purchases"""
-        return Purchase.objects.filter(user=self.request.user)
+        queryset = Purchase.objects.filter(user_id=self.request.user.pk)
+        return plan_queryset(queryset, self.get_serializer_class())
     
     def perform_create(self, serializer):
         """Create a purchase for the authenticated user"""
@@ -156,11 +182,13 @@ class PurchaseViewSet(viewsets.ModelViewSet):
 class RentalViewSet(viewsets.ModelViewSet):
     """ViewSet for Rental model"""
     serializer_class = RentalSerializer
+    pagination_class = RentalCursorPagination
     permission_classes = [permissions.IsAuthenticated]
     
     def get_queryset(self):
         """Users can only see their own rentals"""
-        return Rental.objects.filter(user=self.request.user)
+        queryset = Rental.objects.filter(user_id=self.request.user.pk)
+        return plan_queryset(queryset, self.get_serializer_class())
     
     def perform_create(self, serializer):
         """Create a rental for the authenticated user"""
@@ -177,19 +205,182 @@ class RentalViewSet(viewsets.ModelViewSet):
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def my_library(request):
-    """Endpoint to get user's purchased and rented content"""
-    # Get user's purchases
-    purchases = Purchase.objects.filter(user=request.user)
-    purchase_serializer = PurchaseSerializer(purchases, many=True)
-    
-    # Get user's active rentals (not expired)
-    active_rentals = Rental.objects.filter(
-        user=request.user,
-        expiry_date__gt=timezone.now()
-    )
-    rental_serializer = RentalSerializer(active_rentals, many=True)
+    """
+    The user's purchases and active rentals, by content type (movie, season,
+    episode). ?type= pages through one type with ?limit= and ?offset=.
+    Served from a per-user snapshot, see library.py.
+    """
+    data = library.page(request, library.snapshot(request.user.pk, request))
+    if data is None:
+        return Response(
+            {'detail': f"type must be one of {', '.join(library.SECTIONS)}."},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    return Response(data)
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def playback(request, content_type, pk):
+    """
+    Start watching an item: check the entitlement once and return signed
+    URLs for its HLS playlist (once segmented, else null) and for the video
+    file itself, which players can seek through with Range requests.
+    """
+    if content_type not in streaming.STREAMABLE:
+        return Response(
+            {'detail': f"content_type must be one of {', '.join(streaming.STREAMABLE)}."},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    name = streaming.video_name(content_type, pk)
+    if name is None:
+        return Response({'detail': 'No video for this item.'}, status=status.HTTP_404_NOT_FOUND)
+    entitlement = entitlements.current(request.user, content_type, pk)
+    if entitlement is None:
+        return Response(
+            {'detail': 'Buy or rent this item to watch it.'},
+            status=status.HTTP_403_FORBIDDEN
+        )
+    token, expires_at = streaming.issue_token(request.user.pk, content_type, pk, name, entitlement.expires_at)
+    directory = ingest.ready_directory(content_type, pk)
+    manifest_url = None
+    if directory:
+        hls_token, _ = streaming.issue_token(
+            request.user.pk, content_type, pk, directory, entitlement.expires_at, kind='hls'
+        )
+        manifest_url = streaming.manifest_url(request, hls_token)
+    return Response({
+        'manifest_url': manifest_url,
+        'url': streaming.stream_url(request, token),
+        'expires_at': expires_at,
+    })
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def my_entitlements(request):
+    """
+    Bulk "can I play this" check, e.g. ?movie=1,2,3&episode=7,8.
+    Returns the subset of the requested IDs the user may watch right now.
+    """
+    requested = {}
+    for content_type, _ in Entitlement.CONTENT_TYPES:
+        value = request.query_params.get(content_type)
+        if not value:
+            continue
+        try:
+            requested[content_type] = [int(item) for item in value.split(',') if item.strip()]
+        except ValueError:
+            return Response(
+                {'detail': f'{content_type} must be a comma separated list of IDs.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+    
+    allowed = entitlements.playable(request.user, requested)
+    return Response({content_type: sorted(ids) for content_type, ids in allowed.items()})
+
+
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+def home(request):
+    """
+    Every home page rail in one response. The public rails are precomputed
+    and cached; signed-in users also get personalized rails.
+    """
+    return Response(home_rails.build_home(request))
+
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+def trending(request):
+    """
+    Trending titles. ?type= limits the content type (movie, tv_series or
+    episode); ?window=day or ?window=week ranks by raw activity in that
+    window instead of the time-decayed score.
+    """
+    content_types = ('movie', 'tv_series', 'episode')
+    kind = request.query_params.get('type')
+    if kind and kind not in content_types:
+        return Response(
+            {'detail': f"type must be one of {', '.join(content_types)}."},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    selected = (kind,) if kind else ('movie', 'tv_series')
+    try:
+        limit = min(max(int(request.query_params.get('limit', 20)), 1), 50)
+    except ValueError:
+        limit = 20
     
+    window = request.query_params.get('window')
+    if window in ('day', 'week'):
+        keys = trending_scores.top_in_window(selected, window=window, limit=limit)
+    else:
+        keys = trending_scores.top(selected, limit=limit)
+    return Response({'results': serialize_titles({'results': keys}, request)['results']})
+
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+def recommended(request):
+    """
+    Titles similar to what the user owns, from the precomputed neighbour
+    lists (manage.py build_recommendations). Anonymous users and users with
+    nothing to go on get trending titles.
+    """
+    try:
+        limit = min(max(int(request.query_params.get('limit', 20)), 1), 50)
+    except ValueError:
+        limit = 20
+    keys = recommendations.recommend(request.user, limit=limit)
+    return Response({'results': serialize_titles({'results': keys}, request)['results']})
+
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+def search(request):
+    """
+    Ranked full-text search over movies, TV series and episodes.
+    Query parameters: q, type (movie, tv_series or episode) and limit.
+    """
+    query = request.query_params.get('q', '').strip()
+    kind = request.query_params.get('type') or None
+    if kind is not None and kind not in search_index.KIND_CODES:
+        return Response(
+            {'detail': f"type must be one of {', '.join(search_index.KIND_CODES)}."},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    try:
+        limit = min(max(int(request.query_params.get('limit', 20)), 1), 50)
+    except ValueError:
+        limit = 20
+    
+    hits, timed_out = search_index.search(query, kind=kind, limit=limit)
+    return Response({
+        'query': query,
+        'results': serialize_titles({'results': hits}, request)['results'],
+        'timed_out': timed_out,
+    })
+
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+def search_suggest(request):
+    """
+    Search-as-you-type suggestions for ?q=, served from the in-memory
+    prefix index without touching the database.
+    """
+    query = request.query_params.get('q', '')
+    try:
+        limit = min(max(int(request.query_params.get('limit', 10)), 1), 20)
+    except ValueError:
+        limit = 10
+    
+    matches = suggest.current_index().lookup(query, limit=limit)
     return Response({
-        'purchases': purchase_serializer.data,
-        'rentals': rental_serializer.data
+        'query': query,
+        'suggestions': [
+            {'type': kind, 'id': pk, 'label': label} for (kind, pk), label in matches
+        ],
     })
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def cache_stats(request):
+    """Hit and miss counters of the catalog response cache in this process"""
+    return Response(response_cache.stats())
@@ -12,15 +12,32 @@ const initialState = {
   error: null,
 };
 
+// Library sections and the largest page the API serves
+const SECTIONS = ['movie', 'season', 'episode'];
+const PAGE_SIZE = 100;
+
 /**
- * Async thunk to fetch user's library
+ * Async thunk to fetch user's library, following each section's pages to the end
  */
 export const fetchLibrary = createAsyncThunk(
   'library/fetchLibrary',
   async (_, { rejectWithValue }) => {
     try {
-      const response = await api.library.get();
-      return response.data;
+      const response = await api.library.get({ limit: PAGE_SIZE });
+      const sections = await Promise.all(
+        SECTIONS.map(async (type) => {
+          const section = response.data[type] || { results: [], next: null };
+          const results = [...section.results];
+          let next = section.next;
+          while (next) {
+            const page = await api.library.getPage(next);
+            results.push(...page.data.results);
+            next = page.data.next;
+          }
+          return [type, results];
+        })
+      );
+      return Object.fromEntries(sections);
     } catch (error) {
       return rejectWithValue(
         error.response?.data?.detail || 'Failed to fetch library.'
@@ -34,9 +51,11 @@ export const fetchLibrary = createAsyncThunk(
  */
 export const createPurchase = createAsyncThunk(
   'library/createPurchase',
-  async (purchaseData, { rejectWithValue }) => {
+  async (purchaseData, { dispatch, rejectWithValue }) => {
     try {
       const response = await api.purchases.create(purchaseData);
+      // The library holds library entries, not raw purchases, so fetch it again
+      dispatch(fetchLibrary());
       return response.data;
     } catch (error) {
       return rejectWithValue(
@@ -51,9 +70,11 @@ export const createPurchase = createAsyncThunk(
  */
 export const createRental = createAsyncThunk(
   'library/createRental',
-  async (rentalData, { rejectWithValue }) => {
+  async (rentalData, { dispatch, rejectWithValue }) => {
     try {
       const response = await api.rentals.create(rentalData);
+      // The library holds library entries, not raw rentals, so fetch it again
+      dispatch(fetchLibrary());
       return response.data;
     } catch (error) {
       return rejectWithValue(
@@ -97,12 +118,15 @@ const librarySlice = createSlice({
         console.log('Fetch library fulfilled, current state:', state);
         console.log('Fetch library fulfilled, action payload:', action.payload);
         
+        // The library comes back split by content type; the page shows it by access
+        const entries = SECTIONS.flatMap((type) => action.payload[type] || []);
+        
         // Create a completely new state object to ensure Redux updates properly
         return {
           ...state,
           loading: false,
-          purchases: action.payload.purchases || [],
-          rentals: action.payload.rentals || []
+          purchases: entries.filter((entry) => entry.access === 'purchase'),
+          rentals: entries.filter((entry) => entry.access === 'rental')
         };
       })
       .addCase(fetchLibrary.rejected, (state, action) => {
@@ -141,8 +165,7 @@ const librarySlice = createSlice({
         // Create a completely new state object to ensure Redux updates properly
         return {
           ...state,
-          loading: false,
-          purchases: [...state.purchases, action.payload]
+          loading: false
         };
       })
       .addCase(createPurchase.rejected, (state, action) => {
@@ -181,8 +204,7 @@ const librarySlice = createSlice({
         // Create a completely new state object to ensure Redux updates properly
         return {
           ...state,
-          loading: false,
-          rentals: [...state.rentals, action.payload]
+          loading: false
         };
       })
       .addCase(createRental.rejected, (state, action) => {
@@ -5,24 +5,34 @@ import apiClient from './apiClient';
  * Handles operations related to the homepage content
  */
 
+// Every rail comes from a single /home/ request, which adds the personalized
+// rails when it is authenticated. Callers asking at the same time share it.
+let homeRequest = null;
+
+const fetchHome = () => {
+  if (!homeRequest) {
+    homeRequest = apiClient.get('/home/').finally(() => {
+      homeRequest = null;
+    });
+  }
+  return homeRequest;
+};
+
 const homeService = {
   /**
-   * Get all content for the homepage
-   * @returns {Promise} - API response with homepage content
+   * Get every homepage rail, personalized ones included when signed in
+   * @returns {Promise} - Homepage content
    */
-  getHomeContent: async () => {
+  getHome: async () => {
     try {
-      // Fetch multiple content types in parallel for the homepage
-      const [featured, trending, newReleases] = await Promise.all([
-        apiClient.get('/content/featured/'),
-        apiClient.get('/content/trending/'),
-        apiClient.get('/content/new-releases/')
-      ]);
+      const response = await fetchHome();
       
       return {
-        featured: featured.data,
-        trending: trending.data,
-        newReleases: newReleases.data
+        featured: response.data.featured,
+        trending: response.data.trending,
+        newReleases: response.data.new_releases,
+        recommended: response.data.recommended,
+        entitlements: response.data.entitlements
       };
     } catch (error) {
       console.error('Error fetching home content:', error);
@@ -30,22 +40,23 @@ const homeService = {
     }
   },
   
+  /**
+   * Get all content for the homepage
+   * @returns {Promise} - API response with homepage content
+   */
+  getHomeContent: async () => {
+    const { featured, trending, newReleases } = await homeService.getHome();
+    return { featured, trending, newReleases };
+  },
+  
   /**
    * Get personalized content for logged-in users
    * @returns {Promise} - API response with personalized content
    */
   getPersonalizedContent: async () => {
     try {
-      // Fetch personalized content for logged-in users
-      const [recommended, watchlist] = await Promise.all([
-        apiClient.get('/content/recommended/'),
-        apiClient.get('/watchlist/')
-      ]);
-      
-      return {
-        recommended: recommended.data,
-        watchlist: watchlist.data
-      };
+      const { recommended, entitlements } = await homeService.getHome();
+      return { recommended, entitlements };
     } catch (error) {
       console.error('Error fetching personalized content:', error);
       throw error;
@@ -7,10 +7,18 @@ import apiClient from './apiClient';
 
 const libraryService = {
   /**
-   * Get the user's content library
+   * Get the user's content library: the first page of each section
+   * @param {Object} params - Query parameters (limit, type, offset)
    * @returns {Promise} - API response with library items
    */
-  get: () => apiClient.get('/library/'),
+  get: (params = {}) => apiClient.get('/library/', { params }),
+
+  /**
+   * Get a further page of a library section
+   * @param {string} url - The section's `next` URL
+   * @returns {Promise} - API response with one page of library items
+   */
+  getPage: (url) => apiClient.get(url),
 };
 
 export default libraryService; 
\ No newline at end of file